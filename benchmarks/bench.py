@@ -0,0 +1,459 @@
+"""Benchmarks for parsing, the metrics and workout expansion.
+
+Each benchmark times one stage on deterministic synthetic data: activities of
+1h, 6h and 24h, encoded as .fit files, and libraries of .zwo workouts. The
+time is the best of a number of repeats, and the peak memory is the peak of
+the memory allocated while the stage runs once, traced with `tracemalloc`.
+
+The results are compared with a stored baseline, and a stage is flagged as a
+regression if it is slower or uses more memory than the baseline by more than
+a threshold. Baselines are only comparable on the same machine, so store one
+per machine with `--save` before changing the library.
+
+Usage:
+    # Run all benchmarks and compare them with the stored baseline:
+    % uv run python benchmarks/bench.py
+
+    # Store the results as the new baseline:
+    % uv run python benchmarks/bench.py --save
+
+    # Only run the normalized power benchmarks for the 1h activity:
+    % uv run python benchmarks/bench.py --sizes 1h --filter normalized_power
+"""
+
+import argparse
+import json
+import math
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable, Iterable
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from garmin_fit_sdk import Encoder, Profile
+
+from power_metrics_lib import Activity, Workout
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+# The synthetic activity durations in seconds, by size:
+ACTIVITY_SIZES = {"1h": 1 * 3600, "6h": 6 * 3600, "24h": 24 * 3600}
+# The number of workouts in the synthetic .zwo libraries:
+LIBRARY_SIZES = (100, 1000)
+DEFAULT_REPEAT = 3
+# The min time of a repeat in seconds, short stages are run several times:
+MIN_REPEAT_TIME = 0.2
+DEFAULT_THRESHOLD = 0.25
+FTP = 250
+SEED = 42
+# The metrics of the workout library benchmarks, all but the slow full curve:
+WORKOUT_METRICS = tuple(m for m in Activity.METRICS if m != "power_duration_curve")
+
+_START_TIMESTAMP = 1_000_000_000
+_COASTING_FRACTION = 0.05
+
+
+@dataclass
+class Result:
+    """The result of a benchmark.
+
+    Attributes:
+        time (float): The best time of the repeats in seconds.
+        peak_memory (int): The peak memory allocated by a run in bytes.
+    """
+
+    time: float
+    peak_memory: int
+
+
+@dataclass
+class Benchmark:
+    """A benchmark of one stage.
+
+    Attributes:
+        name (str): The name, as "stage/variant/size".
+        setup (Callable[[], object]): Create the input of a run, not measured.
+        run (Callable[[Any], object]): Run the stage on the input.
+    """
+
+    name: str
+    setup: Callable[[], object]
+    run: Callable[[Any], object]
+
+
+def synthetic_power(duration: int, seed: int = SEED) -> np.ndarray:
+    """Generate deterministic power data, of an endurance ride with efforts.
+
+    Args:
+        duration: The duration in seconds.
+        seed: The seed of the random generator.
+
+    Returns:
+        The power data, one sample per second.
+    """
+    rng = np.random.default_rng(seed)
+    power = rng.normal(200, 40, duration)
+    # Efforts of 10 seconds to 20 minutes, on average every 10 minutes:
+    for start in rng.integers(0, duration, duration // 600).tolist():
+        length = int(rng.integers(10, 20 * 60))
+        power[start : start + length] += rng.uniform(50, 400)
+    # Coasting:
+    power[rng.random(duration) < _COASTING_FRACTION] = 0
+    return np.clip(np.rint(power), 0, Activity.MAX_POWER).astype(Activity.POWER_DTYPE)
+
+
+def write_fit_file(path: Path, power: np.ndarray) -> None:
+    """Write power data as the record messages of a .fit activity file.
+
+    Args:
+        path: The path to the .fit file.
+        power: The power data, one sample per second.
+    """
+    encoder = Encoder()
+    encoder.on_mesg(
+        Profile["mesg_num"]["FILE_ID"],
+        {
+            "type": "activity",
+            "manufacturer": "development",
+            "product": 0,
+            "serial_number": 1,
+            "time_created": datetime(2024, 1, 1, tzinfo=UTC),
+        },
+    )
+    for i, p in enumerate(power.tolist()):
+        encoder.on_mesg(
+            Profile["mesg_num"]["RECORD"],
+            {"timestamp": _START_TIMESTAMP + i, "power": p},
+        )
+    path.write_bytes(encoder.close())
+
+
+def synthetic_workout(rng: np.random.Generator) -> str:
+    """Generate a workout of about an hour, as the content of a .zwo file.
+
+    Args:
+        rng: The random generator.
+
+    Returns:
+        The content of the .zwo file.
+    """
+    blocks = ['<Warmup Duration="600" PowerLow="0.25" PowerHigh="0.75"/>']
+    for _ in range(int(rng.integers(5, 15))):
+        kind = int(rng.integers(4))
+        low, high = np.round(rng.uniform(0.4, 1.5, 2), 2).tolist()
+        duration = int(rng.integers(1, 20)) * 30
+        if kind == 0:
+            blocks.append(f'<SteadyState Duration="{duration}" Power="{high}"/>')
+        elif kind == 1:
+            blocks.append(
+                f'<Ramp Duration="{duration}" PowerLow="{low}" PowerHigh="{high}"/>'
+            )
+        elif kind == 2:  # noqa: PLR2004
+            blocks.append(
+                f'<IntervalsT Repeat="{int(rng.integers(2, 10))}" OnDuration="30"'
+                f' OffDuration="90" OnPower="{high}" OffPower="{low}"/>'
+            )
+        else:
+            blocks.append(f'<FreeRide Duration="{duration}"/>')
+    blocks.append('<Cooldown Duration="600" PowerLow="0.75" PowerHigh="0.25"/>')
+
+    return (
+        "<workout_file><sportType>bike</sportType><workout>"
+        + "".join(blocks)
+        + "</workout></workout_file>"
+    )
+
+
+def write_library(directory: Path, size: int, seed: int = SEED) -> list[str]:
+    """Write a library of synthetic .zwo workouts.
+
+    Args:
+        directory: The directory to write the workouts to.
+        size: The number of workouts.
+        seed: The seed of the random generator.
+
+    Returns:
+        The paths to the .zwo files.
+    """
+    rng = np.random.default_rng(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(size):
+        path = directory / f"workout_{i:05d}.zwo"
+        path.write_text(synthetic_workout(rng))
+        paths.append(str(path))
+
+    return paths
+
+
+def _metric_benchmark(name: str, size: str, power: np.ndarray) -> Benchmark:
+    """Create a benchmark of a metric calculation on an array backed activity."""
+    timestamps = np.arange(len(power)) + _START_TIMESTAMP
+
+    def setup() -> Activity:
+        return Activity.from_arrays(timestamps, power, ftp=FTP, validate=False)
+
+    def run(activity: Activity) -> None:
+        getattr(activity, f"calculate_{name}")()
+
+    return Benchmark(f"calculate_{name}/arrays/{size}", setup, run)
+
+
+def _parse_workouts(paths: list[str]) -> None:
+    """Parse the workouts of a library, one at a time."""
+    for path in paths:
+        Workout(file_path=path)
+
+
+def _expand_workouts(workouts: list[Workout]) -> None:
+    """Expand the workouts of a library to activities, one at a time."""
+    for workout in workouts:
+        workout.create_activity_from_workout(FTP)
+        # Release the samples, as a library is processed one workout at a time:
+        workout.timestamps, workout.power = [], []
+
+
+def _workout_metrics(workouts: list[Workout]) -> None:
+    """Calculate the metrics of the workouts of a library from their runs."""
+    for workout in workouts:
+        Workout(blocks=workout.blocks, ftp=FTP).compute(WORKOUT_METRICS)
+
+
+def benchmarks(
+    directory: Path, sizes: Iterable[str], library_sizes: Iterable[int]
+) -> list[Benchmark]:
+    """Create the benchmarks, writing their input files to a directory.
+
+    Args:
+        directory: The directory for the synthetic .fit and .zwo files.
+        sizes: The activity sizes, see `ACTIVITY_SIZES`.
+        library_sizes: The workout library sizes.
+
+    Returns:
+        The benchmarks.
+    """
+    result: list[Benchmark] = []
+    for size in sizes:
+        power = synthetic_power(ACTIVITY_SIZES[size])
+        fit_path = directory / f"activity_{size}.fit"
+        write_fit_file(fit_path, power)
+        for variant, fast in (("fast", True), ("sdk", False)):
+            result.append(
+                Benchmark(
+                    f"parse_activity_file/{variant}/{size}",
+                    lambda: None,
+                    lambda _, fast=fast, path=str(fit_path): Activity(
+                        file_path=path, ftp=FTP, fast_decode=fast
+                    ),
+                )
+            )
+        result.append(
+            Benchmark(
+                f"validate/lists/{size}",
+                lambda power=power: (list(range(1, len(power) + 1)), power.tolist()),
+                lambda samples: Activity(timestamps=samples[0], power=samples[1]),
+            )
+        )
+        result.extend(
+            _metric_benchmark(name, size, power)
+            for name in ("normalized_power", "power_duration_curve", "power_profile")
+        )
+
+    for library_size in library_sizes:
+        paths = write_library(directory / f"library_{library_size}", library_size)
+        result.extend(
+            (
+                Benchmark(
+                    f"parse_workout_file/zwo/{library_size}",
+                    lambda paths=paths: paths,
+                    _parse_workouts,
+                ),
+                Benchmark(
+                    f"create_activity_from_workout/zwo/{library_size}",
+                    lambda paths=paths: [Workout(file_path=p) for p in paths],
+                    _expand_workouts,
+                ),
+                Benchmark(
+                    f"workout_metrics/runs/{library_size}",
+                    lambda paths=paths: [Workout(file_path=p) for p in paths],
+                    _workout_metrics,
+                ),
+            )
+        )
+
+    return result
+
+
+def _time(benchmark: Benchmark) -> float:
+    """Time a single run of a benchmark, excluding its setup."""
+    data = benchmark.setup()
+    start = time.perf_counter()
+    benchmark.run(data)
+    return time.perf_counter() - start
+
+
+def measure(benchmark: Benchmark, repeat: int = DEFAULT_REPEAT) -> Result:
+    """Measure the time and peak memory of a benchmark.
+
+    Each repeat runs the stage as many times as needed to take at least
+    `MIN_REPEAT_TIME`, and the best run is kept, so that short stages are not
+    dominated by noise.
+
+    Args:
+        benchmark: The benchmark.
+        repeat: The number of timed repeats.
+
+    Returns:
+        The best time of a run and the peak memory.
+    """
+    # The first run warms up, and sets the number of runs per repeat:
+    runs = max(1, math.ceil(MIN_REPEAT_TIME / max(_time(benchmark), 1e-9)))
+    best = min(_time(benchmark) for _ in range(runs * repeat))
+
+    # Trace the memory in a separate run, as tracing slows it down:
+    data = benchmark.setup()
+    tracemalloc.start()
+    try:
+        benchmark.run(data)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Result(time=best, peak_memory=peak_memory)
+
+
+def environment() -> dict[str, str]:
+    """Describe the environment the benchmarks are run in."""
+    try:
+        library_version = version("power-metrics-lib")
+    except PackageNotFoundError:
+        library_version = "unknown"
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "power-metrics-lib": library_version,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "system": platform.system(),
+    }
+
+
+def compare(
+    results: dict[str, Result],
+    baseline: dict[str, Result],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> tuple[list[str], list[str]]:
+    """Compare results with a baseline.
+
+    Args:
+        results: The results, by benchmark name.
+        baseline: The baseline results, by benchmark name.
+        threshold: The relative increase of time or memory flagged as a
+            regression, e.g. 0.25 for 25%.
+
+    Returns:
+        The lines of the report, and the names of the regressed benchmarks.
+    """
+    lines = [f"{'benchmark':<45} {'time':>10} {'ratio':>7} {'memory':>10} {'ratio':>7}"]
+    regressions = []
+    for name, result in results.items():
+        line = f"{name:<45} {result.time * 1000:>8.2f}ms"
+        if name not in baseline:
+            lines.append(f"{line} {'':>7} {result.peak_memory / 2**20:>8.2f}MB  (new)")
+            continue
+
+        time_ratio = result.time / baseline[name].time
+        memory_ratio = (result.peak_memory + 1) / (baseline[name].peak_memory + 1)
+        line += f" {time_ratio:>6.2f}x {result.peak_memory / 2**20:>8.2f}MB"
+        line += f" {memory_ratio:>6.2f}x"
+        if time_ratio > 1 + threshold or memory_ratio > 1 + threshold:
+            regressions.append(name)
+            line += "  REGRESSION"
+        elif time_ratio < 1 / (1 + threshold):
+            line += "  faster"
+        lines.append(line)
+
+    return lines, regressions
+
+
+def _read_baseline(path: Path) -> tuple[dict[str, str], dict[str, Result]]:
+    """Read a baseline file, returning its environment and results."""
+    data = json.loads(path.read_text())
+    results = {name: Result(**result) for name, result in data["results"].items()}
+    return data["environment"], results
+
+
+def _write_baseline(path: Path, results: dict[str, Result]) -> None:
+    """Write results to a baseline file."""
+    data = {
+        "environment": environment(),
+        "results": {name: asdict(result) for name, result in results.items()},
+    }
+    path.write_text(json.dumps(data, indent=2) + "\n")
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmarks and report the comparison with the baseline.
+
+    Returns:
+        The exit code, 1 if there are regressions.
+    """
+    parser = argparse.ArgumentParser(description="Run the benchmarks.")
+    parser.add_argument(
+        "--sizes", nargs="+", choices=ACTIVITY_SIZES, default=list(ACTIVITY_SIZES)
+    )
+    parser.add_argument(
+        "--library-sizes", nargs="+", type=int, default=list(LIBRARY_SIZES)
+    )
+    parser.add_argument("--filter", default="", help="Only run matching benchmarks.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument(
+        "--save", action="store_true", help="Store the results as the baseline."
+    )
+    args = parser.parse_args(argv)
+
+    results: dict[str, Result] = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for benchmark in benchmarks(Path(directory), args.sizes, args.library_sizes):
+            if args.filter in benchmark.name:
+                results[benchmark.name] = measure(benchmark, args.repeat)
+                print(f"{benchmark.name}: {results[benchmark.name]}", file=sys.stderr)
+
+    if args.save:
+        _write_baseline(args.baseline, results)
+        print(f"Baseline stored in {args.baseline}")
+        return 0
+
+    baseline_environment: dict[str, str] = {}
+    baseline: dict[str, Result] = {}
+    if args.baseline.exists():
+        baseline_environment, baseline = _read_baseline(args.baseline)
+    # The library version is expected to differ:
+    baseline_environment.pop("power-metrics-lib", None)
+    current_environment = environment()
+    current_environment.pop("power-metrics-lib")
+    if baseline_environment != current_environment:
+        print(
+            f"Warning: the baseline is from another environment: {baseline_environment}"
+        )
+
+    lines, regressions = compare(results, baseline, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,24 @@ This library provides a set of functions to calculate power based metrics from
 either an activity file or a workout.
 """
 
-from .models import Activity, Athlete, Workout
+from .models import (
+    Activity,
+    Athlete,
+    LiveActivity,
+    MeanMaxEnvelope,
+    MeanMaxHistory,
+    SegmentMetrics,
+    TrainingLoad,
+    Workout,
+)
 
-__all__ = ["Activity", "Athlete", "Workout"]
+__all__ = [
+    "Activity",
+    "Athlete",
+    "LiveActivity",
+    "MeanMaxEnvelope",
+    "MeanMaxHistory",
+    "SegmentMetrics",
+    "TrainingLoad",
+    "Workout",
+]
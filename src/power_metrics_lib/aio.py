@@ -0,0 +1,186 @@
+"""Module for loading activity files from asyncio code.
+
+The files are decoded and their metrics calculated in an executor, so that the
+event loop keeps handling other work, with a bounded number of files in
+flight. See also `Activity.aload` and `Activity.acompute`.
+
+Examples:
+    >>> import asyncio
+    >>> from power_metrics_lib import aio
+    >>>
+    >>> # Load a set of .fit files, at most 8 at a time:
+    >>> async def main():
+    ...     paths = ["tests/files/activity.fit", "file_not_found.fit"]
+    ...     return [r async for r in aio.iter_load(paths, ftp=236, concurrency=8)]
+    >>>
+    >>> # Check the activities and the errors:
+    >>> results = sorted(asyncio.run(main()), key=lambda r: r.index)
+    >>> assert results[0].activity.duration == 7023
+    >>> assert isinstance(results[1].error, FileNotFoundError)
+"""
+
+import asyncio
+import functools
+from collections.abc import AsyncGenerator, AsyncIterable, AsyncIterator, Iterable
+from concurrent.futures import Executor
+from dataclasses import dataclass
+
+from power_metrics_lib.cache import ActivityCache
+from power_metrics_lib.models import Activity
+
+DEFAULT_CONCURRENCY = 8
+
+
+@dataclass
+class LoadResult:
+    """The result of loading one file.
+
+    Attributes:
+        index (int): The position of the file in the paths.
+        path (str): The path to the file.
+        activity (Activity): The activity, if successful.
+        error (Exception): The error, if loading failed.
+    """
+
+    index: int
+    path: str
+    activity: Activity | None = None
+    error: Exception | None = None
+
+
+async def _as_async_iterator(
+    paths: Iterable[str] | AsyncIterable[str],
+) -> AsyncIterator[str]:
+    """Iterate over sync or async paths."""
+    if isinstance(paths, AsyncIterable):
+        async for path in paths:
+            yield path
+    else:
+        for path in paths:
+            yield path
+
+
+async def _next_path(paths: AsyncIterator[str]) -> str | None:
+    """Return the next path, or None if there are no more."""
+    return await anext(paths, None)
+
+
+async def _load_file(  # noqa: PLR0913, PLR0917
+    index: int,
+    path: str,
+    ftp: int | None,
+    window_size: int | None,
+    fast_decode: bool,  # noqa: FBT001
+    which: Iterable[str] | None,
+    executor: Executor | None,
+    cache: ActivityCache | None,
+) -> LoadResult:
+    """Load one file, catching any error."""
+    try:
+        if cache is not None:
+            loop = asyncio.get_running_loop()
+            activity = await loop.run_in_executor(
+                executor,
+                functools.partial(
+                    cache.load, path, ftp, window_size, which, fast_decode=fast_decode
+                ),
+            )
+        else:
+            activity = await Activity.aload(
+                path,
+                ftp,
+                window_size,
+                fast_decode=fast_decode,
+                which=which,
+                executor=executor,
+            )
+    except Exception as e:  # noqa: BLE001
+        return LoadResult(index=index, path=path, error=e)
+
+    return LoadResult(index=index, path=path, activity=activity)
+
+
+async def iter_load(  # noqa: PLR0913
+    paths: Iterable[str] | AsyncIterable[str],
+    ftp: int | None = None,
+    window_size: int | None = None,
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    executor: Executor | None = None,
+    fast_decode: bool = True,
+    which: Iterable[str] | None = None,
+    cache: ActivityCache | None = None,
+) -> AsyncGenerator[LoadResult]:
+    """Load activity files concurrently, yielding results as they complete.
+
+    At most `concurrency` files are in flight at any time, and the next path
+    is only taken from `paths` when there is room, so that `paths` can be an
+    unbounded stream, e.g. of uploads. An error in a file is reported in its
+    result and does not stop the iteration.
+
+    Closing the iterator, or cancelling the task iterating over it, cancels
+    the files in flight that have not started in the executor yet.
+
+    Args:
+        paths: The paths to the .fit files, as an iterable or async iterable.
+        ftp: The functional threshold power.
+        window_size: The window size for the normalized power calculation.
+        concurrency: The max number of files in flight.
+        executor: The executor, defaults to the default one of the loop.
+        fast_decode: Decode the .fit files with the record only fast path.
+        which: The metrics to calculate up front, defaults to all.
+        cache: Load the activities and their metrics through a cache.
+
+    Yields:
+        The result of each file, in order of completion.
+
+    Raises:
+        ValueError: If the concurrency is not positive.
+    """
+    if concurrency < 1:
+        msg = "Concurrency must be positive."
+        raise ValueError(msg)
+
+    which = None if which is None else tuple(which)
+    remaining = _as_async_iterator(paths)
+    fetch: asyncio.Task[str | None] | None = asyncio.create_task(_next_path(remaining))
+    pending: set[asyncio.Task[LoadResult]] = set()
+    index = 0
+    try:
+        while fetch is not None or pending:
+            waiting: set[asyncio.Task] = {*pending, fetch} if fetch else {*pending}
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+            if fetch in done:
+                path = fetch.result()
+                fetch = None
+                if path is None:
+                    # No more paths, drain the files in flight:
+                    remaining = None
+                else:
+                    pending.add(
+                        asyncio.create_task(
+                            _load_file(
+                                index,
+                                path,
+                                ftp,
+                                window_size,
+                                fast_decode,
+                                which,
+                                executor,
+                                cache,
+                            )
+                        )
+                    )
+                    index += 1
+
+            for task in done & pending:
+                pending.remove(task)
+                yield task.result()
+
+            if fetch is None and remaining is not None and len(pending) < concurrency:
+                fetch = asyncio.create_task(_next_path(remaining))
+    finally:
+        for task in (*pending, fetch):
+            if task is not None:
+                task.cancel()
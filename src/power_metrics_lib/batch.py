@@ -0,0 +1,243 @@
+"""Module for parallel batch processing of activity files.
+
+Examples:
+    >>> from power_metrics_lib import batch
+    >>>
+    >>> # Process a set of .fit files over a pool of worker processes:
+    >>> paths = ["tests/files/activity.fit", "file_not_found.fit"]
+    >>> result = batch.process(paths, ftp=236, workers=2)
+    >>>
+    >>> # Check the summary table and the errors:
+    >>> assert result.summary["path"].tolist() == ["tests/files/activity.fit"]
+    >>> assert result.summary["duration"].tolist() == [7023]
+    >>> assert "file_not_found.fit" in result.errors
+"""
+
+import os
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from itertools import islice
+
+import numpy as np
+
+from power_metrics_lib.cache import ActivityCache
+from power_metrics_lib.models import Activity
+from power_metrics_lib.profiling import Profiler, StageRecord
+
+# The scalar metrics in the summary table:
+SUMMARY_METRICS = (
+    "duration",
+    "average_power",
+    "normalized_power",
+    "max_power",
+    "intensity_factor",
+    "training_stress_score",
+    "total_work",
+    "variability_index",
+)
+# The summary table column for each power profile duration:
+POWER_PROFILE_COLUMNS = {
+    d: f"power_profile_{d}" for d in Activity.POWER_PROFILE_DURATIONS
+}
+_INTEGER_METRICS = frozenset({"duration", "max_power", "total_work"})
+
+
+@dataclass
+class FileResult:
+    """The result of processing one file.
+
+    Attributes:
+        index (int): The position of the file in the batch.
+        path (str): The path to the file.
+        metrics (dict[str, float]): The summary metrics, if successful.
+        error (str): The error, if processing failed.
+        stages (list[StageRecord]): The stage records, if profiled.
+    """
+
+    index: int
+    path: str
+    metrics: dict[str, float] | None = None
+    error: str | None = None
+    stages: list[StageRecord] = field(default_factory=list)
+
+
+@dataclass
+class BatchResult:
+    """The result of processing a batch of files.
+
+    Attributes:
+        summary (dict[str, np.ndarray]): The summary table, as a column per
+            metric, with one row per successfully processed file in batch
+            order. Power profile durations longer than the activity are NaN.
+        errors (dict[str, str]): The error for each file that failed, by path.
+        profiler (Profiler): The stage records of all the files in batch
+            order, if profiled.
+    """
+
+    summary: dict[str, np.ndarray] = field(default_factory=dict)
+    errors: dict[str, str] = field(default_factory=dict)
+    profiler: Profiler = field(default_factory=Profiler)
+
+
+def summarize(activity: Activity) -> dict[str, float]:
+    """Calculate the summary metrics of an activity.
+
+    Args:
+        activity: The activity.
+
+    Returns:
+        The value of each summary table column, except the path.
+    """
+    metrics: dict[str, float] = {
+        name: getattr(activity, name) for name in SUMMARY_METRICS
+    }
+    power_profile = activity.power_profile
+    for d, column in POWER_PROFILE_COLUMNS.items():
+        metrics[column] = power_profile.get(d, np.nan)
+
+    return metrics
+
+
+def _process_file(  # noqa: PLR0913, PLR0917
+    index: int,
+    path: str,
+    ftp: int | None,
+    window_size: int | None,
+    fast_decode: bool,  # noqa: FBT001
+    cache: ActivityCache | None,
+    profile: bool,  # noqa: FBT001
+) -> FileResult:
+    """Process one file, catching any error."""
+    profiler = Profiler()
+    try:
+        with profiler if profile else nullcontext():
+            if cache is not None:
+                activity = cache.load(
+                    path,
+                    ftp,
+                    window_size,
+                    which=(*SUMMARY_METRICS, "power_profile"),
+                    fast_decode=fast_decode,
+                )
+            else:
+                activity = Activity(
+                    file_path=path,
+                    ftp=ftp,
+                    window_size=window_size,
+                    fast_decode=fast_decode,
+                )
+            metrics = summarize(activity)
+    except Exception as e:  # noqa: BLE001
+        return FileResult(
+            index=index,
+            path=path,
+            error=f"{type(e).__name__}: {e}",
+            stages=profiler.records,
+        )
+
+    return FileResult(index=index, path=path, metrics=metrics, stages=profiler.records)
+
+
+def iter_process(  # noqa: PLR0913
+    paths: Iterable[str],
+    ftp: int | None = None,
+    window_size: int | None = None,
+    workers: int | None = None,
+    *,
+    fast_decode: bool = True,
+    cache: ActivityCache | None = None,
+    profile: bool = False,
+) -> Iterator[FileResult]:
+    """Process activity files in parallel, yielding results as they complete.
+
+    Files are decoded and their metrics calculated in a pool of worker
+    processes. At most a few files per worker are in flight at any time, so
+    that arbitrarily long iterables of paths can be processed. An error in a
+    file is reported in its result and does not abort the batch.
+
+    Args:
+        paths: The paths to the .fit files.
+        ftp: The functional threshold power.
+        window_size: The window size for the normalized power calculation.
+        workers: The number of worker processes, defaults to the number of
+            CPUs. With 1 worker, the files are processed in this process.
+        fast_decode: Decode the .fit files with the record only fast path.
+        cache: Load the activities and their summary metrics through a cache.
+        profile: Record the stages of each file, see `profiling`.
+
+    Yields:
+        The result of each file, in order of completion.
+    """
+    arguments = (
+        (i, path, ftp, window_size, fast_decode, cache, profile)
+        for i, path in enumerate(paths)
+    )
+
+    workers = workers or os.process_cpu_count() or 1
+    if workers == 1:
+        for args in arguments:
+            yield _process_file(*args)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        max_in_flight = 4 * workers
+        pending: set[Future[FileResult]] = {
+            executor.submit(_process_file, *args)
+            for args in islice(arguments, max_in_flight)
+        }
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for args in islice(arguments, len(done)):
+                pending.add(executor.submit(_process_file, *args))
+            for future in done:
+                yield future.result()
+
+
+def process(  # noqa: PLR0913
+    paths: Iterable[str],
+    ftp: int | None = None,
+    window_size: int | None = None,
+    workers: int | None = None,
+    *,
+    fast_decode: bool = True,
+    cache: ActivityCache | None = None,
+    profile: bool = False,
+) -> BatchResult:
+    """Process activity files in parallel into a summary table.
+
+    See `iter_process` for the arguments.
+
+    Returns:
+        The summary table, the errors and the stage records.
+    """
+    file_results = sorted(
+        iter_process(
+            paths,
+            ftp,
+            window_size,
+            workers,
+            fast_decode=fast_decode,
+            cache=cache,
+            profile=profile,
+        ),
+        key=lambda r: r.index,
+    )
+    results: list[FileResult] = []
+    result = BatchResult()
+    for file_result in file_results:
+        result.profiler.records.extend(file_result.stages)
+        if file_result.error is not None:
+            result.errors[file_result.path] = file_result.error
+        else:
+            results.append(file_result)
+
+    result.summary["path"] = np.array([r.path for r in results], dtype=object)
+    for column in (*SUMMARY_METRICS, *POWER_PROFILE_COLUMNS.values()):
+        dtype = np.int64 if column in _INTEGER_METRICS else np.float64
+        result.summary[column] = np.array(
+            [r.metrics[column] for r in results if r.metrics is not None], dtype=dtype
+        )
+
+    return result
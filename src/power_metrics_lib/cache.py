@@ -0,0 +1,249 @@
+"""Module for the on-disk cache of decoded activities and their metrics.
+
+Entries are keyed by the hash of the file content, so a file that is moved or
+copied is still a hit, and a file that is changed is a miss. The decoded
+samples are stored once per file, decoder and library version, and the metrics
+once per file and set of parameters (ftp, window size and library version).
+
+Entries are written to a temporary file and atomically renamed into place, so
+that several processes can share a cache directory. The least recently used
+entries are evicted when the cache grows beyond its max size. The total size
+is kept as a running total of the writes, so the entries are only listed when
+it goes over the max size; entries written by other processes are counted from
+the next listing.
+
+Examples:
+    >>> import tempfile
+    >>> from power_metrics_lib.cache import ActivityCache
+    >>>
+    >>> cache = ActivityCache(tempfile.mkdtemp())
+    >>>
+    >>> # The first load decodes the file and calculates the metrics:
+    >>> activity = cache.load("tests/files/activity.fit", ftp=236)
+    >>>
+    >>> # The second load is read from the cache:
+    >>> cached = cache.load("tests/files/activity.fit", ftp=236)
+    >>> assert cached.normalized_power == activity.normalized_power
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+from collections.abc import Callable, Iterable
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import IO
+
+import numpy as np
+
+from power_metrics_lib.models import Activity
+
+try:
+    _VERSION = version("power-metrics-lib")
+except PackageNotFoundError:  # pragma: no cover
+    _VERSION = "unknown"
+
+DEFAULT_MAX_SIZE = 1 << 30  # 1 GiB
+
+_CHUNK_SIZE = 1 << 20
+
+# Evict down to this fraction of the max size, so that the entries are not
+# listed again until the cache has grown by the rest:
+_EVICT_TO = 0.9
+
+
+class ActivityCache:
+    """On-disk cache of decoded activities and their metrics.
+
+    Attributes:
+        directory (Path): The cache directory.
+        max_size (int): The max total size of the entries in bytes.
+    """
+
+    def __init__(self, directory: str | Path, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        """Initialize the cache, creating the directory if needed."""
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # The running total size of the entries, listed on the first write:
+        self._size: int | None = None
+
+    def load(
+        self,
+        file_path: str,
+        ftp: int | None = None,
+        window_size: int | None = None,
+        which: Iterable[str] | None = None,
+        *,
+        fast_decode: bool = True,
+    ) -> Activity:
+        """Load an activity from a .fit file, through the cache.
+
+        On a miss the file is decoded, and the samples and metrics are stored
+        in the cache.
+
+        Args:
+            file_path: The path to the .fit file.
+            ftp: The functional threshold power.
+            window_size: The window size for the normalized power calculation.
+            which: The metrics to calculate and store on a miss, defaults to all.
+            fast_decode: Decode the .fit file with the record only fast path.
+
+        Returns:
+            The activity, with the cached metrics set.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+        """
+        key = self._hash_file(file_path)
+
+        decoder = json.dumps([fast_decode, _VERSION])
+        samples_key = hashlib.blake2b(decoder.encode(), digest_size=8).hexdigest()
+        samples_path = self.directory / f"samples-{key}-{samples_key}.npz"
+        samples = self._read_samples(samples_path)
+        if samples is None:
+            activity = Activity(
+                file_path=file_path,
+                ftp=ftp,
+                window_size=window_size,
+                fast_decode=fast_decode,
+            )
+            self._write(
+                samples_path,
+                lambda f: np.savez(
+                    f, timestamps=activity.timestamps, power=activity.power
+                ),
+            )
+        else:
+            activity = Activity.from_arrays(
+                samples["timestamps"],
+                samples["power"],
+                ftp=ftp,
+                window_size=window_size,
+                # The samples were validated when they were decoded:
+                validate=False,
+            )
+
+        parameters = json.dumps([ftp, activity.window_size, _VERSION])
+        metrics_key = hashlib.blake2b(parameters.encode(), digest_size=8).hexdigest()
+        metrics_path = self.directory / f"metrics-{key}-{metrics_key}.json"
+        metrics = self._read_metrics(metrics_path)
+        for name, value in metrics.items():
+            setattr(activity, name, value)
+
+        names = Activity.METRICS if which is None else tuple(which)
+        missing = [name for name in names if name not in metrics]
+        if missing:
+            activity.compute(missing)
+            metrics.update({name: getattr(activity, name) for name in missing})
+            self._write(metrics_path, lambda f: f.write(json.dumps(metrics).encode()))
+
+        return activity
+
+    def size(self) -> int:
+        """Return the total size of the entries in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        for path, _, _ in self._entries():
+            path.unlink(missing_ok=True)
+        self._size = None
+
+    def _hash_file(self, file_path: str) -> str:
+        """Hash the content of a file."""
+        digest = hashlib.blake2b(digest_size=16)
+        try:
+            with Path(file_path).open("rb") as f:
+                while chunk := f.read(_CHUNK_SIZE):
+                    digest.update(chunk)
+        except FileNotFoundError as e:
+            msg = f"File not found: {file_path}"
+            raise FileNotFoundError(msg) from e
+
+        return digest.hexdigest()
+
+    def _read_samples(self, path: Path) -> dict[str, np.ndarray] | None:
+        """Read a samples entry, or None if there is no valid entry."""
+        try:
+            with np.load(path) as data:
+                samples = {"timestamps": data["timestamps"], "power": data["power"]}
+            self._touch(path)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+
+        return samples
+
+    def _read_metrics(self, path: Path) -> dict:
+        """Read a metrics entry, or an empty dict if there is no valid entry."""
+        try:
+            metrics = json.loads(path.read_bytes())
+            self._touch(path)
+        except (OSError, ValueError):
+            return {}
+
+        if "power_profile" in metrics:
+            # JSON object keys are strings:
+            metrics["power_profile"] = {
+                int(d): p for d, p in metrics["power_profile"].items()
+            }
+        return {name: v for name, v in metrics.items() if name in Activity.METRICS}
+
+    def _touch(self, path: Path) -> None:
+        """Mark an entry as recently used."""
+        # The entry may have been evicted by another process:
+        with contextlib.suppress(OSError):
+            os.utime(path)
+
+    def _write(self, path: Path, write: Callable[[IO[bytes]], object]) -> None:
+        """Atomically write an entry, and evict entries if the cache is full."""
+        fd, temp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        temp_path = Path(temp_name)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+                entry_size = f.tell()
+            # An entry may be rewritten, e.g. with more metrics:
+            with contextlib.suppress(FileNotFoundError):
+                entry_size -= path.stat().st_size
+            temp_path.replace(path)
+        except BaseException:
+            # Do not leave the temporary file behind:
+            temp_path.unlink(missing_ok=True)
+            raise
+
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += entry_size
+        if self._size > self.max_size:
+            self._evict()
+
+    def _entries(self) -> list[tuple[Path, int, float]]:
+        """List the path, size and last use of the entries."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith((".npz", ".json")):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:  # pragma: no cover
+                continue
+            entries.append((Path(entry.path), stat.st_size, stat.st_mtime))
+
+        return entries
+
+    def _evict(self) -> None:
+        """Remove the least recently used entries until the cache fits."""
+        entries = self._entries()
+        size = sum(size for _, size, _ in entries)
+        if size > self.max_size:
+            for path, entry_size, _ in sorted(entries, key=lambda e: e[2]):
+                if size <= self.max_size * _EVICT_TO:
+                    break
+                path.unlink(missing_ok=True)
+                size -= entry_size
+        self._size = size
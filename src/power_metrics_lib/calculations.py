@@ -0,0 +1,821 @@
+"""Module for vectorized power calculations.
+
+The functions in this module operate on NumPy arrays of power data sampled
+at one sample per second and are used by the models to calculate their
+metrics.
+
+The `*_from_runs` functions operate on run-length encoded power data instead,
+given as the power of each run and its length in seconds, and never expand
+the runs to seconds. Except for the power duration curve, they also accept a
+2D array of run powers, with a row per power level sharing the run lengths,
+and return a result per row.
+
+Examples:
+    >>> import numpy as np
+    >>> from power_metrics_lib.calculations import max_mean_powers
+    >>>
+    >>> power = np.array([100, 200, 300, 200, 100])
+    >>> max_mean_powers(power, [1, 2, 5]).tolist()
+    [300.0, 250.0, 180.0]
+"""
+
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# The max number of elements in the temporary arrays used by the blocked
+# power duration curve calculation (512 KiB of int64 values):
+BLOCK_SIZE = 2**16
+
+# The number of samples per block in the blocked exponential moving average,
+# small enough that the inverse decay powers of a block stay well in range:
+EWMA_BLOCK_SIZE = 128
+
+# The ways to fill the missing seconds when resampling:
+# "zero" fills them with 0 W, "hold" with the power of the previous sample.
+FILLS = ("zero", "hold")
+
+# The number of samples binned at once when calculating the time in zones of
+# many activities:
+ZONES_CHUNK_SIZE = 2**20
+
+# Sentinel for padding the cumulative sums, so that windows reaching past the
+# end of the power data never wins the max:
+_SENTINEL = np.iinfo(np.int64).min // 2
+
+
+def cumulative_power(power: np.ndarray) -> np.ndarray:
+    """Calculate the cumulative sum of the power data, starting with 0.
+
+    The sum of the power in the window `[i, j)` is `c[j] - c[i]`.
+
+    Args:
+        power: The power data.
+
+    Returns:
+        The cumulative sums as int64, one element longer than the power data.
+    """
+    cumulative = np.zeros(len(power) + 1, dtype=np.int64)
+    np.cumsum(power, dtype=np.int64, out=cumulative[1:])
+    return cumulative
+
+
+def rolling_average(power: np.ndarray, window_size: int) -> np.ndarray:
+    """Calculate the rolling average power over full windows.
+
+    Args:
+        power: The power data.
+        window_size: The rolling window size.
+
+    Returns:
+        The average power of each window of `window_size` seconds, one per
+        window end, empty if there are fewer samples than the window size.
+    """
+    if window_size < 1:
+        msg = "Window size must be positive."
+        raise ValueError(msg) from None
+
+    cumulative = cumulative_power(power)
+    sums = cumulative[window_size:] - cumulative[:-window_size]
+    return sums / window_size
+
+
+def normalized_power(power: np.ndarray, window_size: int) -> float:
+    """Calculate the (unrounded) normalized power.
+
+    Args:
+        power: The power data.
+        window_size: The rolling window size.
+
+    Returns:
+        The fourth root of the mean of the rolling average power to the
+        fourth, or 0 if there are fewer samples than the window size.
+    """
+    rolling = rolling_average(power, window_size)
+    if not rolling.size:
+        return 0.0
+
+    return float(np.mean(rolling**4) ** 0.25)
+
+
+def max_table(power: np.ndarray) -> np.ndarray:
+    """Build a sparse table for range max queries.
+
+    Row `j` holds the max power of the window of `2**j` seconds starting at
+    each second, padded with 0 where the window runs past the end.
+
+    Args:
+        power: The non-negative power data.
+
+    Returns:
+        The table, with a row per power of 2 up to the length of the data.
+    """
+    n = len(power)
+    levels = max(n, 1).bit_length()
+    table = np.zeros((levels, n), dtype=np.asarray(power).dtype)
+    table[0] = power
+    for j in range(1, levels):
+        half = 1 << (j - 1)
+        np.maximum(
+            table[j - 1, : n - half], table[j - 1, half:], out=table[j, : n - half]
+        )
+
+    return table
+
+
+def range_max(table: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Return the max power of the ranges `[start, end)` in O(1) each.
+
+    Args:
+        table: The sparse table of the power data, see `max_table`.
+        starts: The start of each range.
+        ends: The end of each range, at least its start.
+
+    Returns:
+        The max power of each range.
+    """
+    lengths = ends - starts
+    if not table.size:
+        return np.zeros(np.shape(lengths), dtype=table.dtype)
+
+    # The largest power of 2 within each range, two such windows cover it:
+    level = np.frexp(np.maximum(lengths, 1))[1] - 1
+    first = np.minimum(starts, table.shape[1] - 1)
+    last = np.maximum(ends - (1 << level), 0)
+    maxima = np.maximum(table[level, first], table[level, last])
+    return np.where(lengths > 0, maxima, 0)
+
+
+def max_mean_powers(power: np.ndarray, durations: Iterable[int]) -> np.ndarray:
+    """Calculate the max mean power for each of the given durations.
+
+    Args:
+        power: The power data.
+        durations: The durations in seconds, each between 1 and len(power).
+
+    Returns:
+        The max mean power for each of the durations.
+
+    Raises:
+        ValueError: If a duration is out of range.
+    """
+    _durations = np.fromiter(durations, dtype=np.int64)
+    n = len(power)
+    if np.any((_durations < 1) | (_durations > n)):
+        msg = f"Durations must be between 1 and {n}."
+        raise ValueError(msg) from None
+
+    cumulative = cumulative_power(power)
+    max_sums = np.empty(len(_durations), dtype=np.int64)
+    for i, duration in enumerate(_durations.tolist()):
+        max_sums[i] = np.max(cumulative[duration:] - cumulative[:-duration])
+
+    return max_sums / _durations
+
+
+def max_mean_power_curve(
+    power: np.ndarray, max_duration: int | None = None, block_size: int = BLOCK_SIZE
+) -> np.ndarray:
+    """Calculate the max mean power for every duration from 1 to max_duration.
+
+    The window sums are taken from a single cumulative sum array. Consecutive
+    durations are processed in blocks, where each block is one vectorized
+    operation over a (durations x windows) view of the cumulative sums. The
+    number of durations in a block is chosen so that the temporary array never
+    holds more than `block_size` elements.
+
+    Args:
+        power: The power data.
+        max_duration: The longest duration, defaults to len(power).
+        block_size: The max number of elements in the temporary array.
+
+    Returns:
+        The max mean power, where element `d - 1` is the value for duration `d`.
+    """
+    n = len(power)
+    max_duration = n if max_duration is None else min(max_duration, n)
+    if max_duration < 1:
+        return np.empty(0, dtype=np.float64)
+
+    cumulative = cumulative_power(power)
+    # Pad with sentinels, so that every block can be viewed as a full matrix:
+    padded = np.concatenate((cumulative, np.full(n, _SENTINEL, dtype=np.int64)))
+    buffer = np.empty(max(block_size, n), dtype=np.int64)
+    max_sums = np.empty(max_duration, dtype=np.int64)
+
+    duration = 1
+    while duration <= max_duration:
+        windows = n - duration + 1
+        durations = max(1, min(max_duration - duration + 1, block_size // windows))
+        # ends[j, i] is the cumulative sum at the end of window i for
+        # duration `duration + j`:
+        ends = sliding_window_view(padded[duration : n + durations], windows)
+        sums = buffer[: durations * windows].reshape(durations, windows)
+        np.subtract(ends, cumulative[None, :windows], out=sums)
+        sums.max(axis=1, out=max_sums[duration - 1 : duration - 1 + durations])
+        duration += durations
+
+    return max_sums / np.arange(1, max_duration + 1)
+
+
+def compact_runs(
+    values: np.ndarray, lengths: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Drop empty runs and merge consecutive runs with the same power.
+
+    Args:
+        values: The power of each run.
+        lengths: The length of each run in seconds.
+
+    Returns:
+        The power and length of the compacted runs.
+    """
+    non_empty = lengths > 0
+    values = values[non_empty]
+    lengths = lengths[non_empty]
+    if not values.size:
+        return values, lengths
+
+    starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+    return values[starts], np.add.reduceat(lengths, starts)
+
+
+def _as_runs(
+    values: np.ndarray, lengths: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the runs as int64, and the cumulative sum at each run boundary.
+
+    A single row of runs is compacted first.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    if values.ndim == 1:
+        values, lengths = compact_runs(values, lengths)
+
+    cumulative = np.zeros((*values.shape[:-1], values.shape[-1] + 1), np.int64)
+    np.cumsum(values * lengths, axis=-1, out=cumulative[..., 1:])
+    return values, lengths, cumulative
+
+
+def _runs_are_dense(boundaries: np.ndarray) -> bool:
+    """Check if the runs are too short for the run-based calculations to pay off.
+
+    A dense calculation evaluates about n / 2 windows per duration, and a
+    run-based one 2 candidate windows per run, where a candidate costs about
+    as much as 8 dense windows. Ramps are encoded as one run per second, so
+    they are dense.
+    """
+    return 16 * len(boundaries) >= boundaries[-1] / 2
+
+
+def _expanded_cumulative(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Expand the runs to the cumulative sum of every second, per row of values."""
+    power = np.repeat(values, lengths, axis=-1)
+    cumulative = np.zeros((*power.shape[:-1], power.shape[-1] + 1), np.int64)
+    np.cumsum(power, axis=-1, out=cumulative[..., 1:])
+    return cumulative
+
+
+def _cumulative_at(
+    x: np.ndarray, boundaries: np.ndarray, cumulative: np.ndarray, values: np.ndarray
+) -> np.ndarray:
+    """Evaluate the cumulative sum of run-length encoded power at positions x."""
+    run = np.searchsorted(boundaries, x, side="right") - 1
+    np.minimum(run, values.shape[-1] - 1, out=run)
+    return cumulative[..., run] + values[..., run] * (x - boundaries[run])
+
+
+def _max_sums_from_runs(
+    values: np.ndarray, lengths: np.ndarray, durations: np.ndarray
+) -> np.ndarray:
+    """Calculate the max window sum for each duration from runs.
+
+    The window sum is piecewise linear in the window start, so its max is
+    reached where the window starts or ends at a run boundary. Only those
+    candidate windows are evaluated, unless the runs are dense.
+    """
+    values, lengths, cumulative = _as_runs(values, lengths)
+    boundaries = cumulative_power(lengths)
+    if _runs_are_dense(boundaries):
+        cumulative = _expanded_cumulative(values, lengths)
+        max_sums = np.empty((*values.shape[:-1], len(durations)), dtype=np.int64)
+        for i, duration in enumerate(durations.tolist()):
+            np.max(
+                cumulative[..., duration:] - cumulative[..., :-duration],
+                axis=-1,
+                out=max_sums[..., i],
+            )
+        return max_sums
+
+    n = boundaries[-1]
+    column = durations[:, None]
+    starts = np.concatenate(
+        (
+            np.broadcast_to(boundaries, (len(durations), len(boundaries))),
+            boundaries - column,
+        ),
+        axis=1,
+    )
+    np.clip(starts, 0, n - column, out=starts)
+    sums = _cumulative_at(starts + column, boundaries, cumulative, values)
+    sums -= _cumulative_at(starts, boundaries, cumulative, values)
+    return sums.max(axis=-1)
+
+
+def max_mean_powers_from_runs(
+    values: np.ndarray, lengths: np.ndarray, durations: Iterable[int]
+) -> np.ndarray:
+    """Calculate the max mean power for each of the given durations from runs.
+
+    Args:
+        values: The integer power of each run, or a row of them per power level.
+        lengths: The length of each run in seconds.
+        durations: The durations in seconds, each between 1 and the total
+            length of the runs.
+
+    Returns:
+        The max mean power for each of the durations, per row of values.
+
+    Raises:
+        ValueError: If a duration is out of range.
+    """
+    _durations = np.fromiter(durations, dtype=np.int64)
+    n = int(np.sum(lengths))
+    if np.any((_durations < 1) | (_durations > n)):
+        msg = f"Durations must be between 1 and {n}."
+        raise ValueError(msg) from None
+
+    return _max_sums_from_runs(values, lengths, _durations) / _durations
+
+
+def max_mean_power_curve_from_runs(
+    values: np.ndarray,
+    lengths: np.ndarray,
+    max_duration: int | None = None,
+    block_size: int = BLOCK_SIZE,
+) -> np.ndarray:
+    """Calculate the max mean power for every duration from runs.
+
+    Each duration only evaluates the two candidate windows per run starting or
+    ending at the run boundaries, rather than every window. When there are too
+    many runs for that to pay off, `max_mean_power_curve` is used instead.
+
+    Args:
+        values: The integer power of each run.
+        lengths: The length of each run in seconds.
+        max_duration: The longest duration, defaults to the total length.
+        block_size: The max number of elements in the temporary arrays.
+
+    Returns:
+        The max mean power, where element `d - 1` is the value for duration `d`.
+    """
+    values, lengths = compact_runs(
+        np.asarray(values, dtype=np.int64), np.asarray(lengths, dtype=np.int64)
+    )
+    power = np.repeat(values, lengths)
+    n = len(power)
+    max_duration = n if max_duration is None else min(max_duration, n)
+    if max_duration < 1:
+        return np.empty(0, dtype=np.float64)
+
+    boundaries = cumulative_power(lengths)
+    if _runs_are_dense(boundaries):
+        return max_mean_power_curve(power, max_duration, block_size)
+
+    cumulative = cumulative_power(power)
+    durations = np.arange(1, max_duration + 1)
+    max_sums = np.empty(max_duration, dtype=np.int64)
+    step = max(1, block_size // (2 * len(boundaries)))
+    for start in range(0, max_duration, step):
+        column = durations[start : start + step, None]
+        starts = np.concatenate(
+            (
+                np.broadcast_to(boundaries, (len(column), len(boundaries))),
+                boundaries - column,
+            ),
+            axis=1,
+        )
+        np.clip(starts, 0, n - column, out=starts)
+        sums = cumulative[starts + column] - cumulative[starts]
+        sums.max(axis=1, out=max_sums[start : start + step])
+
+    return max_sums / durations
+
+
+def normalized_power_from_runs(
+    values: np.ndarray, lengths: np.ndarray, window_size: int
+) -> np.ndarray:
+    """Calculate the (unrounded) normalized power from runs.
+
+    The rolling average power is piecewise linear in the window end, with
+    breakpoints where the window starts or ends at a run boundary. The sum of
+    the rolling average to the fourth over each linear piece is calculated in
+    closed form from the sums of powers of integers. When the runs are too
+    short for that to pay off, e.g. for ramps, they are expanded instead.
+
+    Args:
+        values: The integer power of each run, or a row of them per power level.
+        lengths: The length of each run in seconds.
+        window_size: The rolling window size, at most the total length.
+
+    Returns:
+        The normalized power, per row of values.
+    """
+    values, lengths, cumulative = _as_runs(values, lengths)
+    boundaries = cumulative_power(lengths)
+    n = int(boundaries[-1])
+    if _runs_are_dense(boundaries):
+        cumulative = _expanded_cumulative(values, lengths)
+        rolling = (cumulative[..., window_size:] - cumulative[..., :-window_size]) / (
+            window_size
+        )
+        return np.mean(rolling**4, axis=-1) ** 0.25
+
+    # The rolling sum for the window ending at second t is
+    # C(t + 1) - C(t + 1 - window_size), a linear piece starts at each t where
+    # one of them is at a run boundary:
+    breaks = np.unique(
+        np.concatenate(
+            ([window_size - 1, n], boundaries - 1, boundaries + window_size - 1)
+        )
+    )
+    breaks = breaks[(breaks >= window_size - 1) & (breaks <= n)]
+    first, end = breaks[:-1], breaks[1:]
+    last = end - 1
+
+    def rolling_average(t: np.ndarray) -> np.ndarray:
+        sums = _cumulative_at(t + 1, boundaries, cumulative, values)
+        sums -= _cumulative_at(t + 1 - window_size, boundaries, cumulative, values)
+        return sums / window_size
+
+    # Each piece is a + b * k for k in [0, count):
+    count = (end - first).astype(np.float64)
+    a = rolling_average(first)
+    b = (rolling_average(last) - a) / np.maximum(count - 1, 1)
+    # The sums of k ** j for k in [0, count):
+    k = count - 1
+    s1 = k * count / 2
+    s2 = k * count * (2 * k + 1) / 6
+    s3 = s1**2
+    s4 = k * count * (2 * k + 1) * (3 * k**2 + 3 * k - 1) / 30
+    fourth_powers = (
+        a**4 * count
+        + 4 * a**3 * b * s1
+        + 6 * a**2 * b**2 * s2
+        + 4 * a * b**3 * s3
+        + b**4 * s4
+    )
+
+    return (fourth_powers.sum(axis=-1) / (n - window_size + 1)) ** 0.25
+
+
+def exponential_moving_average(
+    values: np.ndarray,
+    alpha: float,
+    initial: float | np.ndarray = 0.0,
+    block_size: int = EWMA_BLOCK_SIZE,
+) -> np.ndarray:
+    """Calculate the exponential moving average of the values.
+
+    The average is `y[t] = y[t - 1] + alpha * (x[t] - y[t - 1])`. Within a
+    block of values the recurrence is solved in closed form with `d = 1 -
+    alpha`, as the cumulative sum
+    `y[i] = d ** (i + 1) * (y[-1] + alpha * sum(x[j] / d ** (j + 1) for j <= i))`.
+    Only the last value of each block is carried over to the next one.
+
+    Args:
+        values: The values, along the last axis.
+        alpha: The smoothing factor, between 0 (exclusive) and 1.
+        initial: The average before the first value, per row of values.
+        block_size: The number of values per block.
+
+    Returns:
+        The exponential moving average of the values.
+
+    Raises:
+        ValueError: If alpha is out of range.
+    """
+    if not 0 < alpha <= 1:
+        msg = "Alpha must be between 0 (exclusive) and 1."
+        raise ValueError(msg) from None
+
+    values = np.asarray(values, dtype=np.float64)
+    average = np.empty_like(values)
+    previous = np.broadcast_to(np.asarray(initial, dtype=np.float64), values.shape[:-1])
+    if alpha == 1:
+        average[...] = values
+        return average
+
+    # Keep the inverse decay powers below 1e100:
+    block_size = max(1, min(block_size, int(-100 / np.log10(1 - alpha))))
+    decay = (1 - alpha) ** np.arange(1, block_size + 1)
+    for start in range(0, values.shape[-1], block_size):
+        block = values[..., start : start + block_size]
+        powers = decay[: block.shape[-1]]
+        average[..., start : start + block_size] = powers * (
+            previous[..., None] + alpha * np.cumsum(block / powers, axis=-1)
+        )
+        previous = average[..., start + block.shape[-1] - 1]
+
+    return average
+
+
+def resample(
+    timestamps: Sequence[int] | np.ndarray,
+    power: Sequence[int] | np.ndarray,
+    fill: str = "zero",
+    max_gap: int | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Resample power data to one sample per second.
+
+    Gaps between samples, e.g. from smart recording, pauses or dropouts, are
+    filled as given by `fill`. Gaps longer than `max_gap` seconds are treated
+    as pauses and dropped, so that the next sample directly follows the one
+    before the pause. If there are several samples in one second, the last one
+    is kept.
+
+    Args:
+        timestamps: The timestamps in seconds, non-decreasing.
+        power: The power data.
+        fill: How to fill the missing seconds, see `FILLS`.
+        max_gap: The longest gap in seconds to fill, defaults to no limit.
+
+    Returns:
+        The resampled timestamps and power data.
+
+    Raises:
+        ValueError: If the fill is unknown, the lengths differ or the
+            timestamps are decreasing.
+    """
+    if fill not in FILLS:
+        msg = f"Unknown fill: {fill}"
+        raise ValueError(msg) from None
+    timestamps = np.asarray(timestamps)
+    power = np.asarray(power)
+    if len(timestamps) != len(power):
+        msg = "Timestamps and power data must have the same length."
+        raise ValueError(msg) from None
+    if not len(timestamps):
+        return timestamps, power
+
+    steps = np.diff(timestamps.astype(np.int64))
+    if np.any(steps < 0):
+        msg = "Timestamps must be non-decreasing."
+        raise ValueError(msg) from None
+
+    # Keep the last sample of each second:
+    last = np.append(steps > 0, True)
+    timestamps, power = timestamps[last], power[last]
+    gaps = np.append(steps[steps > 0] - 1, 0)
+    if max_gap is not None:
+        gaps[gaps > max_gap] = 0
+
+    # Each sample is followed by the seconds filling its gap:
+    repeats = gaps + 1
+    starts = np.repeat(cumulative_power(repeats)[:-1], repeats)
+    offsets = np.arange(int(repeats.sum())) - starts
+    resampled_timestamps = np.repeat(timestamps, repeats) + offsets.astype(
+        timestamps.dtype
+    )
+    resampled_power = np.repeat(power, repeats)
+    if fill == "zero":
+        resampled_power[offsets > 0] = 0
+
+    return resampled_timestamps, resampled_power
+
+
+def time_in_zones(power: np.ndarray, edges: Sequence[float] | np.ndarray) -> np.ndarray:
+    """Calculate the time in each power zone.
+
+    Zone 0 is below the first edge, and zone i is from edge i - 1 (inclusive)
+    to edge i (exclusive).
+
+    Args:
+        power: The power data.
+        edges: The lower power of each zone but the first, increasing.
+
+    Returns:
+        The number of samples in each zone, one more than the edges.
+    """
+    zones = np.searchsorted(np.asarray(edges, dtype=np.float64), power, side="right")
+    return np.bincount(zones, minlength=len(edges) + 1)
+
+
+def _zone_counts_from_histogram(
+    power: np.ndarray, row: np.ndarray, edges: np.ndarray
+) -> np.ndarray:
+    """Count the integer power samples of each row in each zone.
+
+    The samples are counted per row and watt, and the zones are read from the
+    cumulative counts at the edges.
+    """
+    rows = len(edges)
+    span = int(power.max(initial=0)) + 1
+    histogram = np.bincount(row * span + power, minlength=rows * span)
+    # below[:, j] is the number of samples below j watts:
+    below = np.zeros((rows, span + 1), dtype=np.int64)
+    np.cumsum(histogram.reshape(rows, span), axis=1, out=below[:, 1:])
+    indices = np.clip(np.ceil(edges), 0, span).astype(np.int64)
+    return np.diff(
+        np.concatenate(
+            (
+                np.zeros((rows, 1), dtype=np.int64),
+                np.take_along_axis(below, indices, axis=1),
+                below[:, -1:],
+            ),
+            axis=1,
+        ),
+        axis=1,
+    )
+
+
+def _zone_counts_from_search(
+    power: np.ndarray, row: np.ndarray, edges: np.ndarray
+) -> np.ndarray:
+    """Count the power samples of each row in each zone.
+
+    The power and edges of each row are offset past those of the row before,
+    so that a single sorted search bins all the rows.
+    """
+    rows, num_edges = edges.shape
+    span = max(power.max(initial=0), edges.max(initial=0)) + 1
+    offsets = np.arange(rows) * span
+    zones = np.searchsorted(
+        (edges + offsets[:, None]).ravel(), power + offsets[row], side="right"
+    )
+    # From the index in all the edges, to a unique index per row and zone:
+    zones += row
+    counts = np.bincount(zones, minlength=rows * (num_edges + 1))
+    return counts.reshape(rows, num_edges + 1)
+
+
+def time_in_zones_batch(
+    powers: Iterable[np.ndarray | Sequence[int]],
+    edges: Sequence[float] | Sequence[Sequence[float]] | np.ndarray,
+    chunk_size: int = ZONES_CHUNK_SIZE,
+) -> np.ndarray:
+    """Calculate the time in each power zone of many activities.
+
+    The power data of many activities is binned together, a chunk of about
+    `chunk_size` samples at a time, so that the cost per activity is small.
+    Integer power data is counted per watt, unless the activities are so short
+    that binning them with a sorted search is cheaper.
+
+    Args:
+        powers: The non-negative power data of each activity.
+        edges: The non-negative zone edges, see `time_in_zones`. Either the
+            same edges for all activities, or a row of edges per activity.
+        chunk_size: The number of samples to bin at once.
+
+    Returns:
+        The number of samples in each zone, with a row per activity.
+
+    Raises:
+        ValueError: If there are fewer rows of edges than activities.
+    """
+    edges = np.asarray(edges, dtype=np.float64)
+    num_zones = edges.shape[-1] + 1
+    counts: list[np.ndarray] = [np.zeros((0, num_zones), dtype=np.int64)]
+    chunk: list[np.ndarray] = []
+    first = size = 0
+
+    def flush() -> None:
+        if edges.ndim == 1:
+            chunk_edges = np.broadcast_to(edges, (len(chunk), num_zones - 1))
+        else:
+            chunk_edges = edges[first : first + len(chunk)]
+            if len(chunk_edges) < len(chunk):
+                msg = "There must be a row of edges for each activity."
+                raise ValueError(msg) from None
+
+        row = np.repeat(np.arange(len(chunk)), [len(p) for p in chunk])
+        power = np.concatenate(chunk)
+        if power.dtype.kind in "iu" and (
+            len(chunk) * (int(power.max(initial=0)) + 1) <= 4 * len(power)
+        ):
+            counts.append(_zone_counts_from_histogram(power, row, chunk_edges))
+        else:
+            counts.append(_zone_counts_from_search(power, row, chunk_edges))
+
+    for power in powers:
+        chunk.append(np.asarray(power))
+        size += len(chunk[-1])
+        if size >= chunk_size:
+            flush()
+            first += len(chunk)
+            chunk.clear()
+            size = 0
+    if chunk:
+        flush()
+
+    return np.concatenate(counts)
+
+
+def power_histogram(power: np.ndarray, bin_width: int = 10) -> np.ndarray:
+    """Calculate the histogram of the power data.
+
+    Args:
+        power: The non-negative power data.
+        bin_width: The width of the bins in watts.
+
+    Returns:
+        The number of samples in each bin, bin i is from i * bin_width
+        (inclusive) to (i + 1) * bin_width (exclusive), up to the max power.
+
+    Raises:
+        ValueError: If the bin width is not positive.
+    """
+    if bin_width <= 0:
+        msg = "Bin width must be positive."
+        raise ValueError(msg) from None
+
+    power = np.asarray(power)
+    if np.issubdtype(power.dtype, np.floating):
+        return np.bincount(np.floor(power / bin_width).astype(np.int64))
+    return np.bincount(power // bin_width)
+
+
+def centered_average(power: np.ndarray, window_size: int) -> np.ndarray:
+    """Smooth the power data with a centered moving average.
+
+    The window is clipped at both ends of the power data.
+
+    Args:
+        power: The power data.
+        window_size: The window size in seconds.
+
+    Returns:
+        The average power of the window centered on each second.
+
+    Raises:
+        ValueError: If the window size is not positive.
+    """
+    if window_size < 1:
+        msg = "Window size must be positive."
+        raise ValueError(msg) from None
+
+    n = len(power)
+    cumulative = cumulative_power(power)
+    seconds = np.arange(n)
+    low = np.maximum(seconds - window_size // 2, 0)
+    high = np.minimum(low + window_size, n)
+    low = np.maximum(high - window_size, 0)
+    return (cumulative[high] - cumulative[low]) / (high - low)
+
+
+def detect_intervals(  # noqa: PLR0913
+    power: np.ndarray,
+    on: float,
+    off: float,
+    *,
+    smoothing: int = 1,
+    max_gap: int = 0,
+    min_duration: int = 1,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Detect the intervals above a power threshold, with hysteresis.
+
+    An interval starts when the smoothed power reaches `on`, and ends when it
+    drops below `off`. Intervals separated by at most `max_gap` seconds are
+    merged, and the intervals shorter than `min_duration` are dropped.
+
+    Args:
+        power: The power data.
+        on: The power an interval starts at.
+        off: The power an interval ends below, at most `on`.
+        smoothing: The window size of the centered moving average.
+        max_gap: The longest gap between intervals that are merged.
+        min_duration: The shortest interval.
+
+    Returns:
+        The first second of each interval, and the second after its end.
+
+    Raises:
+        ValueError: If `off` is above `on`, or the smoothing is not positive.
+    """
+    if off > on:
+        msg = "The off threshold must not be above the on threshold."
+        raise ValueError(msg) from None
+
+    smoothed = centered_average(power, smoothing)
+    # The state is set at the seconds above `on` or below `off`, and held
+    # in between:
+    above = smoothed >= on
+    changes = np.flatnonzero(above | (smoothed < off))
+    latest = np.full(len(smoothed), -1)
+    latest[changes] = changes
+    np.maximum.accumulate(latest, out=latest)
+    active = np.zeros(len(smoothed) + 2, dtype=np.int8)
+    active[1:-1] = (latest >= 0) & above[latest]
+
+    edges = np.flatnonzero(np.diff(active))
+    starts, ends = edges[::2], edges[1::2]
+
+    # An interval is kept separate if the gap after the previous one is long:
+    separate = np.ones(len(starts), dtype=bool)
+    separate[1:] = starts[1:] - ends[:-1] > max_gap
+    starts = starts[separate]
+    ends = ends[np.roll(separate, -1)]
+
+    long_enough = ends - starts >= min_duration
+    return starts[long_enough], ends[long_enough]
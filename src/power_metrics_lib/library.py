@@ -0,0 +1,311 @@
+"""Module for an indexed library of workouts.
+
+The library indexes the .zwo files of a directory: the metrics of each
+workout at a reference FTP, and its blocks in the compact block array format.
+The index is persisted in the directory, so queries and workouts are served
+from it without reparsing the files. A refresh only reparses the files whose
+content changed.
+
+The intensity factor and training stress score hardly depend on the FTP
+(only through rounding of the power), and the power metrics scale with it,
+so the metrics at the reference FTP can be queried for any athlete.
+
+Examples:
+    >>> import shutil
+    >>> import tempfile
+    >>> from power_metrics_lib.library import WorkoutLibrary
+    >>>
+    >>> directory = tempfile.mkdtemp()
+    >>> _ = shutil.copy("tests/files/mosaic.zwo", directory)
+    >>> _ = shutil.copy("tests/files/zwift_workout.zwo", directory)
+    >>>
+    >>> # Index the .zwo files of the directory:
+    >>> library = WorkoutLibrary(directory)
+    >>> library.refresh()
+    ['mosaic.zwo', 'zwift_workout.zwo']
+    >>>
+    >>> # Query the index, e.g. workouts of 45 to 60 minutes sorted by TSS:
+    >>> rows = library.query(
+    ...     duration=(45 * 60, 60 * 60),
+    ...     intensity_factor=(0.7, 0.9),
+    ...     sort_by="training_stress_score",
+    ... )
+    >>> assert rows["path"].tolist() == ["zwift_workout.zwo"]
+    >>>
+    >>> # Create a workout from the index, without parsing the file:
+    >>> workout = library.workout("zwift_workout.zwo", ftp=200)
+    >>> assert workout.duration == 3360
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from power_metrics_lib.models.workout import (
+    BLOCK_DTYPE,
+    Workout,
+    blocks_from_array,
+    blocks_to_array,
+)
+
+REFERENCE_FTP = 250
+
+# The metrics in the index, calculated at the reference FTP:
+METRICS = (
+    "duration",
+    "average_power",
+    "normalized_power",
+    "max_power",
+    "intensity_factor",
+    "training_stress_score",
+    "total_work",
+    "variability_index",
+)
+
+# The dtype of each index column:
+COLUMNS: dict[str, type] = {
+    "path": np.str_,
+    "mtime_ns": np.int64,
+    "size": np.int64,
+    "hash": np.str_,
+    **{
+        name: np.int64
+        if name in {"duration", "max_power", "total_work"}
+        else np.float64
+        for name in METRICS
+    },
+}
+
+_CHUNK_SIZE = 1 << 20
+
+
+def _hash_file(file_path: Path) -> str:
+    """Hash the content of a file."""
+    digest = hashlib.blake2b(digest_size=16)
+    with file_path.open("rb") as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class WorkoutLibrary:
+    """Indexed library of the .zwo files of a directory.
+
+    The index has a row per workout, with the columns of `COLUMNS`: the path
+    relative to the directory, the modification time, size and hash of the
+    file, and the metrics of `METRICS` at the reference FTP.
+
+    Attributes:
+        directory (Path): The directory of .zwo files, including subdirectories.
+        reference_ftp (int): The FTP the metrics are calculated at.
+        index_path (Path): The path to the persisted index.
+        errors (dict[str, str]): The error for each file that failed to parse
+            in the last refresh, by path.
+    """
+
+    INDEX_FILE = ".workout_index.npz"
+    FORMAT_VERSION = 1
+
+    def __init__(
+        self,
+        directory: str | Path,
+        reference_ftp: int = REFERENCE_FTP,
+        index_path: str | Path | None = None,
+    ) -> None:
+        """Initialize the library, loading the persisted index if compatible.
+
+        An index persisted with another reference FTP or format version is
+        discarded, and rebuilt on the next refresh.
+        """
+        self.directory = Path(directory)
+        self.reference_ftp = reference_ftp
+        self.index_path = (
+            self.directory / self.INDEX_FILE if index_path is None else Path(index_path)
+        )
+        self.errors: dict[str, str] = {}
+        self._index: dict[str, np.ndarray] = self._empty_index()
+        self._blocks: list[np.ndarray] = []
+        self._load_index()
+
+    def __len__(self) -> int:
+        """Return the number of workouts."""
+        return len(self._index["path"])
+
+    def _empty_index(self) -> dict[str, np.ndarray]:
+        """Return an index without rows."""
+        return {name: np.array([], dtype=dtype) for name, dtype in COLUMNS.items()}
+
+    def _load_index(self) -> None:
+        """Load the persisted index, if any and compatible."""
+        try:
+            with np.load(self.index_path) as data:
+                if data["format_version"] != self.FORMAT_VERSION or (
+                    data["reference_ftp"] != self.reference_ftp
+                ):
+                    return
+                index = {name: data[name] for name in COLUMNS}
+                blocks, offsets = data["blocks"], data["block_offsets"]
+        except (OSError, ValueError, KeyError):
+            return
+
+        self._index = index
+        # Splitting at no offsets would give a single empty block array:
+        self._blocks = np.split(blocks, offsets[1:-1]) if len(offsets) > 1 else []
+
+    def _save_index(self) -> None:
+        """Atomically persist the index."""
+        offsets = np.zeros(len(self._blocks) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in self._blocks], out=offsets[1:])
+        fd, temp_name = tempfile.mkstemp(dir=self.index_path.parent, suffix=".tmp")
+        temp_path = Path(temp_name)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    allow_pickle=False,
+                    format_version=self.FORMAT_VERSION,
+                    reference_ftp=self.reference_ftp,
+                    blocks=np.concatenate([np.empty(0, BLOCK_DTYPE), *self._blocks]),
+                    block_offsets=offsets,
+                    **self._index,
+                )
+            temp_path.replace(self.index_path)
+        except BaseException:
+            # Do not leave the temporary file behind:
+            temp_path.unlink(missing_ok=True)
+            raise
+
+    def _parse(self, file_path: Path) -> tuple[dict[str, float], np.ndarray]:
+        """Parse a .zwo file into its metrics and block array."""
+        workout = Workout(file_path=str(file_path))
+        metrics = workout.metrics_for_ftps([self.reference_ftp])
+        return (
+            {name: float(metrics[name][0]) for name in METRICS},
+            blocks_to_array(workout.blocks),
+        )
+
+    def refresh(self) -> list[str]:
+        """Bring the index up to date with the directory, and persist it.
+
+        A file is only reparsed if its modification time or size changed and
+        the hash of its content does not match the index. Files that were
+        removed are dropped, and files that fail to parse are reported in
+        `errors` and left out of the index.
+
+        Returns:
+            The paths of the files that were parsed, sorted.
+        """
+        rows = {path: i for i, path in enumerate(self._index["path"].tolist())}
+        index: dict[str, list] = {name: [] for name in COLUMNS}
+        blocks: list[np.ndarray] = []
+        parsed: list[str] = []
+        self.errors = {}
+
+        for file_path in sorted(self.directory.rglob("*.zwo")):
+            path = file_path.relative_to(self.directory).as_posix()
+            stat = file_path.stat()
+            row = rows.get(path)
+            if row is not None and (
+                self._index["mtime_ns"][row] == stat.st_mtime_ns
+                and self._index["size"][row] == stat.st_size
+            ):
+                file_hash = str(self._index["hash"][row])
+            else:
+                file_hash = _hash_file(file_path)
+
+            if row is not None and self._index["hash"][row] == file_hash:
+                metrics = {name: self._index[name][row] for name in METRICS}
+                block_array = self._blocks[row]
+            else:
+                try:
+                    metrics, block_array = self._parse(file_path)
+                except Exception as e:  # noqa: BLE001
+                    self.errors[path] = f"{type(e).__name__}: {e}"
+                    continue
+                parsed.append(path)
+
+            for name, value in (
+                ("path", path),
+                ("mtime_ns", stat.st_mtime_ns),
+                ("size", stat.st_size),
+                ("hash", file_hash),
+                *metrics.items(),
+            ):
+                index[name].append(value)
+            blocks.append(block_array)
+
+        self._index = {
+            name: np.array(values, dtype=COLUMNS[name])
+            for name, values in index.items()
+        }
+        self._blocks = blocks
+        self._save_index()
+        return parsed
+
+    def query(
+        self,
+        sort_by: str | None = None,
+        *,
+        descending: bool = False,
+        limit: int | None = None,
+        **ranges: tuple[float | None, float | None],
+    ) -> dict[str, np.ndarray]:
+        """Select workouts from the index.
+
+        Args:
+            sort_by: The column to sort the rows by, defaults to the path.
+            descending: Sort in descending order.
+            limit: The max number of rows.
+            **ranges: The inclusive (min, max) range of a column, either end
+                None for no bound, e.g. `intensity_factor=(0.8, 0.9)`.
+
+        Returns:
+            The selected rows, as a column per index column.
+
+        Raises:
+            ValueError: If any of the columns is not in the index.
+        """
+        columns = [*ranges, *([] if sort_by is None else [sort_by])]
+        unknown = [name for name in columns if name not in self._index]
+        if unknown:
+            msg = f"Unknown columns: {', '.join(unknown)}"
+            raise ValueError(msg) from None
+
+        mask = np.ones(len(self), dtype=bool)
+        for name, (low, high) in ranges.items():
+            if low is not None:
+                mask &= self._index[name] >= low
+            if high is not None:
+                mask &= self._index[name] <= high
+        rows = np.flatnonzero(mask)
+
+        if sort_by is not None:
+            rows = rows[np.argsort(self._index[sort_by][rows], kind="stable")]
+            if descending:
+                rows = rows[::-1]
+
+        return {name: column[rows[:limit]] for name, column in self._index.items()}
+
+    def workout(self, path: str, ftp: int | None = None) -> Workout:
+        """Create a workout from the index, without parsing the file.
+
+        Args:
+            path: The path of the workout, relative to the directory.
+            ftp: The functional threshold power.
+
+        Returns:
+            The workout.
+
+        Raises:
+            KeyError: If the path is not in the index.
+        """
+        rows = np.flatnonzero(self._index["path"] == path)
+        if not rows.size:
+            msg = f"Workout not in the library: {path}"
+            raise KeyError(msg)
+
+        return Workout(blocks=blocks_from_array(self._blocks[rows[0]]), ftp=ftp)
@@ -1,7 +1,8 @@
 """Package for the Activity class."""
 
-from .activity import Activity
-from .athlete import Athlete
+from .activity import Activity, ActivityValidationError, SegmentMetrics
+from .athlete import Athlete, MeanMaxEnvelope, MeanMaxHistory, TrainingLoad
+from .live_activity import LiveActivity
 from .workout import (
     Block,
     Cooldown,
@@ -16,13 +17,19 @@ from .workout import (
 
 __all__ = [
     "Activity",
+    "ActivityValidationError",
     "Athlete",
     "Block",
     "Cooldown",
     "FreeRide",
     "Interval",
+    "LiveActivity",
+    "MeanMaxEnvelope",
+    "MeanMaxHistory",
     "Ramp",
+    "SegmentMetrics",
     "SteadyState",
+    "TrainingLoad",
     "UnsupportedFileTypeError",
     "Warmup",
     "Workout",
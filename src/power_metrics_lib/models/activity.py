@@ -15,25 +15,282 @@ Examples:
     >>> # Check the metrics:
     >>> assert activity.duration == 7023
     >>> assert activity.average_power == 187.02520290474158
+    >>>
+    >>> # Metrics are calculated on first access, pre-warm a subset with:
+    >>> activity.compute(["normalized_power", "power_profile"])
+    >>>
+    >>> # Create an array backed activity without copying the data:
+    >>> import numpy as np
+    >>> power = np.asarray(activity.power, dtype=np.uint16)
+    >>> timestamps = np.asarray(activity.timestamps, dtype=np.uint32)
+    >>> compact = Activity.from_arrays(timestamps, power, ftp=ftp)
+    >>> assert compact.power is power
+    >>> assert compact.average_power == activity.average_power
+    >>>
+    >>> # Save the decoded activity, and load it back memory-mapped:
+    >>> import tempfile
+    >>> directory = tempfile.mkdtemp()
+    >>> activity.save(directory)
+    >>> loaded = Activity.load(directory)
+    >>> assert loaded.normalized_power == activity.normalized_power
+    >>>
+    >>> # Resample data with gaps to one sample per second, dropping pauses:
+    >>> gappy = Activity(timestamps=[1, 2, 5, 600], power=[100, 200, 300, 400])
+    >>> gappy.resample(fill="hold", max_gap=60)
+    >>> assert gappy.power.tolist() == [100, 200, 200, 200, 300, 400]
+    >>>
+    >>> # Query the metrics of segments, e.g. laps, in O(1) each:
+    >>> laps = activity.segment_metrics([0, 3600], [3600, 7023])
+    >>> assert laps.total_work.sum() == activity.total_work
+    >>>
+    >>> # Detect the work intervals above 90% of FTP:
+    >>> intervals = activity.detect_intervals(on=0.9, off=0.75)
+    >>> assert (intervals.duration >= 30).all()
 """
 
+import asyncio
+import functools
+import json
 import logging
+from collections.abc import Buffer, Iterable, Sequence
+from concurrent.futures import Executor
 from dataclasses import dataclass, field
+from functools import cached_property
+from pathlib import Path
+from typing import Self, overload
 
 import numpy as np
-import pandas as pd
-from garmin_fit_sdk import Decoder, Stream
+
+from power_metrics_lib.calculations import (
+    cumulative_power,
+    detect_intervals,
+    max_mean_power_curve,
+    max_mean_powers,
+    max_table,
+    normalized_power,
+    power_histogram,
+    range_max,
+    resample,
+    rolling_average,
+    time_in_zones,
+)
+from power_metrics_lib.fit import read_records
+from power_metrics_lib.profiling import Profiler, instrumented, stage
+from power_metrics_lib.zones import COGGAN_ZONES, ZoneModel
+
+
+def _as_array(values: Buffer | Sequence[float], dtype: type[np.integer]) -> np.ndarray:
+    """Return the values as an integer array.
+
+    Integer arrays and buffers are used as is, without copying. Other values
+    are converted to the given compact dtype, if they fit.
+    """
+    if isinstance(values, np.ndarray) and values.dtype.kind in "iu":
+        # Keep subclasses such as memory-mapped arrays:
+        return values
+
+    array = np.asarray(values)
+    if isinstance(values, Buffer) and array.dtype.kind in "iu":
+        return array
+
+    if array.dtype.kind == "f":
+        array = np.rint(array)
+    info = np.iinfo(dtype)
+    if array.size and (array.min() < info.min or array.max() > info.max):
+        return array.astype(np.int64)
+    return array.astype(dtype)
+
+
+def _lists_are_valid(
+    timestamps: list[int],
+    power: list[float],
+    power_limit: int | None,
+    previous_timestamp: int | None,
+) -> bool:
+    """Check list backed data with the built-ins.
+
+    This is faster than converting the lists to arrays, which is only done
+    when a check fails, to report the invalid samples.
+    """
+    if timestamps and power and len(timestamps) != len(power):
+        return False
+    if previous_timestamp is not None:
+        timestamps = [previous_timestamp, *timestamps]
+    if timestamps and (min(timestamps) <= 0 or sorted(timestamps) != timestamps):
+        return False
+    return not power or (
+        min(power) >= 0 and (power_limit is None or max(power) <= power_limit)
+    )
+
+
+def _validation_errors(
+    timestamps: Sequence[int] | np.ndarray,
+    power: Sequence[float] | np.ndarray,
+    power_limit: int | None,
+    previous_timestamp: int | None = None,
+) -> list[str]:
+    """Validate timestamps and power data, see `Activity.validate`.
+
+    Args:
+        timestamps: The timestamps.
+        power: The power data.
+        power_limit: The max plausible power, None for no limit.
+        previous_timestamp: The timestamp before the first, when the samples
+            are appended to others.
+
+    Returns:
+        A report of each failed check, empty if the data is valid.
+    """
+    if (
+        isinstance(timestamps, list)
+        and isinstance(power, list)
+        and _lists_are_valid(timestamps, power, power_limit, previous_timestamp)
+    ):
+        return []
+
+    timestamps = np.asarray(timestamps)
+    power = np.asarray(power)
+    errors: list[str] = []
+
+    def check(invalid: np.ndarray, msg: str, offset: int = 0) -> None:
+        count = np.count_nonzero(invalid)
+        if count:
+            first = int(np.argmax(invalid)) + offset
+            errors.append(f"{msg} {count} invalid samples, the first at {first}.")
+
+    check(timestamps <= 0, "Timestamps must be positive.")
+    if previous_timestamp is None:
+        steps, offset = np.diff(timestamps.astype(np.int64)), 1
+    else:
+        steps = np.diff(timestamps.astype(np.int64), prepend=previous_timestamp)
+        offset = 0
+    check(steps < 0, "Timestamps must be non-decreasing.", offset)
+    check(power < 0, "Power data greater than or equal to zero.")
+    if power_limit is not None:
+        check(power > power_limit, f"Power data must be at most {power_limit} W.")
+    if timestamps.size and power.size and timestamps.size != power.size:
+        errors.append(
+            "Timestamps and power data must have the same length: "
+            f"{timestamps.size} timestamps, {power.size} power samples."
+        )
+    return errors
+
+
+def _load_activity[A: "Activity"](  # noqa: PLR0913, PLR0917
+    cls: type[A],
+    file_path: str,
+    ftp: int | None,
+    window_size: int | None,
+    fast_decode: bool,  # noqa: FBT001
+    which: Iterable[str] | None,
+) -> A:
+    """Parse an activity file and calculate its metrics, in an executor."""
+    activity = cls(
+        file_path=file_path, ftp=ftp, window_size=window_size, fast_decode=fast_decode
+    )
+    activity.compute(which)
+    return activity
+
+
+def _computed_metrics(
+    activity: "Activity", which: Iterable[str] | None
+) -> dict[str, object]:
+    """Calculate a set of metrics of an activity, in an executor."""
+    names = activity.METRICS if which is None else tuple(which)
+    activity.compute(names)
+    return {name: getattr(activity, name) for name in names}
+
+
+class ActivityValidationError(ValueError):
+    """Invalid timestamps or power data.
+
+    Attributes:
+        errors (list[str]): A report of each failed check.
+    """
+
+    def __init__(self, errors: list[str]) -> None:
+        """Initialize the error with the report of each failed check."""
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+@dataclass
+class SegmentMetrics:
+    """The metrics of segments of an activity, e.g. laps, climbs or intervals.
+
+    Each attribute holds an entry per segment, or a 0-d array for a single
+    segment. The metrics of a segment are those of an activity of its power
+    data alone.
+
+    Attributes:
+        start (np.ndarray): The first second of each segment.
+        end (np.ndarray): The second after the end of each segment.
+        duration (np.ndarray): The duration of each segment.
+        average_power (np.ndarray): The average power of each segment.
+        normalized_power (np.ndarray): The normalized power of each segment,
+            0 if it is shorter than the window size.
+        max_power (np.ndarray): The max power of each segment.
+        total_work (np.ndarray): The total work of each segment.
+    """
+
+    start: np.ndarray
+    end: np.ndarray
+    duration: np.ndarray
+    average_power: np.ndarray
+    normalized_power: np.ndarray
+    max_power: np.ndarray
+    total_work: np.ndarray
+
+
+class _Metric[T]:
+    """A lazily calculated and memoized metric.
+
+    On first access the metric is calculated by the `calculate_<name>` method of
+    the instance, which stores the value in the instance dict.
+    """
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+    @overload
+    def __get__(self, instance: None, owner: type) -> Self: ...
+
+    @overload
+    def __get__(self, instance: object, owner: type) -> T: ...
+
+    def __get__(self, instance: object | None, owner: type) -> Self | T:
+        if instance is None:  # pragma: no cover
+            return self
+        try:
+            return instance.__dict__[self.name]
+        except KeyError:
+            getattr(instance, f"calculate_{self.name}")()
+            return instance.__dict__[self.name]
+
+    def __set__(self, instance: object, value: T) -> None:
+        instance.__dict__[self.name] = value
 
 
 @dataclass
 class Activity:
     """Model for an activity.
 
+    The metrics are calculated on first access and memoized. They are
+    invalidated when the timestamps, power, ftp or window size are set.
+
+    The timestamps and power data are stored either as lists, or as NumPy
+    arrays when the activity is created with `from_arrays` or resampled. The
+    metrics are calculated from the power data rounded to whole watts.
+
+    The metrics assume one sample per second, use `resample` for data with
+    gaps, e.g. from smart recording or pauses.
+
     Attributes:
-        timestamps (list[int]): The timestamps.
-        power (list[int]): The power data.
+        timestamps (list[int] | np.ndarray): The timestamps.
+        power (list[int] | np.ndarray): The power data.
         ftp (int): The functional threshold power.
         window_size (int): The window size for the normalized power calculation.
+        power_limit (int | None): The max plausible power, see `validate`.
         duration (int): The duration of the activity.
         average_power (float): The average power.
         normalized_power (float): The normalized power.
@@ -47,16 +304,63 @@ class Activity:
     """
 
     DEFAULT_WINDOW_SIZE = 30
-
-    def __init__(
+    POWER_PROFILE_DURATIONS = (5, 1 * 60, 5 * 60, 20 * 60, 60 * 60)
+    # Compact dtypes for array backed activities:
+    POWER_DTYPE = np.uint16
+    TIMESTAMP_DTYPE = np.uint32
+    METRICS = (
+        "duration",
+        "average_power",
+        "normalized_power",
+        "max_power",
+        "intensity_factor",
+        "training_stress_score",
+        "total_work",
+        "variability_index",
+        "power_duration_curve",
+        "power_profile",
+    )
+    # Attributes the metrics are calculated from:
+    INPUTS = frozenset({"timestamps", "power", "ftp", "window_size"})
+    # Files of a saved activity:
+    TIMESTAMPS_FILE = "timestamps.npy"
+    POWER_FILE = "power.npy"
+    METADATA_FILE = "activity.json"
+    FORMAT_VERSION = 1
+    # A plausible power limit, e.g. to reject the spikes of a power meter glitch:
+    MAX_POWER = 3000
+
+    def __init__(  # noqa: PLR0913
         self,
         file_path: str | None = None,
-        timestamps: list[int] | None = None,
-        power: list[int] | None = None,
+        timestamps: list[int] | np.ndarray | None = None,
+        power: list[int] | np.ndarray | None = None,
         ftp: int | None = None,
         window_size: int | None = None,
+        *,
+        fast_decode: bool = False,
+        validate: bool = True,
+        power_limit: int | None = None,
+        profiler: Profiler | None = None,
     ) -> None:
-        """Initialize the activity object."""
+        """Initialize the activity object.
+
+        Args:
+            file_path: The path to a .fit file to parse.
+            timestamps: The timestamps.
+            power: The power data.
+            ftp: The functional threshold power.
+            window_size: The window size for the normalized power calculation.
+            fast_decode: Decode the .fit file with the record only fast path.
+            validate: Validate the timestamps and power data, see `validate`.
+                Only skip this for trusted data, e.g. produced by the library.
+            power_limit: The max plausible power, e.g. `MAX_POWER`. Defaults to
+                None, which accepts any spikes, e.g. from a power meter glitch.
+            profiler: Record the stages of this activity, see `profiling`.
+
+        Raises:
+            ActivityValidationError: If the timestamps or power data are invalid.
+        """
         if timestamps is None:
             self.timestamps = []
         else:
@@ -69,40 +373,442 @@ class Activity:
 
         self.ftp = ftp
         self.window_size = window_size or self.DEFAULT_WINDOW_SIZE
+        self.power_limit = power_limit
+        self.profiler = profiler
 
         if file_path:
-            self.parse_activity_file(file_path)
+            self.parse_activity_file(file_path, fast=fast_decode)
+
+        if validate:
+            self.validate()
+
+    timestamps: list[int] | np.ndarray
+    power: list[int] | np.ndarray
+    ftp: int | None
+    window_size: int
+    power_limit: int | None = field(default=None, compare=False, repr=False)
+    profiler: Profiler | None = field(default=None, compare=False, repr=False)
+    # metrics, calculated on first access:
+    duration = _Metric[int]()
+    average_power = _Metric[float]()
+    normalized_power = _Metric[float]()
+    max_power = _Metric[int]()
+    intensity_factor = _Metric[float]()
+    training_stress_score = _Metric[float]()
+    total_work = _Metric[int]()
+    variability_index = _Metric[float]()
+    power_duration_curve = _Metric[list[int]]()
+    power_profile = _Metric[dict[int, int]]()
+
+    @classmethod
+    def from_arrays(  # noqa: PLR0913
+        cls,
+        timestamps: Buffer | Sequence[int],
+        power: Buffer | Sequence[float],
+        ftp: int | None = None,
+        window_size: int | None = None,
+        *,
+        validate: bool = True,
+        power_limit: int | None = None,
+    ) -> Self:
+        """Create an array backed activity.
+
+        NumPy integer arrays and objects supporting the buffer protocol (e.g.
+        `array.array` or `memoryview`) are used without copying. Other
+        sequences are converted to the compact `TIMESTAMP_DTYPE` and
+        `POWER_DTYPE`, rounding the power data to whole watts.
+
+        Args:
+            timestamps: The timestamps.
+            power: The power data.
+            ftp: The functional threshold power.
+            window_size: The window size for the normalized power calculation.
+            validate: Validate the timestamps and power data.
+            power_limit: The max plausible power, defaults to no limit.
+
+        Returns:
+            The activity.
+        """
+        return cls(
+            timestamps=_as_array(timestamps, cls.TIMESTAMP_DTYPE),
+            power=_as_array(power, cls.POWER_DTYPE),
+            ftp=ftp,
+            window_size=window_size,
+            validate=validate,
+            power_limit=power_limit,
+        )
+
+    def save(self, directory: str | Path) -> None:
+        """Save the activity to a directory.
+
+        The timestamps and power data are saved as `.npy` files in the compact
+        dtypes, so that they can be memory-mapped when loaded. The ftp and
+        window size are saved in a JSON metadata file.
+
+        Args:
+            directory: The directory, created if needed.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(
+            directory / self.TIMESTAMPS_FILE,
+            _as_array(self.timestamps, self.TIMESTAMP_DTYPE),
+        )
+        np.save(directory / self.POWER_FILE, _as_array(self.power, self.POWER_DTYPE))
+        metadata = {
+            "format_version": self.FORMAT_VERSION,
+            "ftp": self.ftp,
+            "window_size": self.window_size,
+        }
+        (directory / self.METADATA_FILE).write_text(json.dumps(metadata))
+
+    @classmethod
+    def load(
+        cls, directory: str | Path, *, mmap: bool = True, validate: bool = True
+    ) -> Self:
+        """Load an activity saved with `save`.
+
+        Args:
+            directory: The directory.
+            mmap: Memory-map the timestamps and power data read-only, rather
+                than reading them, so that only the pages used are read.
+            validate: Validate the timestamps and power data, which reads all
+                the pages.
+
+        Returns:
+            The array backed activity.
+
+        Raises:
+            FileNotFoundError: If there is no saved activity in the directory.
+            ValueError: If the activity was saved in an unsupported format.
+        """
+        directory = Path(directory)
+        try:
+            metadata = json.loads((directory / cls.METADATA_FILE).read_text())
+        except FileNotFoundError as e:
+            msg = f"Activity not found: {directory}"
+            raise FileNotFoundError(msg) from e
+
+        if metadata.get("format_version") != cls.FORMAT_VERSION:
+            msg = f"Unsupported activity format: {metadata.get('format_version')}"
+            raise ValueError(msg) from None
+
+        mmap_mode = "r" if mmap else None
+        return cls.from_arrays(
+            np.load(directory / cls.TIMESTAMPS_FILE, mmap_mode=mmap_mode),
+            np.load(directory / cls.POWER_FILE, mmap_mode=mmap_mode),
+            ftp=metadata["ftp"],
+            window_size=metadata["window_size"],
+            validate=validate,
+        )
+
+    @classmethod
+    async def aload(  # noqa: PLR0913
+        cls,
+        file_path: str,
+        ftp: int | None = None,
+        window_size: int | None = None,
+        *,
+        fast_decode: bool = False,
+        which: Iterable[str] | None = None,
+        executor: Executor | None = None,
+    ) -> Self:
+        """Parse an activity file and calculate its metrics without blocking.
+
+        The file is decoded and the metrics calculated in an executor, so that
+        the event loop keeps running. The default thread pool of the loop is
+        used unless another executor is given, a process pool scales better
+        for the pure Python decoder.
+
+        Cancelling the awaiting task cancels the load if it has not started
+        yet. A load that has started runs to completion in the executor and
+        its result is discarded.
+
+        Args:
+            file_path: The path to the .fit file.
+            ftp: The functional threshold power.
+            window_size: The window size for the normalized power calculation.
+            fast_decode: Decode the .fit file with the record only fast path.
+            which: The metrics to calculate up front, defaults to all.
+            executor: The executor, defaults to the default one of the loop.
+
+        Returns:
+            The activity, with the metrics calculated.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+            ValueError: If there are any errors parsing the .fit file.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor,
+            functools.partial(
+                _load_activity, cls, file_path, ftp, window_size, fast_decode, which
+            ),
+        )
 
-        # Validate the timestamps and power data:
-        # all timestamps must be strictly positive:
-        if any(t <= 0 for t in self.timestamps):
-            msg = "Timestamps must be positive."
+    @cached_property
+    def _power_array(self) -> np.ndarray:
+        """The power data as an integer array, rounded as in `from_arrays`."""
+        return _as_array(self.power, self.POWER_DTYPE)
+
+    @cached_property
+    def _segment_tables(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """The prefix sums and sparse table the segment metrics are read from.
+
+        The cumulative power, the cumulative rolling average power to the
+        fourth by window start, and the sparse table of the power data.
+        """
+        power = self._power_array
+        rolling = rolling_average(power, self.window_size)
+        fourth_powers = np.zeros(len(rolling) + 1)
+        np.cumsum(rolling**4, out=fourth_powers[1:])
+        return cumulative_power(power), fourth_powers, max_table(power)
+
+    # Activities are mutable, so not hashable:
+    __hash__ = None  # type: ignore[assignment]
+
+    def __eq__(self, other: object) -> bool:
+        """Compare the timestamps, power data, ftp and window size."""
+        if not isinstance(other, Activity) or other.__class__ is not self.__class__:
+            return NotImplemented
+        return (
+            np.array_equal(self.timestamps, other.timestamps)
+            and np.array_equal(self.power, other.power)
+            and self.ftp == other.ftp
+            and self.window_size == other.window_size
+        )
+
+    def __setattr__(self, name: str, value: object) -> None:
+        """Set an attribute, and invalidate the metrics if it is an input."""
+        super().__setattr__(name, value)
+        if name in self.INPUTS:
+            self.invalidate_metrics()
+
+    def validate(self) -> None:
+        """Validate the timestamps and power data.
+
+        The timestamps must be positive and non-decreasing, and the power data
+        non-negative and at most the power limit, if any. If both are given,
+        they must have the same length.
+
+        Raises:
+            ActivityValidationError: If any of the checks fail, with a report
+                of the number of invalid samples and the first one.
+        """
+        errors = _validation_errors(self.timestamps, self.power, self.power_limit)
+        if errors:
+            raise ActivityValidationError(errors)
+
+    def resample(self, fill: str = "zero", max_gap: int | None = None) -> None:
+        """Resample the timestamps and power data to one sample per second.
+
+        See `calculations.resample`.
+
+        Args:
+            fill: How to fill the missing seconds, "zero" or "hold".
+            max_gap: The longest gap in seconds to fill, longer gaps are
+                dropped as pauses. Defaults to no limit.
+
+        Raises:
+            ValueError: If the fill is unknown or the timestamps are decreasing.
+        """
+        timestamps, power = resample(
+            _as_array(self.timestamps, self.TIMESTAMP_DTYPE),
+            _as_array(self.power, self.POWER_DTYPE),
+            fill,
+            max_gap,
+        )
+        self.timestamps = timestamps
+        self.power = power
+
+    def time_in_zones(self, model: ZoneModel = COGGAN_ZONES) -> dict[str, int]:
+        """Calculate the time in each power zone.
+
+        Args:
+            model: The zone model, relative zones use the FTP of the activity.
+
+        Returns:
+            The seconds in each zone, by zone name.
+
+        Raises:
+            ValueError: If the zone model is relative and there is no FTP.
+        """
+        counts = time_in_zones(self._power_array, model.watts(self.ftp))
+        return dict(zip(model.names, counts.tolist(), strict=True))
+
+    def power_histogram(self, bin_width: int = 10) -> np.ndarray:
+        """Calculate the histogram of the power data.
+
+        Args:
+            bin_width: The width of the bins in watts.
+
+        Returns:
+            The seconds in each bin, bin i is from i * bin_width (inclusive) to
+            (i + 1) * bin_width (exclusive), up to the max power.
+
+        Raises:
+            ValueError: If the bin width is not positive.
+        """
+        return power_histogram(self._power_array, bin_width)
+
+    def segment_metrics(
+        self,
+        start: int | Sequence[int] | np.ndarray,
+        end: int | Sequence[int] | np.ndarray,
+    ) -> SegmentMetrics:
+        """Calculate the metrics of segments `[start, end)` of the power data.
+
+        The metrics are read from prefix sums and a sparse table of the power
+        data, built on the first call in O(n log n), so that each segment takes
+        O(1) regardless of its length. Many segments are calculated at once
+        from arrays of starts and ends.
+
+        Args:
+            start: The first second of each segment.
+            end: The second after the end of each segment.
+
+        Returns:
+            The metrics of each segment, with the shape of the starts and ends.
+
+        Raises:
+            ValueError: If a segment is not within the power data.
+        """
+        starts = np.asarray(start, dtype=np.int64)
+        ends = np.asarray(end, dtype=np.int64)
+        if np.any((starts < 0) | (ends < starts) | (ends > len(self._power_array))):
+            msg = "Segments must be within the power data."
             raise ValueError(msg) from None
-        # all power data must greater or equal to zero:
-        if any(p < 0 for p in self.power):
-            msg = "Power data greater than or equal to zero."
+
+        cumulative, fourth_powers, table = self._segment_tables
+        duration = ends - starts
+        total_work = cumulative[ends] - cumulative[starts]
+        # The rolling windows within each segment start from `start` to
+        # `end - window_size`:
+        windows = duration - self.window_size + 1
+        last = np.clip(ends - self.window_size + 1, 0, len(fourth_powers) - 1)
+        mean_fourth_powers = np.divide(
+            fourth_powers[last] - fourth_powers[np.minimum(starts, last)],
+            windows,
+            out=np.zeros(np.shape(windows)),
+            where=windows > 0,
+        )
+        return SegmentMetrics(
+            start=starts,
+            end=ends,
+            duration=duration,
+            average_power=np.divide(
+                total_work,
+                duration,
+                out=np.zeros(np.shape(duration)),
+                where=duration > 0,
+            ),
+            # The fourth powers of equal windows may differ by rounding:
+            normalized_power=np.round(np.maximum(mean_fourth_powers, 0) ** 0.25),
+            max_power=range_max(table, starts, ends).astype(np.int64),
+            total_work=total_work,
+        )
+
+    def detect_intervals(
+        self,
+        on: float = 0.9,
+        off: float = 0.75,
+        *,
+        smoothing: int = 10,
+        max_gap: int = 15,
+        min_duration: int = 30,
+    ) -> SegmentMetrics:
+        """Detect the work intervals, and calculate their metrics.
+
+        An interval starts when the power, smoothed with a centered moving
+        average, reaches `on` times the FTP, and ends when it drops below `off`
+        times the FTP. Intervals separated by short gaps are merged, and short
+        intervals are dropped.
+
+        Args:
+            on: The fraction of FTP an interval starts at.
+            off: The fraction of FTP an interval ends below, at most `on`.
+            smoothing: The window size of the moving average in seconds.
+            max_gap: The longest gap between intervals that are merged.
+            min_duration: The shortest interval in seconds.
+
+        Returns:
+            The metrics of each interval, in order.
+
+        Raises:
+            ValueError: If there is no FTP, `off` is above `on`, or the
+                smoothing is not positive.
+        """
+        if not self.ftp:
+            msg = "An FTP is required to detect intervals."
             raise ValueError(msg) from None
 
-        self.calculate_metrics()
+        starts, ends = detect_intervals(
+            self._power_array,
+            on * self.ftp,
+            off * self.ftp,
+            smoothing=smoothing,
+            max_gap=max_gap,
+            min_duration=min_duration,
+        )
+        return self.segment_metrics(starts, ends)
+
+    def sample_count(self) -> int:
+        """Return the number of samples."""
+        return len(self.power)
 
-    timestamps: list[int]
-    power: list[int]
-    ftp: int | None
-    window_size: int
-    # metrics:
-    duration: int = 0
-    average_power: float = 0
-    normalized_power: float = 0
-    max_power: int = 0
-    intensity_factor: float = 0
-    training_stress_score: float = 0
-    total_work: int = 0
-    variability_index: float = 0
-    power_duration_curve: list[int] = field(default_factory=list)
-    power_profile: dict[int, int] = field(default_factory=dict)
+    def invalidate_metrics(self) -> None:
+        """Invalidate the memoized metrics.
+
+        Call this after changing the timestamps or power data in place.
+        """
+        for name in (*self.METRICS, "_power_array", "_segment_tables"):
+            self.__dict__.pop(name, None)
+
+    def compute(self, which: Iterable[str] | None = None) -> None:
+        """Calculate a set of metrics up front.
+
+        Args:
+            which: The names of the metrics to calculate, defaults to all.
+
+        Raises:
+            ValueError: If any of the names is not a metric.
+        """
+        names = self.METRICS if which is None else tuple(which)
+        unknown = [name for name in names if name not in self.METRICS]
+        if unknown:
+            msg = f"Unknown metrics: {', '.join(unknown)}"
+            raise ValueError(msg) from None
+
+        for name in names:
+            getattr(self, name)
+
+    async def acompute(
+        self, which: Iterable[str] | None = None, executor: Executor | None = None
+    ) -> None:
+        """Calculate a set of metrics up front without blocking.
 
+        See `aload` for the executor and cancellation. The timestamps and
+        power data must not be changed while the metrics are calculated.
+
+        Args:
+            which: The names of the metrics to calculate, defaults to all.
+            executor: The executor, defaults to the default one of the loop.
+
+        Raises:
+            ValueError: If any of the names is not a metric.
+        """
+        loop = asyncio.get_running_loop()
+        metrics = await loop.run_in_executor(
+            executor, _computed_metrics, self, None if which is None else tuple(which)
+        )
+        # In a process pool the metrics were calculated on a copy:
+        for name, value in metrics.items():
+            setattr(self, name, value)
+
+    @instrumented
     def calculate_metrics(self) -> None:
-        """Calculate the metrics."""
+        """(Re)calculate all the metrics."""
         self.calculate_duration()
         self.calculate_average_power()
         self.calculate_normalized_power()
@@ -114,16 +820,32 @@ class Activity:
         self.calculate_power_duration_curve()
         self.calculate_power_profile()
 
-    def parse_activity_file(self, file_path: str) -> None:
+    @instrumented
+    def parse_activity_file(self, file_path: str, *, fast: bool = False) -> None:
         """Parse a .fit file and return a list of dicts.
 
+        The fast path only decodes the timestamp and power fields of the record
+        messages, straight into compact arrays (see `power_metrics_lib.fit`).
+        It skips the CRC check and all other messages.
+
         Args:
             file_path: The path to the .fit file.
+            fast: Use the record only fast path.
 
         Raises:
             FileNotFoundError: If the file does not exist.
             ValueError: If there are any errors parsing the .fit file.
         """
+        if fast:
+            with stage(self, "read_records"):
+                records = read_records(file_path, ("timestamp", "power"))
+                self.timestamps = records["timestamp"]
+                self.power = records["power"]
+            return
+
+        # The SDK is only imported when needed, it is slow to import:
+        from garmin_fit_sdk import Decoder, Stream  # noqa: PLC0415
+
         try:
             stream = Stream.from_file(file_path)
         except FileNotFoundError as e:
@@ -131,10 +853,11 @@ class Activity:
             raise FileNotFoundError(msg) from e
 
         decoder = Decoder(stream)
-        messages, errors = decoder.read(
-            convert_datetimes_to_dates=False,
-            convert_types_to_strings=True,
-        )
+        with stage(self, "decode_fit"):
+            messages, errors = decoder.read(
+                convert_datetimes_to_dates=False,
+                convert_types_to_strings=True,
+            )
 
         if len(errors) > 0:  # pragma: no cover
             msg = "\n".join(errors)
@@ -144,43 +867,54 @@ class Activity:
             msg = "No record messages found in the .fit file."
             raise ValueError(msg) from None
 
-        for message in messages["record_mesgs"]:
-            self.timestamps.append(int(message["timestamp"]))
-            # Patch missing power data with 0:
-            if "power" not in message:  # pragma: no cover
-                msg = f"{message["timestamp"]}: No power data in record message."
-                logging.warning(msg)
-                self.power.append(0)
-            else:
-                self.power.append(int(message["power"]))
+        with stage(self, "build_lists"):
+            timestamps: list[int] = []
+            power: list[int] = []
+            for message in messages["record_mesgs"]:
+                timestamps.append(int(message["timestamp"]))
+                # Patch missing power data with 0:
+                if "power" not in message:  # pragma: no cover
+                    msg = f"{message["timestamp"]}: No power data in record message."
+                    logging.warning(msg)
+                    power.append(0)
+                else:
+                    power.append(int(message["power"]))
+
+            self.timestamps = timestamps
+            self.power = power
 
+    @instrumented
     def calculate_average_power(self) -> None:
         """Calculate the average power from a list of power data."""
-        if self.power:
-            self.average_power = sum(self.power) / len(self.power)
+        self.average_power = 0
+        power = self._power_array
+        if power.size:
+            self.average_power = int(power.sum(dtype=np.int64)) / power.size
 
+    @instrumented
     def calculate_normalized_power(self) -> None:
         """Calculate the normalized power from a list of power data."""
-        if not self.power:
+        self.normalized_power = 0
+        power = self._power_array
+        if not power.size:
             return
 
-        if len(self.power) < self.window_size:
+        if power.size < self.window_size:
             return
 
-        series = pd.Series(self.power)
-        series = series.dropna()
-        windows = series.rolling(self.window_size)
-        power_30s = windows.mean()
-
-        self.normalized_power = round((((power_30s**4).mean()) ** 0.25), 0).item()
+        self.normalized_power = round(normalized_power(power, self.window_size), 0)
 
+    @instrumented
     def calculate_intensity_factor(self) -> None:
         """Calculate the intensity factor from normalized power and FTP."""
+        self.intensity_factor = 0
         if self.normalized_power and self.ftp:
             self.intensity_factor = self.normalized_power / self.ftp
 
+    @instrumented
     def calculate_training_stress_score(self) -> None:
         """Calculate the training stress score."""
+        self.training_stress_score = 0
         if (
             self.normalized_power
             and self.intensity_factor
@@ -193,46 +927,57 @@ class Activity:
                 * 100
             )
 
+    @instrumented
     def calculate_total_work(self) -> None:
         """Calculate the total work from power data."""
-        if self.power:
-            self.total_work = sum(self.power)
+        self.total_work = 0
+        power = self._power_array
+        if power.size:
+            self.total_work = int(power.sum(dtype=np.int64))
 
+    @instrumented
     def calculate_max_power(self) -> None:
         """Calculate the max power from power data."""
-        if self.power:
-            self.max_power = max(self.power)
+        self.max_power = 0
+        power = self._power_array
+        if power.size:
+            self.max_power = int(power.max())
 
+    @instrumented
     def calculate_duration(self) -> None:
         """Calculate the duration from timestamps."""
-        if self.timestamps:
-            self.duration = len(self.timestamps)
+        self.duration = len(self.timestamps)
 
+    @instrumented
     def calculate_variability_index(self) -> None:
         """Calculate the variablity index."""
+        self.variability_index = 0
         if self.normalized_power and self.average_power:
             self.variability_index = self.normalized_power / self.average_power
 
+    @instrumented
     def calculate_power_duration_curve(self) -> None:
         """Calculate the power duration curve.
 
-        Calculates the max power over every duration.
+        Calculates the max power over every duration, based on a single
+        cumulative sum of the power data.
 
         """
         self.power_duration_curve = []
 
-        if not self.power:
+        power = self._power_array
+        if not power.size:
             return
 
         # The first entry is simply the max power:
-        self.power_duration_curve.append(max(self.power))
+        self.power_duration_curve.append(int(power.max()))
         # The reste is a the max of the moving average pr duration:
-        for i in range(1, len(self.power)):
-            max_power = self.calculate_max_power_for_duration(i)
-            self.power_duration_curve.append(max_power)
+        max_mean_power = max_mean_power_curve(power, max_duration=len(power) - 1)
+        self.power_duration_curve.extend(np.rint(max_mean_power).astype(int).tolist())
 
+    @instrumented
     def calculate_max_power_for_duration(self, duration: int) -> int:
-        """Calculate the moving average of the power data for given duration.
+        """Calculate the max moving average of the power data for given duration.
 
         Args:
             duration: The duration in seconds.
@@ -240,30 +985,31 @@ class Activity:
         Returns:
             The max power for the given duration.
         """
-        series = pd.Series(self.power)
-        series = series.dropna()
-        windows = series.rolling(duration)
-
-        mean = windows.mean()
-        max_power = mean.max()
-
-        if type(max_power) is not np.float64:  # pragma: no cover
-            msg = "Max power is not a float."
-            raise ValueError(msg) from None
+        max_power = max_mean_powers(self._power_array, [duration])[0]
 
         return round(max_power)
 
+    @instrumented
     def calculate_power_profile(self) -> None:
         """Calculate the power profile.
 
         Durations: 5s, 1min, 5min, 20min, 60min.
+
+        The values are read from the power duration curve if it is already
+        calculated, otherwise only the durations needed are calculated.
         """
         self.power_profile = {}
 
-        if self.power_duration_curve is None:  # pragma: no cover
-            return
-
-        durations = [5, 1 * 60, 5 * 60, 20 * 60, 60 * 60]
-        for d in durations:
-            if d <= self.duration:
+        durations = [
+            d
+            for d in self.POWER_PROFILE_DURATIONS
+            if d <= min(self.duration, len(self.power))
+        ]
+        if "power_duration_curve" in self.__dict__:
+            for d in durations:
                 self.power_profile[d] = self.power_duration_curve[d - 1]
+        elif durations:
+            # power_duration_curve[d - 1] is the max power for duration d - 1:
+            max_power = max_mean_powers(self._power_array, [d - 1 for d in durations])
+            for d, p in zip(durations, np.rint(max_power).tolist(), strict=True):
+                self.power_profile[d] = int(p)
@@ -1,44 +1,487 @@
-"""Athlete model."""
-
-from dataclasses import dataclass
-from datetime import UTC, date, datetime
+"""Athlete model.
+
+Examples:
+    >>> from power_metrics_lib import Activity, Athlete
+    >>>
+    >>> athlete = Athlete(name="Alice")
+    >>> athlete.set_ftp(236, from_date="2021-01-01")
+    >>>
+    >>> # Add the training stress of an activity, scored with the FTP of the day:
+    >>> activity = Activity("tests/files/activity.fit")
+    >>> athlete.add_activity(activity, "2021-03-01")
+    >>>
+    >>> # Check the fitness, fatigue and form over time:
+    >>> load = athlete.training_load.series(end="2021-03-07")
+    >>> assert load["ctl"][0] == athlete.training_load.tss[0] / 42
+    >>> assert len(load["date"]) == 7
+    >>>
+    >>> # Keep the best power for every duration, and where it is from:
+    >>> athlete.add_power_curve(activity, "2021-03-01", activity_id="ride-1")
+    >>> best = athlete.mean_max.rolling(90, end="2021-03-31")
+    >>> assert best.power[0] == activity.max_power
+    >>> assert best.activities[0] == "ride-1"
+"""
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+from datetime import UTC, date, datetime, timedelta
+from itertools import chain
 from uuid import uuid4
 
+import numpy as np
+
+from power_metrics_lib.calculations import exponential_moving_average
+
+from .activity import Activity
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def _to_date(value: date | str) -> date:
+    """Return a date object for a date or a "yyyy-mm-dd" string."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        # Also accept dates without zero padding, e.g. "2021-1-1":
+        return datetime.strptime(value, DATE_FORMAT).replace(tzinfo=UTC).date()
+
+
+@dataclass
+class _History[T]:
+    """A history of values, indexed by the date they apply from.
+
+    The dates are kept sorted in ascending order, so that a value is found by
+    bisection. If several values are set for the same date, the first one set
+    applies.
+
+    Attributes:
+        dates (list[int]): The proleptic Gregorian ordinals of the dates.
+        values (list[T]): The values.
+    """
+
+    dates: list[int] = field(default_factory=list)
+    values: list[T] = field(default_factory=list)
+
+    def set(self, from_date: date, value: T) -> None:
+        """Set a value from a date."""
+        # Insert before values for the same date, so that those still apply:
+        i = bisect_left(self.dates, from_date.toordinal())
+        self.dates.insert(i, from_date.toordinal())
+        self.values.insert(i, value)
+
+    def get(self, from_date: date | None = None) -> T | None:
+        """Get the value for a date, or the latest value."""
+        if from_date is None:
+            return self.values[-1] if self.values else None
+
+        i = bisect_right(self.dates, from_date.toordinal())
+        return self.values[i - 1] if i else None
+
+    def get_many(self, dates: Iterable[date]) -> list[T | None]:
+        """Get the values for many dates in one vectorized lookup."""
+        ordinals = np.fromiter((d.toordinal() for d in dates), dtype=np.int64)
+        indices = np.searchsorted(self.dates, ordinals, side="right") - 1
+        return [self.values[i] if i >= 0 else None for i in indices.tolist()]
+
+    def items(self) -> list[tuple[date, T]]:
+        """Return the dates and values, in descending order of date."""
+        return [
+            (date.fromordinal(d), v)
+            for d, v in zip(reversed(self.dates), reversed(self.values), strict=True)
+        ]
+
+
+@dataclass(eq=False)
+class TrainingLoad:
+    """Model for the training load of an athlete over time.
+
+    The training stress score (TSS) is summed per day, and the chronic and
+    acute training load are its exponentially weighted moving averages:
+    `ctl[t] = ctl[t - 1] + (tss[t] - ctl[t - 1]) / ctl_days`, and likewise for
+    the atl. The training stress balance is yesterday's ctl minus atl.
+
+    The series are calculated with a blocked closed-form moving average (see
+    `calculations.exponential_moving_average`). Adding TSS only recalculates
+    from the day it is added to, and the series are grown in place with room
+    for later days, so adding the latest activity is amortized O(1).
+
+    Attributes:
+        ctl_days (int): The time constant of the chronic training load.
+        atl_days (int): The time constant of the acute training load.
+        start (date): The first day with TSS, if any.
+        tss (np.ndarray): The TSS of each day from the start.
+        ctl (np.ndarray): The chronic training load (fitness) of each day.
+        atl (np.ndarray): The acute training load (fatigue) of each day.
+    """
+
+    CTL_DAYS = 42
+    ATL_DAYS = 7
+
+    ctl_days: int = CTL_DAYS
+    atl_days: int = ATL_DAYS
+    start: date | None = None
+    tss: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    ctl: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    atl: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    # The tss, ctl and atl are views of the rows of these, with room to grow:
+    _buffers: np.ndarray = field(
+        default_factory=lambda: np.zeros((3, 0)), init=False, repr=False
+    )
+
+    def add(self, day: date | str, tss: float) -> None:
+        """Add the TSS of an activity.
+
+        Args:
+            day (date | str): The day ("yyyy-mm-dd") of the activity.
+            tss (float): The training stress score.
+        """
+        self.extend([day], [tss])
+
+    def extend(self, days: Iterable[date | str], tss: Iterable[float]) -> None:
+        """Add the TSS of many activities at once.
+
+        Args:
+            days (Iterable[date | str]): The day ("yyyy-mm-dd") of each activity.
+            tss (Iterable[float]): The training stress score of each activity.
+        """
+        ordinals = np.array([_to_date(d).toordinal() for d in days], dtype=np.int64)
+        scores = np.fromiter(tss, dtype=np.float64, count=len(ordinals))
+        if not len(ordinals):
+            return
+
+        # Grow the series to cover all the days, in place if there is room:
+        start = ordinals.min()
+        if self.start is not None:
+            start = min(start, self.start.toordinal())
+        offset = 0 if self.start is None else self.start.toordinal() - start
+        end = offset + len(self.tss)
+        length = max(end, int(ordinals.max() - start) + 1)
+        if (
+            offset
+            or length > self._buffers.shape[1]
+            or self.tss.base is not self._buffers
+        ):
+            # Reserve room for later days, so that adding them is amortized O(1):
+            buffers = np.zeros((3, 2 * length))
+            for row, values in zip(
+                buffers, (self.tss, self.ctl, self.atl), strict=True
+            ):
+                row[offset:end] = values
+            self._buffers = buffers
+        daily, ctl, atl = self._buffers[:, :length]
+        np.add.at(daily, ordinals - start, scores)
+
+        # Only the days from the first changed day (or rest day) on need
+        # recalculating:
+        first = min(int(ordinals.min() - start), end)
+        previous_ctl = ctl[first - 1] if first else 0.0
+        previous_atl = atl[first - 1] if first else 0.0
+        ctl[first:] = exponential_moving_average(
+            daily[first:], 1 / self.ctl_days, previous_ctl
+        )
+        atl[first:] = exponential_moving_average(
+            daily[first:], 1 / self.atl_days, previous_atl
+        )
+
+        self.start = date.fromordinal(int(start))
+        self.tss, self.ctl, self.atl = daily, ctl, atl
+
+    def series(self, end: date | str | None = None) -> dict[str, np.ndarray]:
+        """Return the daily training load.
+
+        Args:
+            end (date | str): The last day ("yyyy-mm-dd"), defaults to the last
+                day with TSS. Days after it decay as rest days.
+
+        Returns:
+            dict[str, np.ndarray]: The "date" (datetime64[D]), "tss", "ctl",
+                "atl" and "tsb" of each day from the start.
+        """
+        if self.start is None:
+            empty = np.zeros(0)
+            return {
+                "date": np.zeros(0, dtype="datetime64[D]"),
+                "tss": empty,
+                "ctl": empty,
+                "atl": empty,
+                "tsb": empty,
+            }
+
+        tss, ctl, atl = self.tss, self.ctl, self.atl
+        if end is not None:
+            length = max(0, _to_date(end).toordinal() - self.start.toordinal() + 1)
+            rest = max(0, length - len(tss))
+            tss = np.concatenate((tss, np.zeros(rest)))[:length]
+            # Rest days decay geometrically:
+            ctl = np.concatenate(
+                (ctl, ctl[-1] * (1 - 1 / self.ctl_days) ** np.arange(1, rest + 1))
+            )[:length]
+            atl = np.concatenate(
+                (atl, atl[-1] * (1 - 1 / self.atl_days) ** np.arange(1, rest + 1))
+            )[:length]
+
+        start = np.datetime64(self.start, "D")
+        return {
+            "date": start + np.arange(len(tss)),
+            "tss": tss,
+            "ctl": ctl,
+            "atl": atl,
+            # The form of a day is the fitness minus fatigue of the day before:
+            "tsb": np.concatenate(([0.0], (ctl - atl)[:-1]))[: len(tss)],
+        }
+
+
+def _pad(values: np.ndarray, length: int, fill: object) -> np.ndarray:
+    """Pad an array to a length with a fill value."""
+    padded = np.full(length, fill, dtype=values.dtype)
+    padded[: len(values)] = values
+    return padded
+
+
+@dataclass(eq=False)
+class MeanMaxEnvelope:
+    """Model for the mean-maximal power envelope of many activities.
+
+    Each entry is the best power of the activities for a duration, indexed
+    like `Activity.power_duration_curve`, with the day and id of the activity
+    it is from. Envelopes are merged by taking the elementwise max, so they
+    can be built incrementally and combined across time windows. Of equal
+    powers, the one from the earliest day is kept.
+
+    Attributes:
+        power (np.ndarray): The best power for each duration.
+        days (np.ndarray): The day (datetime64[D]) of each best power.
+        activities (np.ndarray): The id of the activity of each best power.
+    """
+
+    power: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    days: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype="datetime64[D]"))
+    activities: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=object))
+
+    @classmethod
+    def from_curve(
+        cls,
+        curve: Sequence[int] | np.ndarray,
+        day: date | str,
+        activity_id: str | None = None,
+    ) -> "MeanMaxEnvelope":
+        """Create the envelope of a single power duration curve.
+
+        Args:
+            curve (Sequence[int] | np.ndarray): The power duration curve.
+            day (date | str): The day ("yyyy-mm-dd") of the activity.
+            activity_id (str): The id of the activity.
+
+        Returns:
+            MeanMaxEnvelope: The envelope.
+        """
+        power = np.asarray(curve, dtype=np.int64)
+        return cls(
+            power=power,
+            days=np.full(len(power), np.datetime64(_to_date(day), "D")),
+            activities=np.full(len(power), activity_id, dtype=object),
+        )
+
+    def update(self, other: "MeanMaxEnvelope") -> None:
+        """Merge another envelope into this one.
+
+        Args:
+            other (MeanMaxEnvelope): The other envelope.
+        """
+        length = max(len(self.power), len(other.power))
+        power = _pad(self.power, length, -1)
+        days = _pad(self.days, length, np.datetime64("NaT", "D"))
+        activities = _pad(self.activities, length, None)
+        other_power = _pad(other.power, length, -1)
+        other_days = _pad(other.days, length, np.datetime64("NaT", "D"))
+
+        better = (other_power > power) | ((other_power == power) & (other_days < days))
+        power[better] = other_power[better]
+        days[better] = other_days[better]
+        activities[better] = _pad(other.activities, length, None)[better]
+        self.power, self.days, self.activities = power, days, activities
+
+    def merge(self, other: "MeanMaxEnvelope") -> "MeanMaxEnvelope":
+        """Return the merge of this and another envelope.
+
+        Args:
+            other (MeanMaxEnvelope): The other envelope.
+
+        Returns:
+            MeanMaxEnvelope: The merged envelope.
+        """
+        merged = MeanMaxEnvelope(
+            power=self.power, days=self.days, activities=self.activities
+        )
+        merged.update(other)
+        return merged
+
+    def power_profile(self) -> dict[int, int]:
+        """Return the power profile of the envelope, as in `Activity`.
+
+        Returns:
+            dict[int, int]: The best power for each power profile duration.
+        """
+        return {
+            d: int(self.power[d - 1])
+            for d in Activity.POWER_PROFILE_DURATIONS
+            if d <= len(self.power)
+        }
+
+
+@dataclass(eq=False)
+class MeanMaxHistory:
+    """Model for the mean-maximal power envelopes of an athlete over time.
+
+    The envelope of each day, and of each block of `BLOCK_DAYS` days, is kept
+    up to date as activities are added. The envelope of a window of days is
+    merged from the whole blocks in the window and the days at its ends,
+    without recalculating the curves of the activities.
+
+    Attributes:
+        days (dict[int, MeanMaxEnvelope]): The envelope of each day with
+            activities, by proleptic Gregorian ordinal.
+        blocks (dict[int, MeanMaxEnvelope]): The envelope of each block with
+            activities, by ordinal // `BLOCK_DAYS`.
+    """
+
+    BLOCK_DAYS = 32
+
+    days: dict[int, MeanMaxEnvelope] = field(default_factory=dict)
+    blocks: dict[int, MeanMaxEnvelope] = field(default_factory=dict)
+
+    def add(
+        self,
+        day: date | str,
+        curve: Sequence[int] | np.ndarray,
+        activity_id: str | None = None,
+    ) -> None:
+        """Add the power duration curve of an activity.
+
+        Args:
+            day (date | str): The day ("yyyy-mm-dd") of the activity.
+            curve (Sequence[int] | np.ndarray): The power duration curve of
+                the activity.
+            activity_id (str): The id of the activity.
+        """
+        envelope = MeanMaxEnvelope.from_curve(curve, day, activity_id)
+        ordinal = _to_date(day).toordinal()
+        self.days.setdefault(ordinal, MeanMaxEnvelope()).update(envelope)
+        block = ordinal // self.BLOCK_DAYS
+        self.blocks.setdefault(block, MeanMaxEnvelope()).update(envelope)
+
+    def envelope(
+        self, start: date | str | None = None, end: date | str | None = None
+    ) -> MeanMaxEnvelope:
+        """Return the envelope of the activities in a window of days.
+
+        Args:
+            start (date | str): The first day ("yyyy-mm-dd"), defaults to the
+                first day with activities.
+            end (date | str): The last day ("yyyy-mm-dd"), defaults to the last
+                day with activities.
+
+        Returns:
+            MeanMaxEnvelope: The envelope, empty if there are no activities.
+        """
+        envelope = MeanMaxEnvelope()
+        if not self.days:
+            return envelope
+
+        first = min(self.days) if start is None else _to_date(start).toordinal()
+        last = max(self.days) if end is None else _to_date(end).toordinal()
+        # The whole blocks in the window, and the days at its ends:
+        first_block = -(-first // self.BLOCK_DAYS)
+        last_block = (last + 1) // self.BLOCK_DAYS - 1
+        if first_block > last_block:
+            ordinals = range(first, last + 1)
+        else:
+            ordinals = chain(
+                range(first, first_block * self.BLOCK_DAYS),
+                range((last_block + 1) * self.BLOCK_DAYS, last + 1),
+            )
+            for block in range(first_block, last_block + 1):
+                if block in self.blocks:
+                    envelope.update(self.blocks[block])
+        for ordinal in ordinals:
+            if ordinal in self.days:
+                envelope.update(self.days[ordinal])
+
+        return envelope
+
+    def rolling(self, days: int, end: date | str | None = None) -> MeanMaxEnvelope:
+        """Return the envelope of the activities in the last days.
+
+        Args:
+            days (int): The number of days in the window, e.g. 90.
+            end (date | str): The last day ("yyyy-mm-dd") of the window,
+                defaults to the last day with activities.
+
+        Returns:
+            MeanMaxEnvelope: The envelope, empty if there are no activities.
+        """
+        if end is None:
+            if not self.days:
+                return MeanMaxEnvelope()
+            last = date.fromordinal(max(self.days))
+        else:
+            last = _to_date(end)
+        return self.envelope(last - timedelta(days=days - 1), last)
+
 
 @dataclass
 class Athlete:
     """Athlete class.
 
+    The FTP and weight histories are indexed by date, so that looking up the
+    value for a date is a bisection. Dates can be given as `date` objects or
+    "yyyy-mm-dd" strings.
+
     Attributes:
         name (str): The athlete's name.
-        ftp (list[tuple[date, int]]): The athlete's FTPs ordered by date.
-        weight (list[tuple[date, float]]): The athlete's weight ordered by date.
+        ftp (_History[int]): The athlete's FTPs indexed by date.
+        weight (_History[float]): The athlete's weight indexed by date.
         uuid (str): The athlete's UUID.
+        training_load (TrainingLoad): The athlete's training load over time.
+        mean_max (MeanMaxHistory): The athlete's mean-maximal power over time.
 
     """
 
     name: str
-    _ftp: list[tuple[date, int]] | None = None
-    _weight: list[tuple[date, float]] | None = None
+    _ftp: _History[int] | None = None
+    _weight: _History[float] | None = None
     uuid: str | None = str(uuid4())
+    training_load: TrainingLoad = field(
+        default_factory=TrainingLoad, compare=False, repr=False
+    )
+    mean_max: MeanMaxHistory = field(
+        default_factory=MeanMaxHistory, compare=False, repr=False
+    )
 
     def __init__(
         self, name: str, ftp: int | None = None, weight: float | None = None
     ) -> None:
         """Initialize the athlete object."""
         self.name = name
+        self.training_load = TrainingLoad()
+        self.mean_max = MeanMaxHistory()
         if ftp:
             self.set_ftp(ftp)
         if weight:
             self.set_weight(weight)
 
-    def get_ftp(self, from_date: str | None = None) -> int | None:
+    def get_ftp(self, from_date: date | str | None = None) -> int | None:
         """Get the FTP for a specific date.
 
         If the from_date is not given, the latest FTP is returned.
 
         Args:
-            from_date (str): The date ("yyyy-mm-dd") to get the FTP for.
+            from_date (date | str): The date ("yyyy-mm-dd") to get the FTP for.
 
         Returns:
             int: The FTP.
@@ -46,39 +489,43 @@ class Athlete:
         # If no ftp is set, return None:
         if self._ftp is None:
             return None
-        # If no from_date is given, return the latest FTP:
-        if from_date is None:
-            return self._ftp[0][1] if self._ftp else None
-        # Find the FTP for the given date:
-        _from_date = datetime.strptime(from_date, "%Y-%m-%d").replace(tzinfo=UTC).date()
-        for ftp in self._ftp:
-            if ftp[0] <= _from_date:
-                return ftp[1]
 
-        return None
+        return self._ftp.get(None if from_date is None else _to_date(from_date))
+
+    def get_ftps(self, dates: Iterable[date | str]) -> list[int | None]:
+        """Get the FTP for each of many dates.
+
+        Args:
+            dates (Iterable[date | str]): The dates ("yyyy-mm-dd") to get the
+                FTPs for.
+
+        Returns:
+            list[int | None]: The FTP for each date, None where no FTP is set.
+        """
+        _dates = [_to_date(d) for d in dates]
+        if self._ftp is None:
+            return [None] * len(_dates)
+
+        return self._ftp.get_many(_dates)
 
-    def set_ftp(self, ftp: int, from_date: str | None = None) -> None:
+    def set_ftp(self, ftp: int, from_date: date | str | None = None) -> None:
         """Set the FTP for a specific date.
 
         If the from_date is not given, the FTP is set for today.
 
         Args:
             ftp (int): The FTP to set.
-            from_date (str): The date ("yyyy-mm-dd") to set the FTP for.
+            from_date (date | str): The date ("yyyy-mm-dd") to set the FTP for.
         """
         if self._ftp is None:
-            self._ftp = []
+            self._ftp = _History()
 
         # If no from_date is given, set the FTP for today:
         if from_date is None:
             _from_date = datetime.now(UTC).date()
         else:
-            _from_date = (
-                datetime.strptime(from_date, "%Y-%m-%d").replace(tzinfo=UTC).date()
-            )
-        self._ftp.append((_from_date, ftp))
-        # sort the list by date in descending order:
-        self._ftp = sorted(self._ftp, key=lambda x: x[0], reverse=True)
+            _from_date = _to_date(from_date)
+        self._ftp.set(_from_date, ftp)
 
     def get_all_ftps(self) -> list[tuple[str, int]] | None:
         """Get all FTPs and their dates.
@@ -89,39 +536,35 @@ class Athlete:
         if self._ftp is None:
             return None
 
-        return [(ftp[0].strftime("%Y-%m-%d"), ftp[1]) for ftp in self._ftp]
+        return [(d.strftime(DATE_FORMAT), ftp) for d, ftp in self._ftp.items()]
 
-    def set_weight(self, weight: float, from_date: str | None = None) -> None:
+    def set_weight(self, weight: float, from_date: date | str | None = None) -> None:
         """Set the weight for a specific date.
 
         If the from_date is not given, the weight is set for today.
 
         Args:
             weight (float): The weight (kg) to set.
-            from_date (str): The date ("yyyy-mm-dd") to set the weight for
+            from_date (date | str): The date ("yyyy-mm-dd") to set the weight for
 
         """
         if self._weight is None:
-            self._weight = []
+            self._weight = _History()
 
         # If no from_date is given, set the FTP for today:
         if from_date is None:
             _from_date = datetime.now(UTC).date()
         else:
-            _from_date = (
-                datetime.strptime(from_date, "%Y-%m-%d").replace(tzinfo=UTC).date()
-            )
-        self._weight.append((_from_date, weight))
-        # sort the list by date in descending order:
-        self._weight = sorted(self._weight, key=lambda x: x[0], reverse=True)
+            _from_date = _to_date(from_date)
+        self._weight.set(_from_date, weight)
 
-    def get_weight(self, from_date: str | None = None) -> float | None:
+    def get_weight(self, from_date: date | str | None = None) -> float | None:
         """Get the weight for a specific date.
 
         If the from_date is not given, the latest weight is returned.
 
         Args:
-            from_date (str): The date ("yyyy-mm-dd") to get the weight for.
+            from_date (date | str): The date ("yyyy-mm-dd") to get the weight for.
 
         Returns:
             float: The weight.
@@ -129,17 +572,25 @@ class Athlete:
         # If no weight is set, return None:
         if self._weight is None:
             return None
-        # If no from_date is given, return the latest weight:
-        if from_date is None:
-            return self._weight[0][1] if self._weight else None
-        _from_date = datetime.strptime(from_date, "%Y-%m-%d").replace(tzinfo=UTC).date()
 
-        # Find the weight for the given date:
-        for weight in self._weight:
-            if weight[0] <= _from_date:
-                return weight[1]
+        return self._weight.get(None if from_date is None else _to_date(from_date))
+
+    def get_weights(self, dates: Iterable[date | str]) -> list[float | None]:
+        """Get the weight for each of many dates.
 
-        return None
+        Args:
+            dates (Iterable[date | str]): The dates ("yyyy-mm-dd") to get the
+                weights for.
+
+        Returns:
+            list[float | None]: The weight for each date, None where no weight
+                is set.
+        """
+        _dates = [_to_date(d) for d in dates]
+        if self._weight is None:
+            return [None] * len(_dates)
+
+        return self._weight.get_many(_dates)
 
     def get_all_weights(self) -> list[tuple[str, float]] | None:
         """Get all weights and their dates.
@@ -150,15 +601,15 @@ class Athlete:
         if self._weight is None:
             return None
 
-        return [(weight[0].strftime("%Y-%m-%d"), weight[1]) for weight in self._weight]
+        return [(d.strftime(DATE_FORMAT), weight) for d, weight in self._weight.items()]
 
-    def get_ftp_pr_kg(self, from_date: str | None = None) -> float | None:
+    def get_ftp_pr_kg(self, from_date: date | str | None = None) -> float | None:
         """Get ftp per kg (w/kg) for a specific date.
 
         If the from_date is not given, the latest w/kg is returned.
 
         Args:
-            from_date (str): The date ("yyyy-mm-dd") to get the w/kg for.
+            from_date (date | str): The date ("yyyy-mm-dd") to get the w/kg for.
 
         Returns:
             float: The w/kg.
@@ -179,19 +630,56 @@ class Athlete:
         if self._weight is None or self._ftp is None:
             return None
 
-        # Merge the ftps and weights and calculate the w/kg:
-        ftp_pr_kg = []
-        # Concatenate the dates from the ftps and weights:
-        dates = set(
-            [ftp[0] for ftp in self._ftp] + [weight[0] for weight in self._weight]
-        )
-        # Sort the dates in descending order:
-        dates = sorted(dates, reverse=True)
+        # The dates from the ftps and weights, in descending order:
+        ordinals = sorted(set(self._ftp.dates) | set(self._weight.dates), reverse=True)
+        dates = [date.fromordinal(d) for d in ordinals]
         # Calculate the w/kg for each date:
-        for _date in dates:
-            ftp = self.get_ftp(_date.strftime("%Y-%m-%d"))
-            weight = self.get_weight(_date.strftime("%Y-%m-%d"))
-            if weight is not None and ftp is not None:  # pragma: no branch
-                ftp_pr_kg.append((_date.strftime("%Y-%m-%d"), ftp / weight))
+        ftp_pr_kg = []
+        for _date, ftp, weight in zip(
+            dates,
+            self._ftp.get_many(dates),
+            self._weight.get_many(dates),
+            strict=True,
+        ):
+            if weight is not None and ftp is not None:
+                ftp_pr_kg.append((_date.strftime(DATE_FORMAT), ftp / weight))
 
         return ftp_pr_kg
+
+    def add_activity(self, activity: Activity, day: date | str) -> None:
+        """Add the training stress score of an activity to the training load.
+
+        If the activity has no FTP, it is scored with the athlete's FTP for the
+        day. The activity itself is left unchanged.
+
+        Args:
+            activity (Activity): The activity.
+            day (date | str): The day ("yyyy-mm-dd") of the activity.
+        """
+        if activity.ftp is not None:
+            self.training_load.add(day, activity.training_stress_score)
+            return
+
+        ftp = self.get_ftp(day)
+        training_stress_score = 0.0
+        if activity.normalized_power and ftp and activity.duration:
+            intensity_factor = activity.normalized_power / ftp
+            training_stress_score = (
+                (activity.normalized_power * intensity_factor * activity.duration)
+                / (ftp * 3600)
+                * 100
+            )
+        self.training_load.add(day, training_stress_score)
+
+    def add_power_curve(
+        self, activity: Activity, day: date | str, activity_id: str | None = None
+    ) -> None:
+        """Add the power duration curve of an activity to the mean-maximal power.
+
+        Args:
+            activity (Activity): The activity.
+            day (date | str): The day ("yyyy-mm-dd") of the activity.
+            activity_id (str): The id of the activity, kept as the provenance of
+                its best powers.
+        """
+        self.mean_max.add(day, activity.power_duration_curve, activity_id)
@@ -0,0 +1,167 @@
+"""Module for the live activity model.
+
+Examples:
+    >>> from power_metrics_lib import LiveActivity
+    >>>
+    >>> # Create a live activity:
+    >>> activity = LiveActivity(ftp=200)
+    >>>
+    >>> # Append samples as they arrive from the trainer:
+    >>> activity.append(150)
+    >>> activity.extend([160, 170])
+    >>>
+    >>> # Check the metrics:
+    >>> assert activity.duration == 3
+    >>> assert activity.average_power == 160
+"""
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import cast
+
+from power_metrics_lib.profiling import instrumented
+
+from .activity import Activity, ActivityValidationError, _validation_errors
+
+
+@dataclass
+class LiveActivity(Activity):
+    """Model for a live activity, where samples are appended as they arrive.
+
+    Running sums are updated on every sample, so that the duration, average
+    power, max power, total work, normalized power, intensity factor, training
+    stress score and power profile are available in O(1) at any time. The
+    power duration curve is calculated on demand from the samples.
+
+    Samples must be added with `append` or `extend`.
+    """
+
+    def __init__(
+        self,
+        ftp: int | None = None,
+        window_size: int | None = None,
+        *,
+        power_limit: int | None = None,
+    ) -> None:
+        """Initialize the live activity."""
+        super().__init__(ftp=ftp, window_size=window_size, power_limit=power_limit)
+        # The window size the rolling sums are calculated for:
+        self._window_size = self.window_size
+        # cumulative[i] is the sum of the first i power samples:
+        self._cumulative = [0]
+        self._max_power = 0
+        # The sum of the rolling average power to the fourth:
+        self._rolling_sum = 0.0
+        # The max sum of power over the window of each power profile duration.
+        # As in Activity.power_profile, duration d is read from the power
+        # duration curve at index d - 1:
+        self._profile_windows: dict[int, int] = {
+            d: d - 1 for d in self.POWER_PROFILE_DURATIONS
+        }
+        self._profile_sums: dict[int, int] = dict.fromkeys(self._profile_windows, 0)
+
+    def append(self, power: int, timestamp: int | None = None) -> None:
+        """Append a sample.
+
+        Args:
+            power: The power.
+            timestamp: The timestamp, defaults to one second after the last.
+
+        Raises:
+            ActivityValidationError: If the power or timestamp is invalid, see
+                `Activity.validate`.
+        """
+        self.extend([power], None if timestamp is None else [timestamp])
+
+    def extend(
+        self, power: Iterable[int], timestamps: Iterable[int] | None = None
+    ) -> None:
+        """Append a batch of samples.
+
+        The samples are validated as in `Activity.validate`, and none of them
+        are appended if any is invalid.
+
+        Args:
+            power: The power data.
+            timestamps: The timestamps, defaults to one second apart.
+
+        Raises:
+            ActivityValidationError: If any of the samples is invalid.
+        """
+        # A live activity is always list backed:
+        previous = self.timestamps[-1] if self.timestamps else None
+        power = list(power)
+        if timestamps is None:
+            start = 1 if previous is None else previous + 1
+            timestamps = list(range(start, start + len(power)))
+        else:
+            timestamps = list(timestamps)
+        errors = _validation_errors(timestamps, power, self.power_limit, previous)
+        if errors:
+            raise ActivityValidationError(errors) from None
+
+        for p, t in zip(power, timestamps, strict=True):
+            self._append(p, t)
+        self.invalidate_metrics()
+
+    def _append(self, power: int, timestamp: int) -> None:
+        """Append a valid sample, and update the running sums."""
+        cast("list[int]", self.timestamps).append(timestamp)
+        cast("list[int]", self.power).append(power)
+
+        cumulative = self._cumulative
+        cumulative.append(cumulative[-1] + power)
+        n = len(self.power)
+        self._max_power = max(self._max_power, power)
+
+        if n >= self._window_size:
+            rolling = (cumulative[n] - cumulative[n - self._window_size]) / (
+                self._window_size
+            )
+            self._rolling_sum += rolling**4
+
+        for d, window in self._profile_windows.items():
+            if n >= window:
+                self._profile_sums[d] = max(
+                    self._profile_sums[d], cumulative[n] - cumulative[n - window]
+                )
+
+    @instrumented
+    def calculate_average_power(self) -> None:
+        """Calculate the average power from the running sum."""
+        self.average_power = 0
+        if self.power:
+            self.average_power = self._cumulative[-1] / len(self.power)
+
+    @instrumented
+    def calculate_normalized_power(self) -> None:
+        """Calculate the normalized power from the running sum."""
+        if self.window_size != self._window_size:
+            # The rolling sums are for another window size:
+            super().calculate_normalized_power()
+            return
+
+        self.normalized_power = 0
+        if len(self.power) < self.window_size:
+            return
+
+        windows = len(self.power) - self.window_size + 1
+        self.normalized_power = round((self._rolling_sum / windows) ** 0.25, 0)
+
+    @instrumented
+    def calculate_total_work(self) -> None:
+        """Calculate the total work from the running sum."""
+        self.total_work = self._cumulative[-1]
+
+    @instrumented
+    def calculate_max_power(self) -> None:
+        """Calculate the max power from the running max."""
+        self.max_power = self._max_power
+
+    @instrumented
+    def calculate_power_profile(self) -> None:
+        """Calculate the power profile from the running max sums."""
+        self.power_profile = {}
+        for d, window in self._profile_windows.items():
+            if d <= self.duration:
+                self.power_profile[d] = round(self._profile_sums[d] / window)
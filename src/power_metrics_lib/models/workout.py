@@ -15,21 +15,38 @@ Examples:
     >>> # Check the metrics:
     >>> assert 3360 == workout.duration
     >>> assert 127 == round(workout.average_power, 0)
+    >>>
+    >>> # The samples are only expanded from the blocks when accessed:
+    >>> assert len(workout.power) == 3360
 """
 
 from abc import ABC
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+import numpy as np
 
-from defusedxml.ElementTree import parse
+from power_metrics_lib.calculations import (
+    compact_runs,
+    max_mean_power_curve_from_runs,
+    max_mean_powers_from_runs,
+    normalized_power_from_runs,
+)
+from power_metrics_lib.profiling import Profiler, instrumented
+from power_metrics_lib.zones import COGGAN_ZONES, ZoneModel
 
 from .activity import Activity
 
+if TYPE_CHECKING:
+    from xml.etree.ElementTree import Element
+
 
 class UnsupportedFileTypeError(Exception):
     """Unsupported file type."""
 
 
-@dataclass
+@dataclass(slots=True)
 class Block(ABC):
     """Model for a block.
 
@@ -39,8 +56,21 @@ class Block(ABC):
 
     duration: int
 
+    def intensity_runs(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return the run-length encoded power targets of the block.
 
-@dataclass
+        Returns:
+            The power of each run as a fraction of FTP, and its length in
+            seconds.
+
+        Raises:
+            TypeError: If the block type is invalid.
+        """
+        msg = f"Invalid block type: {type(self)}"
+        raise TypeError(msg) from None
+
+
+@dataclass(slots=True)
 class Ramp(Block):
     """Model for a ramp block.
 
@@ -52,18 +82,25 @@ class Ramp(Block):
     start_power: float
     end_power: float
 
+    def intensity_runs(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return the power target of every second, clipped to 0."""
+        # Calculate the power increase per second
+        power_increase_per_second = (self.end_power - self.start_power) / self.duration
+        ramp = self.start_power + np.arange(self.duration) * power_increase_per_second
+        return np.where(ramp > 0, ramp, 0), np.ones(self.duration, np.int64)
 
-@dataclass
+
+@dataclass(slots=True)
 class Warmup(Ramp):
     """Model for a warmup block."""
 
 
-@dataclass
+@dataclass(slots=True)
 class Cooldown(Ramp):
     """Model for a cooldown block."""
 
 
-@dataclass
+@dataclass(slots=True)
 class SteadyState(Block):
     """Model for a steady state block.
 
@@ -73,8 +110,12 @@ class SteadyState(Block):
 
     power: float
 
+    def intensity_runs(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return the power target as a single run."""
+        return np.array([self.power]), np.array([self.duration])
 
-@dataclass
+
+@dataclass(slots=True)
 class Interval(Block):
     """Model for an interval block.
 
@@ -97,28 +138,226 @@ class Interval(Block):
         """Calculate the duration of the interval block."""
         self.duration = self.repeat * (self.on_duration + self.off_duration)
 
+    def intensity_runs(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return the on and off power targets as a run each, per repeat."""
+        return (
+            np.tile([self.on_power, self.off_power], self.repeat),
+            np.tile([self.on_duration, self.off_duration], self.repeat),
+        )
 
-@dataclass
+
+@dataclass(slots=True)
 class FreeRide(Block):
     """Model for a free ride block."""
 
+    def intensity_runs(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return no runs, a free ride block has no samples."""
+        return np.empty(0), np.empty(0, np.int64)
+
+
+# The block types of a structured block array, by their "type" code:
+BLOCK_TYPES: tuple[type[Block], ...] = (
+    SteadyState,
+    Ramp,
+    Warmup,
+    Cooldown,
+    Interval,
+    FreeRide,
+)
+# A block per record: the power fields are the power of a steady state block,
+# the start and end power of a ramp, or the on and off power of an interval.
+BLOCK_DTYPE = np.dtype(
+    [
+        ("type", np.uint8),
+        ("duration", np.int32),
+        ("repeat", np.int32),
+        ("on_duration", np.int32),
+        ("off_duration", np.int32),
+        ("power_low", np.float64),
+        ("power_high", np.float64),
+    ]
+)
+_RAMPS: dict[str, type[Ramp]] = {"Warmup": Warmup, "Cooldown": Cooldown, "Ramp": Ramp}
+
+
+def blocks_to_array(blocks: Iterable[Block]) -> np.ndarray:
+    """Pack blocks into a structured array of `BLOCK_DTYPE`.
+
+    A record takes 33 bytes, a fraction of a block object, e.g. for keeping
+    the blocks of a large library of workouts in memory.
+
+    Args:
+        blocks: The blocks.
+
+    Returns:
+        The array, with a record per block.
+
+    Raises:
+        TypeError: If the block type is invalid.
+    """
+    records = []
+    for block in blocks:
+        if type(block) not in BLOCK_TYPES:
+            msg = f"Invalid block type: {type(block)}"
+            raise TypeError(msg) from None
+
+        code = BLOCK_TYPES.index(type(block))
+        if isinstance(block, SteadyState):
+            records.append((code, block.duration, 0, 0, 0, block.power, block.power))
+        elif isinstance(block, Ramp):
+            records.append(
+                (code, block.duration, 0, 0, 0, block.start_power, block.end_power)
+            )
+        elif isinstance(block, Interval):
+            records.append(
+                (
+                    code,
+                    block.duration,
+                    block.repeat,
+                    block.on_duration,
+                    block.off_duration,
+                    block.on_power,
+                    block.off_power,
+                )
+            )
+        else:
+            records.append((code, block.duration, 0, 0, 0, 0.0, 0.0))
+
+    return np.array(records, dtype=BLOCK_DTYPE)
+
+
+def blocks_from_array(array: np.ndarray) -> list[Block]:
+    """Unpack blocks packed with `blocks_to_array`.
+
+    Args:
+        array: The structured array of `BLOCK_DTYPE`.
+
+    Returns:
+        The blocks.
+    """
+    blocks: list[Block] = []
+    for code, duration, repeat, on, off, low, high in array.tolist():
+        block_type = BLOCK_TYPES[code]
+        if block_type is SteadyState:
+            blocks.append(SteadyState(duration=duration, power=low))
+        elif issubclass(block_type, Ramp):
+            blocks.append(
+                block_type(duration=duration, start_power=low, end_power=high)
+            )
+        elif block_type is Interval:
+            blocks.append(
+                Interval(
+                    repeat=repeat,
+                    on_power=low,
+                    on_duration=on,
+                    off_power=high,
+                    off_duration=off,
+                )
+            )
+        else:
+            blocks.append(FreeRide(duration=duration))
+
+    return blocks
+
+
+def _duration(element: "Element", name: str = "Duration") -> int:
+    """Return a duration attribute, rounded to seconds."""
+    return int(round(float(element.attrib[name])))
+
+
+def _parse_block(element: "Element") -> Block:
+    """Create a block from its .zwo element."""
+    if element.tag == "SteadyState":
+        return SteadyState(
+            power=float(element.attrib["Power"]), duration=_duration(element)
+        )
+    if element.tag in _RAMPS:
+        return _RAMPS[element.tag](
+            duration=_duration(element),
+            start_power=float(element.attrib["PowerLow"]),
+            end_power=float(element.attrib["PowerHigh"]),
+        )
+    if element.tag == "IntervalsT":
+        return Interval(
+            repeat=int(element.attrib["Repeat"]),
+            on_power=float(element.attrib["OnPower"]),
+            off_power=float(element.attrib["OffPower"]),
+            on_duration=_duration(element, "OnDuration"),
+            off_duration=_duration(element, "OffDuration"),
+        )
+    if element.tag == "FreeRide":
+        return FreeRide(_duration(element))
+
+    msg = f"Unknown block type: {element.tag}"
+    raise ValueError(msg) from None
+
+
+def iter_workout_blocks(file_path: str) -> Iterator[Block]:
+    """Parse the blocks of a .zwo file incrementally.
+
+    The file is parsed as a stream, and each block is yielded as soon as its
+    element ends and then dropped, so the element tree is never held in
+    memory. Like the tree parser, the stream parser rejects DTDs with
+    entities and external references.
+
+    Args:
+        file_path: The path to the .zwo file.
+
+    Yields:
+        The blocks, in order.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        ValueError: If there are any errors parsing the .zwo file.
+    """
+    # The XML parser is only imported when needed:
+    from defusedxml.ElementTree import iterparse  # noqa: PLC0415
+
+    try:
+        events = iterparse(file_path, events=("start", "end"))
+    except FileNotFoundError as e:
+        msg = f"File not found: {file_path}"
+        raise FileNotFoundError(msg) from e
+
+    # The open elements, the blocks are the children of <workout>:
+    stack: list[Element] = []
+    for event, element in events:
+        if event == "start":
+            stack.append(element)
+            continue
+
+        stack.pop()
+        if len(stack) == 2 and stack[1].tag == "workout":  # noqa: PLR2004
+            yield _parse_block(element)
+            stack[1].remove(element)
+
 
 @dataclass
 class Workout(Activity):
     """Model for a workout.
 
+    When created with an FTP, the metrics are calculated from the run-length
+    encoded power of the blocks (see `power_runs`). The blocks are expanded to
+    per second timestamps and power data only when those are accessed.
+
     Attributes:
         blocks (list[Block]): The blocks.
     """
 
+    _SAMPLES = frozenset({"timestamps", "power"})
+
     def __init__(
         self,
         file_path: str | None = None,
         blocks: list[Block] | None = None,
         ftp: int | None = None,
+        *,
+        profiler: Profiler | None = None,
     ) -> None:
         """Initialize the workout."""
-        super().__init__(ftp=ftp)
+        # The run-length encoded power of the samples, until they are expanded:
+        self._runs: tuple[np.ndarray, np.ndarray] | None = None
+        super().__init__(ftp=ftp, validate=False, profiler=profiler)
 
         self.blocks = []
         if blocks is not None:
@@ -128,14 +367,169 @@ class Workout(Activity):
             self.parse_workout_file(file_path)
 
         if ftp is not None:
-            self.create_activity_from_workout(ftp)
-            super().calculate_metrics()
+            self._runs = self.power_runs(ftp)
+            # The samples are expanded on first access, see __getattr__:
+            del self.__dict__["timestamps"], self.__dict__["power"]
 
     blocks: list[Block] = field(default_factory=list)
 
-    def create_activity_from_workout(self, ftp: int) -> None:  # noqa: C901
+    def __getattr__(self, name: str) -> object:
+        """Expand the blocks on first access to the timestamps or power data."""
+        if name in self._SAMPLES and self.__dict__.get("_runs") is not None:
+            self._expand()
+            return self.__dict__[name]
+
+        msg = f"{type(self).__name__!r} object has no attribute {name!r}"
+        raise AttributeError(msg)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        """Set an attribute, expanding the blocks first if it is a sample."""
+        if name in self._SAMPLES:
+            self._expand()
+        super().__setattr__(name, value)
+
+    def _expand(self) -> None:
+        """Expand the run-length encoded power to timestamps and power data."""
+        runs = self.__dict__.get("_runs")
+        if runs is None:
+            return
+
+        self.__dict__["_runs"] = None
+        power = np.repeat(*runs)
+        self.__dict__["timestamps"] = list(range(1, len(power) + 1))
+        self.__dict__["power"] = power.tolist()
+        # Reuse the array for the metrics:
+        self.__dict__["_power_array"] = power
+
+    def sample_count(self) -> int:
+        """Return the number of samples, without expanding the blocks."""
+        runs = self.__dict__.get("_runs")
+        if runs is not None:
+            return int(runs[1].sum())
+        return super().sample_count()
+
+    def time_in_zones(self, model: ZoneModel = COGGAN_ZONES) -> dict[str, int]:
+        """Calculate the time in each power zone, from the runs if not expanded.
+
+        See `Activity.time_in_zones`.
+        """
+        runs = self.__dict__.get("_runs")
+        if runs is None:
+            return super().time_in_zones(model)
+
+        zones = np.searchsorted(model.watts(self.ftp), runs[0], side="right")
+        counts = np.bincount(zones, runs[1], minlength=len(model.names))
+        return dict(zip(model.names, counts.astype(int).tolist(), strict=True))
+
+    def intensity_runs(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return the run-length encoded power targets of the workout.
+
+        Consecutive seconds with the same target are a single run, and free
+        ride blocks have no runs.
+
+        Returns:
+            The power of each run as a fraction of FTP, and its length in
+            seconds.
+
+        Raises:
+            TypeError: If the block type is invalid.
+        """
+        runs = [block.intensity_runs() for block in self.blocks]
+        values = np.concatenate([np.empty(0), *(v for v, _ in runs)])
+        lengths = np.concatenate([np.empty(0, np.int64), *(n for _, n in runs)])
+        return compact_runs(values, lengths)
+
+    def power_runs(self, ftp: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return the run-length encoded power of the workout.
+
+        Args:
+            ftp: The functional threshold power.
+
+        Returns:
+            The integer power of each run, and its length in seconds.
+
+        Raises:
+            TypeError: If the block type is invalid.
+        """
+        intensities, lengths = self.intensity_runs()
+        return compact_runs(np.rint(intensities * ftp).astype(np.int64), lengths)
+
+    def metrics_for_ftps(self, ftps: Iterable[int]) -> dict[str, np.ndarray]:
+        """Calculate the metrics of the workout for many FTP values at once.
+
+        The blocks are encoded once as runs of FTP fractions, and the metrics
+        for all the FTP values are calculated together from a (FTPs x runs)
+        array of power. The values are the same as those of a workout created
+        with each FTP.
+
+        Args:
+            ftps: The functional threshold power values.
+
+        Returns:
+            A column per metric, with a row per FTP value: "ftp", the scalar
+            metrics of `METRICS`, and "power_profile_<duration>" for each
+            power profile duration within the workout.
+
+        Raises:
+            TypeError: If the block type is invalid.
+        """
+        ftp = np.fromiter(ftps, dtype=np.int64)
+        intensities, lengths = self.intensity_runs()
+        power = np.rint(intensities * ftp[:, None]).astype(np.int64)
+        duration = int(lengths.sum())
+        zeros = np.zeros(len(ftp))
+
+        total_work = power @ lengths
+        average_power = total_work / duration if duration else zeros
+        max_power = power.max(axis=1) if duration else zeros.astype(np.int64)
+        normalized_power = zeros
+        if duration and duration >= self.window_size:
+            normalized_power = np.round(
+                normalized_power_from_runs(power, lengths, self.window_size)
+            )
+        intensity_factor = np.divide(
+            normalized_power, ftp, out=zeros.copy(), where=ftp != 0
+        )
+        training_stress_score = np.divide(
+            normalized_power * intensity_factor * duration,
+            ftp * 3600,
+            out=zeros.copy(),
+            where=(intensity_factor != 0) & (duration != 0),
+        )
+        metrics = {
+            "ftp": ftp,
+            "duration": np.full(len(ftp), duration),
+            "average_power": average_power,
+            "normalized_power": normalized_power,
+            "max_power": max_power,
+            "intensity_factor": intensity_factor,
+            "training_stress_score": training_stress_score * 100,
+            "total_work": total_work,
+            "variability_index": np.divide(
+                normalized_power,
+                average_power,
+                out=zeros.copy(),
+                where=(normalized_power != 0) & (average_power != 0),
+            ),
+        }
+
+        durations = [d for d in self.POWER_PROFILE_DURATIONS if d <= duration]
+        if durations:
+            # power_duration_curve[d - 1] is the max power for duration d - 1:
+            max_mean_power = max_mean_powers_from_runs(
+                power, lengths, [d - 1 for d in durations]
+            )
+            for d, column in zip(durations, max_mean_power.T, strict=True):
+                metrics[f"power_profile_{d}"] = np.rint(column).astype(np.int64)
+
+        return metrics
+
+    @instrumented
+    def create_activity_from_workout(self, ftp: int) -> None:
         """Converts a workout to an activity.
 
+        Expands the blocks to per second timestamps and power data.
+
         Args:
             ftp: The functional threshold power.
 
@@ -145,39 +539,107 @@ class Workout(Activity):
         Raises:
             TypeError: If the block type is invalid.
         """
-        timestamp = 1
-        for block in self.blocks:
-            if isinstance(block, Warmup | Cooldown | Ramp):
-                # Calculate the power increase per second
-                power_increase_per_second = (
-                    block.end_power - block.start_power
-                ) / block.duration
-                for i in range(block.duration):
-                    self.timestamps.append(timestamp)
-                    power = block.start_power + i * power_increase_per_second
-                    self.power.append(round(power * ftp if power > 0 else 0))
-                    timestamp += 1
-            elif isinstance(block, SteadyState):
-                for _ in range(block.duration):
-                    self.timestamps.append(timestamp)
-                    self.power.append(round(block.power * ftp))
-                    timestamp += 1
-            elif isinstance(block, Interval):
-                for _ in range(block.repeat):
-                    for _ in range(block.on_duration):
-                        self.timestamps.append(timestamp)
-                        self.power.append(round(block.on_power * ftp))
-                        timestamp += 1
-                    for _ in range(block.off_duration):
-                        self.timestamps.append(timestamp)
-                        self.power.append(round(block.off_power * ftp))
-                        timestamp += 1
-            elif isinstance(block, FreeRide):
-                pass
-            else:
-                msg = f"Invalid block type: {type(block)}"
-                raise TypeError(msg) from None
-
+        power = np.repeat(*self.power_runs(ftp))
+        self.timestamps = list(range(1, len(power) + 1))
+        self.power = power.tolist()
+        # Reuse the array for the metrics:
+        self.__dict__["_power_array"] = power
+
+    @instrumented
+    def calculate_duration(self) -> None:
+        """Calculate the duration from the runs."""
+        if self._runs is None:
+            super().calculate_duration()
+            return
+
+        self.duration = int(self._runs[1].sum())
+
+    @instrumented
+    def calculate_average_power(self) -> None:
+        """Calculate the average power from the runs."""
+        if self._runs is None:
+            super().calculate_average_power()
+            return
+
+        self.average_power = 0
+        if self.duration:
+            self.average_power = self.total_work / self.duration
+
+    @instrumented
+    def calculate_normalized_power(self) -> None:
+        """Calculate the normalized power from the runs."""
+        if self._runs is None:
+            super().calculate_normalized_power()
+            return
+
+        self.normalized_power = 0
+        if not self.duration or self.duration < self.window_size:
+            return
+
+        self.normalized_power = round(
+            float(normalized_power_from_runs(*self._runs, self.window_size)), 0
+        )
+
+    @instrumented
+    def calculate_total_work(self) -> None:
+        """Calculate the total work from the runs."""
+        if self._runs is None:
+            super().calculate_total_work()
+            return
+
+        values, lengths = self._runs
+        self.total_work = int(values @ lengths)
+
+    @instrumented
+    def calculate_max_power(self) -> None:
+        """Calculate the max power from the runs."""
+        if self._runs is None:
+            super().calculate_max_power()
+            return
+
+        self.max_power = 0
+        if self.duration:
+            self.max_power = int(self._runs[0].max())
+
+    @instrumented
+    def calculate_power_duration_curve(self) -> None:
+        """Calculate the power duration curve from the runs."""
+        if self._runs is None:
+            super().calculate_power_duration_curve()
+            return
+
+        self.power_duration_curve = []
+        if not self.duration:
+            return
+
+        # The first entry is simply the max power:
+        self.power_duration_curve.append(self.max_power)
+        max_mean_power = max_mean_power_curve_from_runs(
+            *self._runs, max_duration=self.duration - 1
+        )
+        self.power_duration_curve.extend(np.rint(max_mean_power).astype(int).tolist())
+
+    @instrumented
+    def calculate_power_profile(self) -> None:
+        """Calculate the power profile from the runs."""
+        if self._runs is None:
+            super().calculate_power_profile()
+            return
+
+        self.power_profile = {}
+        durations = [d for d in self.POWER_PROFILE_DURATIONS if d <= self.duration]
+        if "power_duration_curve" in self.__dict__:
+            for d in durations:
+                self.power_profile[d] = self.power_duration_curve[d - 1]
+        elif durations:
+            # power_duration_curve[d - 1] is the max power for duration d - 1:
+            max_power = max_mean_powers_from_runs(
+                *self._runs, [d - 1 for d in durations]
+            )
+            for d, p in zip(durations, np.rint(max_power).tolist(), strict=True):
+                self.power_profile[d] = int(p)
+
+    @instrumented
     def parse_workout_file(self, file_path: str) -> None:
         """Parse a .zwo file and return a workout object.
 
@@ -199,67 +661,4 @@ class Workout(Activity):
             msg = f"Unsupported file type: {file_type}"
             raise UnsupportedFileTypeError(msg)
 
-        try:
-            tree = parse(file_path)
-        except FileNotFoundError as e:
-            msg = f"File not found: {file_path}"
-            raise FileNotFoundError(msg) from e
-
-        root = tree.getroot()
-        blocks = root.findall("./workout/*")
-
-        for block in blocks:
-            if block.tag == "SteadyState":
-                power = float(block.attrib["Power"])
-                duration = int(round(float(block.attrib["Duration"])))
-                self.blocks.append(SteadyState(power=power, duration=duration))
-            elif block.tag in ("Cooldown", "Warmup", "Ramp"):
-                power_low = float(block.attrib["PowerLow"])
-                power_high = float(block.attrib["PowerHigh"])
-                duration = int(round(float(block.attrib["Duration"])))
-                if block.tag == "Cooldown":
-                    self.blocks.append(
-                        Cooldown(
-                            duration=duration,
-                            start_power=power_low,
-                            end_power=power_high,
-                        )
-                    )
-                elif block.tag == "Warmup":
-                    self.blocks.append(
-                        Warmup(
-                            duration=duration,
-                            start_power=power_low,
-                            end_power=power_high,
-                        )
-                    )
-                else:
-                    # "Ramp"
-                    self.blocks.append(
-                        Ramp(
-                            duration=duration,
-                            start_power=power_low,
-                            end_power=power_high,
-                        )
-                    )
-            elif block.tag == "IntervalsT":
-                repeat = int(block.attrib["Repeat"])
-                on_power = float(block.attrib["OnPower"])
-                off_power = float(block.attrib["OffPower"])
-                on_duration = int(round(float(block.attrib["OnDuration"])))
-                off_duration = int(round(float(block.attrib["OffDuration"])))
-                self.blocks.append(
-                    Interval(
-                        repeat=repeat,
-                        on_power=on_power,
-                        off_power=off_power,
-                        on_duration=on_duration,
-                        off_duration=off_duration,
-                    )
-                )
-            elif block.tag == "FreeRide":
-                duration = int(round(float(block.attrib["Duration"])))
-                self.blocks.append(FreeRide(duration))
-            else:
-                msg = f"Unknown block type: {block.tag}"
-                raise ValueError(msg) from None
+        self.blocks.extend(iter_workout_blocks(file_path))
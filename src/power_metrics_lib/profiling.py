@@ -0,0 +1,302 @@
+"""Module for timing and profiling the stages of activities and workouts.
+
+A `Profiler` records the wall time, the number of samples and optionally the
+peak memory allocated of each stage: parsing a file, and calculating each
+metric. It is passed to an activity or workout, or installed for all of them
+as a context manager. Without a profiler, the stages are called directly.
+
+The time and memory of a stage include those of its nested stages, e.g. the
+training stress score includes the normalized power if it is calculated on
+first access. The parent stage of each record is kept.
+
+Examples:
+    >>> from power_metrics_lib import Activity
+    >>> from power_metrics_lib.profiling import Profiler
+    >>>
+    >>> # Profile all activities created in the block, including the memory:
+    >>> with Profiler(trace_memory=True) as profiler:
+    ...     activity = Activity("tests/files/activity.fit", ftp=236)
+    ...     activity.compute()
+    >>>
+    >>> # Query the records of a stage:
+    >>> [parse] = profiler.get("parse_activity_file")
+    >>> assert parse.samples == 7023
+    >>>
+    >>> # Or aggregate them per stage:
+    >>> summary = profiler.summary()
+    >>> assert "calculate_normalized_power" in summary["stage"]
+    >>>
+    >>> # A profiler can also be passed to a single activity:
+    >>> profiler = Profiler()
+    >>> activity = Activity("tests/files/activity.fit", ftp=236, profiler=profiler)
+    >>> assert profiler.get("parse_activity_file")
+"""
+
+import functools
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Concatenate, Protocol, Self
+
+import numpy as np
+
+
+class Profiled(Protocol):
+    """An object whose stages can be profiled."""
+
+    profiler: "Profiler | None"
+
+    def sample_count(self) -> int:
+        """Return the number of samples."""
+        ...
+
+
+@dataclass
+class StageRecord:
+    """The record of a stage.
+
+    Attributes:
+        stage (str): The name of the stage.
+        wall_time (float): The wall time in seconds.
+        samples (int): The number of samples at the end of the stage.
+        memory (int): The peak memory allocated in bytes, if traced.
+        parent (str): The name of the enclosing stage, if nested.
+    """
+
+    stage: str
+    wall_time: float
+    samples: int
+    memory: int | None = None
+    parent: str | None = None
+
+
+@dataclass
+class _Frame:
+    """A stage in progress."""
+
+    key: tuple[int, str]
+    start_memory: int | None
+    # The max of the traced memory peak before and during nested stages:
+    peak: int = 0
+
+
+_ACTIVE: ContextVar["Profiler | None"] = ContextVar("profiler", default=None)
+
+
+@dataclass
+class Profiler:
+    """Collector of stage records.
+
+    Memory is recorded while `tracemalloc` is tracing, which slows down the
+    stages. With `trace_memory`, the profiler starts tracing while it is
+    installed as a context manager.
+
+    The stages in progress are kept per thread, so a profiler can be shared by
+    the threads of an executor, e.g. with `aio.iter_load`. The memory is traced
+    for the whole process though, so the memory of stages running at the same
+    time in other threads is included.
+
+    Attributes:
+        trace_memory (bool): Trace the memory while installed.
+        records (list[StageRecord]): The records, in order of completion.
+    """
+
+    trace_memory: bool = False
+    records: list[StageRecord] = field(default_factory=list)
+    # The stages in progress of each thread:
+    _local: threading.local = field(
+        default_factory=threading.local, init=False, repr=False, compare=False
+    )
+    _tokens: list[tuple[Token["Profiler | None"], bool]] = field(
+        default_factory=list, init=False, repr=False
+    )
+
+    def __getstate__(self) -> dict[str, object]:
+        """Return the state for pickling, without the stages in progress."""
+        return {name: v for name, v in vars(self).items() if name != "_local"}
+
+    def __setstate__(self, state: dict[str, object]) -> None:
+        """Restore the state from pickling."""
+        vars(self).update(state)
+        self._local = threading.local()
+
+    @property
+    def _stack(self) -> list[_Frame]:
+        """Return the stages in progress of the current thread."""
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def __enter__(self) -> Self:
+        """Install the profiler for all activities and workouts."""
+        start_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if start_tracing:
+            tracemalloc.start()
+        self._tokens.append((_ACTIVE.set(self), start_tracing))
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        """Uninstall the profiler."""
+        token, started_tracing = self._tokens.pop()
+        _ACTIVE.reset(token)
+        if started_tracing:
+            tracemalloc.stop()
+
+    def get(self, stage: str) -> list[StageRecord]:
+        """Return the records of a stage.
+
+        Args:
+            stage: The name of the stage.
+
+        Returns:
+            The records, in order of completion.
+        """
+        return [record for record in self.records if record.stage == stage]
+
+    def merge(self, others: Iterable["Profiler"]) -> None:
+        """Add the records of other profilers, e.g. of the files of a batch.
+
+        Args:
+            others: The other profilers.
+        """
+        for other in others:
+            self.records.extend(other.records)
+
+    def clear(self) -> None:
+        """Remove all records."""
+        self.records.clear()
+
+    def summary(self) -> dict[str, np.ndarray]:
+        """Aggregate the records per stage.
+
+        Returns:
+            A column per statistic, with one row per stage in order of first
+            completion: the stage, the number of calls, the total, mean and max
+            wall time, the total number of samples, and the max peak memory
+            (NaN if not traced).
+        """
+        stages = list(dict.fromkeys(record.stage for record in self.records))
+        index = {stage: i for i, stage in enumerate(stages)}
+        rows = np.array([index[record.stage] for record in self.records], dtype=int)
+        wall_time = np.array([record.wall_time for record in self.records])
+        samples = np.array([record.samples for record in self.records], dtype=int)
+        memory = np.array(
+            [
+                np.nan if record.memory is None else record.memory
+                for record in self.records
+            ]
+        )
+
+        calls = np.bincount(rows, minlength=len(stages))
+        total_time = np.bincount(rows, wall_time, minlength=len(stages))
+        max_time = np.zeros(len(stages))
+        np.maximum.at(max_time, rows, wall_time)
+        max_memory = np.full(len(stages), np.nan)
+        np.fmax.at(max_memory, rows, memory)
+
+        return {
+            "stage": np.array(stages, dtype=object),
+            "calls": calls,
+            "total_time": total_time,
+            "mean_time": total_time / np.maximum(calls, 1),
+            "max_time": max_time,
+            "samples": np.bincount(rows, samples, minlength=len(stages)).astype(int),
+            "memory": max_memory,
+        }
+
+    @contextmanager
+    def stage(self, instance: Profiled, name: str) -> Iterator[None]:
+        """Record a stage of an activity or workout.
+
+        A stage nested in the same stage of the same instance, e.g. through
+        `super()`, is not recorded again.
+
+        Args:
+            instance: The activity or workout.
+            name: The name of the stage.
+        """
+        key = (id(instance), name)
+        if self._stack and self._stack[-1].key == key:
+            yield
+            return
+
+        parent = self._stack[-1] if self._stack else None
+        frame = _Frame(key=key, start_memory=None)
+        if tracemalloc.is_tracing():
+            frame.start_memory, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent.peak = max(parent.peak, peak)
+            tracemalloc.reset_peak()
+        self._stack.append(frame)
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start
+            self._stack.pop()
+            memory = None
+            if frame.start_memory is not None and tracemalloc.is_tracing():
+                peak = max(tracemalloc.get_traced_memory()[1], frame.peak)
+                memory = peak - frame.start_memory
+                if parent is not None:
+                    parent.peak = max(parent.peak, peak)
+            self.records.append(
+                StageRecord(
+                    stage=name,
+                    wall_time=wall_time,
+                    samples=instance.sample_count(),
+                    memory=memory,
+                    parent=None if parent is None else parent.key[1],
+                )
+            )
+
+
+def active_profiler(instance: Profiled) -> Profiler | None:
+    """Return the profiler of an instance, or the installed one, if any."""
+    return instance.profiler or _ACTIVE.get()
+
+
+def stage(instance: Profiled, name: str) -> AbstractContextManager[None]:
+    """Record a stage of an activity or workout, if profiled.
+
+    Args:
+        instance: The activity or workout.
+        name: The name of the stage.
+
+    Returns:
+        A context manager recording the stage.
+    """
+    profiler = active_profiler(instance)
+    if profiler is None:
+        return nullcontext()
+    return profiler.stage(instance, name)
+
+
+def instrumented[T: Profiled, **P, R](
+    method: Callable[Concatenate[T, P], R],
+) -> Callable[Concatenate[T, P], R]:
+    """Record the calls of a method as a stage named after the method.
+
+    Args:
+        method: The method of an activity or workout.
+
+    Returns:
+        The method, calling the original directly if not profiled.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self: T, *args: P.args, **kwargs: P.kwargs) -> R:
+        profiler = self.profiler or _ACTIVE.get()
+        if profiler is None:
+            return method(self, *args, **kwargs)
+        with profiler.stage(self, method.__name__):
+            return method(self, *args, **kwargs)
+
+    return wrapper
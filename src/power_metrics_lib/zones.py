@@ -0,0 +1,173 @@
+"""Module for power zone models and the time in zones of many activities.
+
+A zone model has its edges either in percent of FTP, like the Coggan power
+zones, or in watts.
+
+Examples:
+    >>> from power_metrics_lib import Activity
+    >>> from power_metrics_lib.zones import COGGAN_ZONES, ZoneModel, zone_distribution
+    >>>
+    >>> # The time in each Coggan zone of an activity:
+    >>> activity = Activity("tests/files/activity.fit", ftp=236)
+    >>> time_in_zones = activity.time_in_zones()
+    >>> assert sum(time_in_zones.values()) == activity.duration
+    >>>
+    >>> # Or in custom zones, in watts:
+    >>> model = ZoneModel.from_watts([150, 250], names=["Easy", "Steady", "Hard"])
+    >>> assert list(activity.time_in_zones(model)) == ["Easy", "Steady", "Hard"]
+    >>>
+    >>> # The time in zones of many activities, in one matrix:
+    >>> activities = [activity, Activity("tests/files/activity.fit", ftp=300)]
+    >>> matrix = zone_distribution(
+    ...     [a.power for a in activities], COGGAN_ZONES, [a.ftp for a in activities]
+    ... )
+    >>> assert matrix.shape == (2, 7)
+"""
+
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+from power_metrics_lib.calculations import time_in_zones_batch
+
+
+@dataclass(frozen=True)
+class ZoneModel:
+    """A power zone model.
+
+    Zone 0 is below the first edge, and zone i is from edge i - 1 (inclusive)
+    to edge i (exclusive). The last zone has no upper bound.
+
+    Attributes:
+        names (tuple[str, ...]): The name of each zone.
+        edges (tuple[float, ...]): The lower bound of each zone but the first.
+        relative (bool): The edges are in percent of FTP, rather than watts.
+    """
+
+    names: tuple[str, ...]
+    edges: tuple[float, ...]
+    relative: bool = True
+
+    def __post_init__(self) -> None:
+        """Validate the zone model.
+
+        Raises:
+            ValueError: If the edges are not non-negative and increasing, or
+                there is not a name for each zone.
+        """
+        edges = np.asarray(self.edges, dtype=np.float64)
+        if np.any(edges < 0) or np.any(np.diff(edges) <= 0):
+            msg = "Zone edges must be non-negative and increasing."
+            raise ValueError(msg) from None
+        if len(self.names) != len(self.edges) + 1:
+            msg = "There must be a name for each zone, one more than the edges."
+            raise ValueError(msg) from None
+
+    @classmethod
+    def from_ftp_percentages(
+        cls, percentages: Iterable[float], names: Iterable[str] | None = None
+    ) -> "ZoneModel":
+        """Create a zone model with edges in percent of FTP.
+
+        Args:
+            percentages: The lower bound of each zone but the first.
+            names: The name of each zone, defaults to "Z1", "Z2", ...
+
+        Returns:
+            The zone model.
+        """
+        edges = tuple(percentages)
+        return cls(names=_names(names, len(edges)), edges=edges, relative=True)
+
+    @classmethod
+    def from_watts(
+        cls, watts: Iterable[float], names: Iterable[str] | None = None
+    ) -> "ZoneModel":
+        """Create a zone model with edges in watts.
+
+        Args:
+            watts: The lower bound of each zone but the first.
+            names: The name of each zone, defaults to "Z1", "Z2", ...
+
+        Returns:
+            The zone model.
+        """
+        edges = tuple(watts)
+        return cls(names=_names(names, len(edges)), edges=edges, relative=False)
+
+    def watts(self, ftp: float | None = None) -> np.ndarray:
+        """Return the edges in watts.
+
+        Args:
+            ftp: The functional threshold power, for relative edges.
+
+        Returns:
+            The edges in watts.
+
+        Raises:
+            ValueError: If the edges are relative and there is no FTP.
+        """
+        edges = np.asarray(self.edges, dtype=np.float64)
+        if not self.relative:
+            return edges
+        if ftp is None:
+            msg = "An FTP is required for zones relative to FTP."
+            raise ValueError(msg) from None
+        return edges * ftp / 100
+
+
+def _names(names: Iterable[str] | None, num_edges: int) -> tuple[str, ...]:
+    """Return the zone names, defaulting to "Z1", "Z2", ..."""
+    if names is None:
+        return tuple(f"Z{i}" for i in range(1, num_edges + 2))
+    return tuple(names)
+
+
+# The Coggan power zones, in percent of FTP:
+COGGAN_ZONES = ZoneModel(
+    names=(
+        "Active Recovery",
+        "Endurance",
+        "Tempo",
+        "Lactate Threshold",
+        "VO2max",
+        "Anaerobic Capacity",
+        "Neuromuscular Power",
+    ),
+    edges=(55, 75, 90, 105, 120, 150),
+)
+
+
+def zone_distribution(
+    powers: Iterable[np.ndarray | Sequence[int]],
+    model: ZoneModel = COGGAN_ZONES,
+    ftps: Iterable[float | None] | None = None,
+) -> np.ndarray:
+    """Calculate the time in each zone of many activities, in one matrix.
+
+    The power data of the activities is binned together in chunks, see
+    `calculations.time_in_zones_batch`, so that this scales to many
+    activities. The power data is assumed to be one sample per second.
+
+    Args:
+        powers: The power data of each activity.
+        model: The zone model.
+        ftps: The FTP of each activity, for relative zone models.
+
+    Returns:
+        The seconds in each zone, with a row per activity and a column per
+        zone.
+
+    Raises:
+        ValueError: If the zone model is relative and an FTP is missing.
+    """
+    if not model.relative:
+        return time_in_zones_batch(powers, model.watts())
+
+    ftps = [None] if ftps is None else list(ftps)
+    if any(ftp is None for ftp in ftps):
+        msg = "An FTP is required for zones relative to FTP."
+        raise ValueError(msg) from None
+    edges = np.outer(np.asarray(ftps, dtype=np.float64), model.edges) / 100
+    return time_in_zones_batch(powers, edges.reshape(-1, len(model.edges)))
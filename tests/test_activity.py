@@ -1,8 +1,19 @@
 """Integration tests for the Activity class."""
 
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
 import pytest
 
-from power_metrics_lib.models import Activity
+from power_metrics_lib.models import Activity, ActivityValidationError, SegmentMetrics
 
 
 def test_create_activity_from_file() -> None:
@@ -64,6 +75,55 @@ def test_create_activity_with_non_positive_power() -> None:
         Activity(power=[-1, 1, 2], ftp=ftp)
 
 
+def test_validate_activity_report() -> None:
+    """Should report every failed check with the invalid samples."""
+    with pytest.raises(ActivityValidationError) as info:
+        Activity(
+            timestamps=[1, 3, 2, 2, 1],
+            power=[100, 5000, 100, 9000],
+            power_limit=Activity.MAX_POWER,
+        )
+
+    assert info.value.errors == [
+        "Timestamps must be non-decreasing. 2 invalid samples, the first at 2.",
+        "Power data must be at most 3000 W. 2 invalid samples, the first at 1.",
+        (
+            "Timestamps and power data must have the same length: "
+            "5 timestamps, 4 power samples."
+        ),
+    ]
+    assert isinstance(info.value, ValueError)
+
+
+def test_create_activity_with_power_limit() -> None:
+    """Should check the power data against the given power limit, if any."""
+    timestamps, power = [1, 2, 3], [100, 5000, 200]
+
+    with pytest.raises(ValueError, match="Power data must be at most 4000 W"):
+        Activity(timestamps=timestamps, power=power, power_limit=4000)
+    with pytest.raises(ValueError, match="Power data must be at most 4000 W"):
+        Activity.from_arrays(timestamps, power, power_limit=4000)
+    activity = Activity(timestamps=timestamps, power=power, power_limit=6000)
+    # Spikes are accepted without a power limit:
+    from_arrays = Activity.from_arrays(timestamps, power)
+    default = Activity(timestamps=timestamps, power=power)
+
+    assert activity.max_power == from_arrays.max_power == 5000  # noqa: PLR2004
+    assert default.max_power == 5000  # noqa: PLR2004
+
+
+def test_create_activity_without_validation() -> None:
+    """Should not validate the data in the trusted mode."""
+    timestamps = np.array([2, 1], dtype=np.uint32)
+    power = np.array([100, 9000], dtype=np.uint16)
+
+    activity = Activity.from_arrays(timestamps, power, validate=False)
+
+    assert activity.max_power == 9000  # noqa: PLR2004
+    with pytest.raises(ActivityValidationError):
+        activity.validate()
+
+
 def test_parse_activity_file_file_not_found() -> None:
     """Test the parse_activity_file function."""
     with pytest.raises(FileNotFoundError):
@@ -80,3 +140,389 @@ def test_create_activity_with_window_size_greater_than_power_data() -> None:
     """Should result in 0 normalized power."""
     activity = Activity(power=[100, 200, 300], window_size=4)
     assert activity.normalized_power == 0
+
+
+def test_calculate_max_power_for_duration() -> None:
+    """Should return the max rolling average power for the given duration."""
+    expected_max_power = 250
+
+    activity = Activity(power=[100, 200, 300, 200, 100])
+
+    assert activity.calculate_max_power_for_duration(2) == expected_max_power
+
+
+def test_create_activity_without_data() -> None:
+    """Should result in all metrics being empty."""
+    activity = Activity()
+
+    activity.calculate_metrics()
+
+    assert activity.duration == 0
+    assert activity.average_power == 0
+    assert activity.normalized_power == 0
+    assert activity.max_power == 0
+    assert activity.intensity_factor == 0
+    assert activity.training_stress_score == 0
+    assert activity.total_work == 0
+    assert activity.variability_index == 0
+    assert activity.power_duration_curve == []
+    assert activity.power_profile == {}
+
+
+def test_metrics_are_calculated_on_first_access() -> None:
+    """Should only calculate the metrics that are accessed."""
+    expected_average_power = 200
+
+    activity = Activity(timestamps=[1, 2, 3], power=[100, 200, 300])
+
+    assert "average_power" not in vars(activity)
+    assert activity.average_power == expected_average_power
+    assert "average_power" in vars(activity)
+    assert "power_duration_curve" not in vars(activity)
+
+
+def test_metrics_are_invalidated_when_inputs_change() -> None:
+    """Should recalculate the metrics when the power data or ftp is set."""
+    activity = Activity(timestamps=[1, 2, 3], power=[100, 200, 300], window_size=2)
+    activity.compute()
+    assert activity.intensity_factor == 0
+
+    activity.power = [200, 300, 400]
+    activity.ftp = 300
+
+    assert "average_power" not in vars(activity)
+    assert activity.max_power == 400  # noqa: PLR2004
+    assert activity.intensity_factor == activity.normalized_power / 300
+
+
+def test_compute_subset_of_metrics() -> None:
+    """Should only calculate the requested metrics and their dependencies."""
+    activity = Activity(timestamps=[1, 2, 3], power=[100, 200, 300], window_size=2)
+
+    activity.compute(["intensity_factor", "power_profile"])
+
+    assert "intensity_factor" in vars(activity)
+    assert "normalized_power" in vars(activity)
+    assert "power_profile" in vars(activity)
+    assert "total_work" not in vars(activity)
+
+
+def test_compute_unknown_metric() -> None:
+    """Should raise a ValueError for unknown metric names."""
+    activity = Activity(power=[100, 200, 300])
+
+    with pytest.raises(ValueError, match="Unknown metrics: foo"):
+        activity.compute(["foo", "max_power"])
+
+
+def test_create_activity_from_arrays() -> None:
+    """Should create an array backed activity with the same metrics."""
+    ftp = 236
+    activity = Activity(file_path="tests/files/activity.fit", ftp=ftp)
+    timestamps = np.asarray(activity.timestamps, dtype=np.uint32)
+    power = np.asarray(activity.power, dtype=np.uint16)
+
+    compact = Activity.from_arrays(timestamps, power, ftp=ftp)
+
+    # The arrays are used without copying:
+    assert compact.timestamps is timestamps
+    assert compact.power is power
+    for metric in Activity.METRICS:
+        assert getattr(compact, metric) == getattr(activity, metric)
+
+
+def test_create_activity_from_buffers() -> None:
+    """Should use objects supporting the buffer protocol without copying."""
+    expected_total_work = 600
+    timestamps = array("I", [1, 2, 3])
+    power = array("H", [100, 200, 300])
+
+    activity = Activity.from_arrays(timestamps, power)
+
+    assert isinstance(activity.power, np.ndarray)
+    assert np.shares_memory(activity.power, np.asarray(power))
+    assert activity.total_work == expected_total_work
+
+
+def test_create_activity_from_arrays_with_sequences() -> None:
+    """Should convert other sequences to the compact dtypes."""
+    activity = Activity.from_arrays([1, 2, 3], [100.4, 200.6, 70000.0])
+    empty = Activity.from_arrays([], [])
+
+    assert isinstance(activity.timestamps, np.ndarray)
+    assert isinstance(activity.power, np.ndarray)
+    assert isinstance(empty.power, np.ndarray)
+    assert activity.timestamps.dtype == Activity.TIMESTAMP_DTYPE
+    # The power data does not fit in the compact dtype:
+    assert activity.power.dtype == np.int64
+    assert activity.power.tolist() == [100, 201, 70000]
+    assert empty.power.dtype == Activity.POWER_DTYPE
+
+
+def test_float_power_is_rounded() -> None:
+    """Should round float power data the same for lists and arrays."""
+    power: list = [100.5, 200.2, 150.9]
+    activity = Activity(timestamps=[1, 2, 3], power=power)
+    from_arrays = Activity.from_arrays([1, 2, 3], power)
+
+    assert activity.average_power == (100 + 200 + 151) / 3
+    assert activity.total_work == 100 + 200 + 151
+    for metric in Activity.METRICS:
+        assert getattr(activity, metric) == getattr(from_arrays, metric), metric
+
+
+def test_compare_activities() -> None:
+    """Should compare the samples of list and array backed activities."""
+    activity = Activity(timestamps=[1, 2, 3], power=[100, 200, 300], ftp=200)
+
+    assert activity == Activity.from_arrays([1, 2, 3], [100, 200, 300], ftp=200)
+    assert activity != Activity.from_arrays([1, 2, 3], [100, 200, 301], ftp=200)
+    assert activity != Activity(timestamps=[1, 2, 3], power=[100, 200, 300])
+    assert activity != "activity"
+
+
+def test_save_and_load_activity(tmp_path: Path) -> None:
+    """Should save an activity and load it back memory-mapped."""
+    ftp = 236
+    window_size = 20
+    activity = Activity(file_path="tests/files/activity.fit", ftp=ftp)
+    activity.window_size = window_size
+
+    activity.save(tmp_path / "activity")
+    loaded = Activity.load(tmp_path / "activity")
+
+    assert isinstance(loaded.power, np.memmap)
+    assert isinstance(loaded.timestamps, np.memmap)
+    assert loaded.power.dtype == Activity.POWER_DTYPE
+    assert loaded.timestamps.dtype == Activity.TIMESTAMP_DTYPE
+    assert (loaded.ftp, loaded.window_size) == (ftp, window_size)
+    for metric in Activity.METRICS:
+        assert getattr(loaded, metric) == getattr(activity, metric)
+
+    in_memory = Activity.load(tmp_path / "activity", mmap=False)
+    assert not isinstance(in_memory.power, np.memmap)
+    np.testing.assert_array_equal(in_memory.power, activity.power)
+
+
+def test_load_activity_not_found(tmp_path: Path) -> None:
+    """Should raise a FileNotFoundError if there is no saved activity."""
+    with pytest.raises(FileNotFoundError, match="Activity not found"):
+        Activity.load(tmp_path)
+
+
+def test_load_activity_unsupported_format(tmp_path: Path) -> None:
+    """Should raise a ValueError if the format version is unsupported."""
+    Activity(timestamps=[1, 2], power=[100, 200]).save(tmp_path)
+    metadata_path = tmp_path / Activity.METADATA_FILE
+    metadata = json.loads(metadata_path.read_text())
+    metadata_path.write_text(json.dumps({**metadata, "format_version": 0}))
+
+    with pytest.raises(ValueError, match="Unsupported activity format: 0"):
+        Activity.load(tmp_path)
+
+
+def test_resample_activity() -> None:
+    """Should resample the activity to one sample per second."""
+    activity = Activity(timestamps=[1, 2, 4, 5], power=[100, 200, 300, 400])
+    assert activity.duration == 4  # noqa: PLR2004
+
+    activity.resample()
+
+    np.testing.assert_array_equal(activity.timestamps, [1, 2, 3, 4, 5])
+    np.testing.assert_array_equal(activity.power, [100, 200, 0, 300, 400])
+    assert activity.duration == 5  # noqa: PLR2004
+    assert activity.average_power == 200  # noqa: PLR2004
+
+
+def test_resample_activity_without_gaps() -> None:
+    """Should not change the metrics of an activity without gaps."""
+    activity = Activity(file_path="tests/files/activity.fit", ftp=236)
+    expected = {metric: getattr(activity, metric) for metric in Activity.METRICS}
+
+    activity.resample(fill="hold", max_gap=10)
+
+    for metric, value in expected.items():
+        assert getattr(activity, metric) == value
+
+
+def test_power_profile_without_power_duration_curve() -> None:
+    """Should calculate the same power profile without the full curve."""
+    activity = Activity(file_path="tests/files/activity.fit", fast_decode=True)
+    expected_power_profile = {
+        d: activity.power_duration_curve[d - 1]
+        for d in Activity.POWER_PROFILE_DURATIONS
+    }
+
+    activity.invalidate_metrics()
+
+    assert activity.power_profile == expected_power_profile
+    assert "power_duration_curve" not in vars(activity)
+
+
+def test_import_is_lazy() -> None:
+    """Should not import the file parsing dependencies until a file is parsed."""
+    code = (
+        "import sys; import power_metrics_lib; "
+        "print(sorted({'pandas', 'garmin_fit_sdk', 'defusedxml'} & set(sys.modules)))"
+    )
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+    )
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_aload() -> None:
+    """Should load an activity in an executor with the metrics calculated."""
+    activity = Activity("tests/files/activity.fit", ftp=236)
+
+    loaded = asyncio.run(Activity.aload("tests/files/activity.fit", ftp=236))
+
+    assert set(Activity.METRICS) <= vars(loaded).keys()
+    assert loaded.normalized_power == activity.normalized_power
+    assert loaded.power == activity.power
+
+
+def test_aload_in_process_pool() -> None:
+    """Should load an activity in a process pool, with a subset of metrics."""
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        loaded = asyncio.run(
+            Activity.aload(
+                "tests/files/activity.fit",
+                ftp=236,
+                fast_decode=True,
+                which=["normalized_power"],
+                executor=executor,
+            )
+        )
+
+    assert "normalized_power" in vars(loaded)
+    assert "power_profile" not in vars(loaded)
+    assert loaded.duration == len(loaded.power)
+
+
+def test_aload_file_not_found() -> None:
+    """Should raise an error if the file does not exist."""
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(Activity.aload("file_not_found.fit"))
+
+
+def test_aload_cancelled() -> None:
+    """Should cancel a load that has not started in the executor."""
+    release = threading.Event()
+
+    async def main(executor: ThreadPoolExecutor) -> None:
+        task = asyncio.create_task(
+            Activity.aload("tests/files/activity.fit", executor=executor)
+        )
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Keep the only worker busy, so that the load is queued:
+        busy = executor.submit(release.wait)
+        try:
+            asyncio.run(main(executor))
+        finally:
+            release.set()
+        assert busy.result()
+
+
+@pytest.mark.parametrize("in_process_pool", [False, True])
+def test_acompute(in_process_pool: bool) -> None:  # noqa: FBT001
+    """Should calculate the metrics in an executor and set them."""
+    activity = Activity("tests/files/activity.fit", ftp=236, fast_decode=True)
+    expected = Activity("tests/files/activity.fit", ftp=236, fast_decode=True)
+
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        pool = executor if in_process_pool else None
+        asyncio.run(activity.acompute(["training_stress_score"], executor=pool))
+        assert "power_profile" not in vars(activity)
+        assert vars(activity)["training_stress_score"] == (
+            expected.training_stress_score
+        )
+
+        asyncio.run(activity.acompute(executor=pool))
+        assert vars(activity)["power_profile"] == expected.power_profile
+
+
+def test_acompute_unknown_metric() -> None:
+    """Should raise an error for an unknown metric."""
+    activity = Activity(timestamps=[1, 2], power=[100, 200])
+
+    with pytest.raises(ValueError, match="Unknown metrics: foo"):
+        asyncio.run(activity.acompute(["foo"]))
+
+
+def test_segment_metrics() -> None:
+    """Should return the metrics of an activity of each segment's power data."""
+    activity = Activity("tests/files/activity.fit", ftp=236, fast_decode=True)
+    rng = np.random.default_rng(0)
+    starts, ends = np.sort(rng.integers(0, len(activity.power) + 1, (2, 100)), axis=0)
+    # Include segments shorter than the window size and an empty one:
+    starts[:2], ends[:2] = [10, 20], [30, 20]
+
+    segments = activity.segment_metrics(starts, ends)
+
+    assert isinstance(segments, SegmentMetrics)
+    for i, (start, end) in enumerate(zip(starts, ends, strict=True)):
+        power = activity.power[start:end]
+        expected = Activity(timestamps=list(range(1, len(power) + 1)), power=power)
+        assert segments.duration[i] == expected.duration
+        assert segments.average_power[i] == pytest.approx(expected.average_power)
+        assert segments.normalized_power[i] == expected.normalized_power
+        assert segments.max_power[i] == expected.max_power
+        assert segments.total_work[i] == expected.total_work
+
+
+def test_segment_metrics_single_segment() -> None:
+    """Should return 0-d arrays for a single segment, and follow the inputs."""
+    activity = Activity(timestamps=[1, 2, 3, 4], power=[100, 200, 300, 400])
+    activity.window_size = 2
+
+    segment = activity.segment_metrics(1, 4)
+
+    assert segment.normalized_power.shape == ()
+    assert float(segment.average_power) == 300  # noqa: PLR2004
+    assert int(segment.max_power) == 400  # noqa: PLR2004
+
+    activity.power = [100, 100, 100, 100]
+    assert int(activity.segment_metrics(1, 4).max_power) == 100  # noqa: PLR2004
+
+
+@pytest.mark.parametrize(("start", "end"), [(-1, 2), (3, 2), (0, 5)])
+def test_segment_metrics_out_of_range(start: int, end: int) -> None:
+    """Should raise an error for a segment that is not within the power data."""
+    activity = Activity(timestamps=[1, 2, 3, 4], power=[100, 200, 300, 400])
+
+    with pytest.raises(ValueError, match="Segments must be within the power data"):
+        activity.segment_metrics(start, end)
+
+
+def test_detect_intervals() -> None:
+    """Should detect the intervals above a fraction of FTP, with their metrics."""
+    ftp = 226
+    activity = Activity("tests/files/activity.fit", ftp=ftp, fast_decode=True)
+
+    intervals = activity.detect_intervals(on=0.9, off=0.75, min_duration=60)
+
+    assert intervals.start.size > 0
+    assert (intervals.duration >= 60).all()  # noqa: PLR2004
+    assert (intervals.start[1:] > intervals.end[:-1]).all()
+    expected = activity.segment_metrics(intervals.start, intervals.end)
+    np.testing.assert_array_equal(intervals.normalized_power, expected.normalized_power)
+    assert (intervals.average_power >= 0.75 * ftp).all()
+
+
+def test_detect_intervals_without_ftp() -> None:
+    """Should raise an error if there is no FTP."""
+    activity = Activity(timestamps=[1, 2, 3], power=[100, 200, 300])
+
+    with pytest.raises(ValueError, match="An FTP is required to detect intervals"):
+        activity.detect_intervals()
@@ -0,0 +1,113 @@
+"""Integration tests for the aio module."""
+
+import asyncio
+from collections.abc import AsyncIterator, Iterable
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from power_metrics_lib import Activity, aio
+from power_metrics_lib.cache import ActivityCache
+
+PATHS = [
+    "tests/files/activity.fit",
+    "file_not_found.fit",
+    "tests/files/zwift_workout.fit",
+    "tests/files/activity.fit",
+]
+NORMALIZED_POWER = 204
+
+
+def load_all(
+    paths: Iterable[str] | AsyncIterator[str], **kwargs: Any
+) -> list[aio.LoadResult]:
+    """Load all paths and return the results in order of the paths."""
+
+    async def main() -> list[aio.LoadResult]:
+        return [result async for result in aio.iter_load(paths, **kwargs)]
+
+    return sorted(asyncio.run(main()), key=lambda r: r.index)
+
+
+def test_iter_load() -> None:
+    """Should load every file and report the errors."""
+    activity = Activity(file_path="tests/files/activity.fit", ftp=236)
+
+    results = load_all(PATHS, ftp=236, concurrency=2)
+
+    assert [r.path for r in results] == PATHS
+    for result in (results[0], results[3]):
+        assert result.error is None
+        assert result.activity is not None
+        assert set(Activity.METRICS) <= vars(result.activity).keys()
+        assert result.activity.normalized_power == activity.normalized_power
+    assert isinstance(results[1].error, FileNotFoundError)
+    assert isinstance(results[2].error, ValueError)
+    assert results[2].activity is None
+
+
+def test_iter_load_async_paths() -> None:
+    """Should only take the next path when there is room for it."""
+    taken: list[str] = []
+    in_flight: list[int] = []
+
+    async def paths() -> AsyncIterator[str]:
+        for path in PATHS:
+            taken.append(path)
+            yield path
+
+    async def main() -> list[aio.LoadResult]:
+        results = []
+        async for result in aio.iter_load(paths(), concurrency=1, which=()):
+            in_flight.append(len(taken) - len(results))
+            results.append(result)
+        return results
+
+    results = asyncio.run(main())
+
+    assert [r.index for r in results] == [0, 1, 2, 3]
+    assert in_flight == [1, 1, 1, 1]
+    assert results[0].activity is not None
+    assert "normalized_power" not in vars(results[0].activity)
+
+
+def test_iter_load_with_cache(tmp_path: Path) -> None:
+    """Should load the files through a cache."""
+    cache = ActivityCache(tmp_path)
+
+    results = load_all(PATHS[:2], ftp=236, cache=cache, which=["normalized_power"])
+
+    assert results[0].activity is not None
+    assert results[0].activity.normalized_power == NORMALIZED_POWER
+    assert isinstance(results[1].error, FileNotFoundError)
+    assert cache.size() > 0
+
+    # The samples of the other decoder are cached apart:
+    load_all(PATHS[:1], cache=cache, fast_decode=False)
+    assert len(list(cache.directory.glob("samples-*.npz"))) == 2  # noqa: PLR2004
+
+
+def test_iter_load_empty() -> None:
+    """Should yield nothing for no paths."""
+    assert load_all([]) == []
+
+
+def test_iter_load_closed() -> None:
+    """Should cancel the files in flight when the iterator is closed."""
+
+    async def main() -> list[asyncio.Task]:
+        results = aio.iter_load(PATHS * 4, concurrency=4)
+        await anext(results)
+        await results.aclose()
+        tasks = asyncio.all_tasks() - {asyncio.current_task()}
+        await asyncio.sleep(0)
+        return [task for task in tasks if not task.done()]
+
+    assert asyncio.run(main()) == []
+
+
+def test_iter_load_with_invalid_concurrency() -> None:
+    """Should raise an error for a concurrency that is not positive."""
+    with pytest.raises(ValueError, match="Concurrency must be positive"):
+        load_all(PATHS, concurrency=0)
@@ -1,6 +1,17 @@
 """Tests for the Athlete class."""
 
-from power_metrics_lib import Athlete
+from datetime import UTC, date, datetime
+
+import numpy as np
+import pytest
+
+from power_metrics_lib import (
+    Activity,
+    Athlete,
+    MeanMaxEnvelope,
+    MeanMaxHistory,
+    TrainingLoad,
+)
 
 
 def test_create_athlete() -> None:
@@ -156,3 +167,261 @@ def test_get_all_ftp_pr_kg() -> None:
     assert all_ftp_pr_kgs is not None
     assert len(all_ftp_pr_kgs) == len(exptected_ftp_pr_kg)
     assert all_ftp_pr_kgs == exptected_ftp_pr_kg
+
+
+def test_get_ftp_with_date_objects() -> None:
+    """Should accept date and datetime objects as well as strings."""
+    athlete = Athlete(name="Alice")
+
+    athlete.set_ftp(ftp=200, from_date=date(2021, 1, 1))
+    athlete.set_ftp(ftp=210, from_date="2021-2-1")
+
+    assert athlete.get_ftp(from_date=date(2021, 1, 31)) == 200  # noqa: PLR2004
+    assert athlete.get_ftp(from_date=datetime(2021, 2, 1, tzinfo=UTC)) == 210  # noqa: PLR2004
+    assert athlete.get_ftp(from_date="2021-02-01") == 210  # noqa: PLR2004
+
+
+def test_set_ftp_for_same_date() -> None:
+    """Should keep the first FTP set for a date."""
+    athlete = Athlete(name="Alice")
+
+    athlete.set_ftp(ftp=200, from_date="2021-01-01")
+    athlete.set_ftp(ftp=210, from_date="2021-01-01")
+
+    assert athlete.get_ftp() == 200  # noqa: PLR2004
+    assert athlete.get_ftp(from_date="2021-01-01") == 200  # noqa: PLR2004
+    assert athlete.get_all_ftps() == [("2021-01-01", 200), ("2021-01-01", 210)]
+
+
+def test_get_ftps_and_weights() -> None:
+    """Should return the FTP and weight for each of many dates."""
+    dates = ["2020-12-31", date(2021, 1, 1), "2021-01-15", "2021-02-01"]
+
+    athlete = Athlete(name="Alice")
+
+    assert athlete.get_ftps(dates) == [None] * 4
+    assert athlete.get_weights(dates) == [None] * 4
+
+    athlete.set_ftp(ftp=200, from_date="2021-01-01")
+    athlete.set_ftp(ftp=210, from_date="2021-02-01")
+    athlete.set_weight(weight=70, from_date="2021-01-15")
+
+    assert athlete.get_ftps(dates) == [None, 200, 200, 210]
+    assert athlete.get_weights(dates) == [None, None, 70, 70]
+
+
+def test_get_all_ftp_pr_kg_without_weight_for_first_ftp() -> None:
+    """Should skip the dates without both an FTP and a weight."""
+    athlete = Athlete(name="Alice")
+
+    athlete.set_ftp(ftp=200, from_date="2021-01-01")
+    athlete.set_weight(weight=80, from_date="2021-02-01")
+
+    assert athlete.get_all_ftp_pr_kg() == [("2021-02-01", 200 / 80)]
+
+
+def naive_training_load(tss: list[float], days: int) -> list[float]:
+    """Calculate a training load with the daily recurrence."""
+    load, loads = 0.0, []
+    for score in tss:
+        load += (score - load) / days
+        loads.append(load)
+    return loads
+
+
+def test_training_load() -> None:
+    """Should calculate the daily ctl, atl and tsb from the TSS per day."""
+    training_load = TrainingLoad()
+
+    training_load.extend(["2021-01-01", "2021-01-03", "2021-01-03"], [100, 50, 30])
+    series = training_load.series()
+
+    assert series["date"].tolist() == [date(2021, 1, d) for d in (1, 2, 3)]
+    assert series["tss"].tolist() == [100, 0, 80]
+    assert series["ctl"].tolist() == pytest.approx(
+        naive_training_load([100, 0, 80], 42)
+    )
+    assert series["atl"].tolist() == pytest.approx(naive_training_load([100, 0, 80], 7))
+    assert series["tsb"].tolist() == pytest.approx(
+        [0, *(series["ctl"] - series["atl"])[:-1]]
+    )
+
+
+def test_training_load_incremental_updates() -> None:
+    """Should give the same series when activities are added one at a time."""
+    rng = np.random.default_rng(0)
+    days = [date.fromordinal(737791 + int(d)) for d in rng.integers(0, 400, 100)]
+    tss = rng.integers(0, 200, 100).tolist()
+    expected = TrainingLoad()
+    expected.extend(days, tss)
+
+    training_load = TrainingLoad()
+    for day, score in zip(days, tss, strict=True):
+        training_load.add(day, score)
+    training_load.extend([], [])
+
+    assert training_load.start == expected.start
+    for name, values in expected.series().items():
+        assert training_load.series()[name].tolist() == pytest.approx(values.tolist())
+
+
+def test_training_load_series_until_end() -> None:
+    """Should decay the training load over rest days until the end date."""
+    training_load = TrainingLoad()
+
+    assert len(training_load.series()["ctl"]) == 0
+    assert len(training_load.series(end="2021-01-01")["date"]) == 0
+
+    training_load.add("2021-01-01", 100)
+    series = training_load.series(end="2021-01-05")
+
+    assert series["tss"].tolist() == [100, 0, 0, 0, 0]
+    assert series["atl"].tolist() == pytest.approx(
+        naive_training_load([100, 0, 0, 0, 0], 7)
+    )
+    assert len(training_load.series(end="2020-12-31")["ctl"]) == 0
+    assert len(training_load.series(end="2020-12-29")["tss"]) == 0
+
+
+def test_training_load_after_rest_days() -> None:
+    """Should decay the training load over rest days before a later activity."""
+    expected = TrainingLoad()
+    expected.extend(["2021-01-01", "2021-01-05"], [100, 50])
+
+    training_load = TrainingLoad()
+    training_load.add("2021-01-01", 100)
+    training_load.add("2021-01-05", 50)
+
+    assert training_load.ctl.tolist() == pytest.approx(expected.ctl.tolist())
+    assert training_load.atl.tolist() == pytest.approx(
+        naive_training_load([100, 0, 0, 0, 50], 7)
+    )
+
+
+def test_training_load_grows_in_place() -> None:
+    """Should add the latest activities without reallocating the series."""
+    training_load = TrainingLoad()
+    training_load.add("2021-01-01", 100)
+    base = training_load.tss.base
+
+    training_load.add("2021-01-02", 50)
+
+    assert training_load.tss.base is base
+    assert training_load.tss.tolist() == [100, 50]
+    assert training_load.atl.tolist() == pytest.approx(
+        naive_training_load([100, 50], 7)
+    )
+
+
+def test_add_activity_to_athlete() -> None:
+    """Should add the TSS of an activity, scored with the FTP of the day."""
+    activity = Activity(timestamps=list(range(1, 3601)), power=[200] * 3600)
+    athlete = Athlete(name="Alice")
+    athlete.set_ftp(ftp=200, from_date="2021-01-01")
+
+    activity.compute()
+    metrics = vars(activity).copy()
+
+    athlete.add_activity(activity, "2021-02-01")
+
+    assert athlete.training_load.tss.tolist() == [100]
+    # The activity is left unchanged:
+    assert activity.ftp is None
+    assert vars(activity) == metrics
+
+    # Nothing is added without an FTP for the day:
+    athlete.add_activity(activity, "2020-12-31")
+    assert athlete.training_load.tss[[0, -1]].tolist() == [0, 100]
+
+    # The FTP of an activity is kept:
+    activity = Activity(timestamps=list(range(1, 3601)), power=[200] * 3600, ftp=400)
+    athlete.add_activity(activity, "2021-02-01")
+
+    assert athlete.training_load.tss[-1] == 125  # noqa: PLR2004
+
+
+def test_mean_max_envelope() -> None:
+    """Should keep the best power for each duration, and where it is from."""
+    first = MeanMaxEnvelope.from_curve([300, 250, 200], "2021-01-01", "a")
+    second = MeanMaxEnvelope.from_curve([280, 260, 200, 150], "2021-01-02", "b")
+
+    merged = first.merge(second)
+
+    assert merged.power.tolist() == [300, 260, 200, 150]
+    assert merged.activities.tolist() == ["a", "b", "a", "b"]
+    assert merged.days.tolist() == [
+        date(2021, 1, 1),
+        date(2021, 1, 2),
+        date(2021, 1, 1),
+        date(2021, 1, 2),
+    ]
+    # The envelopes are not changed, and the merge is commutative:
+    assert first.power.tolist() == [300, 250, 200]
+    assert second.merge(first).activities.tolist() == merged.activities.tolist()
+
+
+def test_mean_max_envelope_power_profile() -> None:
+    """Should read the power profile from the envelope as an activity does."""
+    activity = Activity(timestamps=list(range(1, 601)), power=[100, 400] * 300)
+    envelope = MeanMaxEnvelope.from_curve(activity.power_duration_curve, "2021-01-01")
+
+    assert envelope.power_profile() == activity.power_profile
+    assert MeanMaxEnvelope().power_profile() == {}
+
+
+def test_mean_max_history() -> None:
+    """Should merge the envelope of any window of days from the kept envelopes."""
+    rng = np.random.default_rng(0)
+    days = [date.fromordinal(737791 + int(d)) for d in rng.integers(0, 200, 50)]
+    curves = [
+        np.sort(rng.integers(100, 1000, int(rng.integers(1, 20))))[::-1].tolist()
+        for _ in days
+    ]
+    history = MeanMaxHistory()
+    for i, (day, curve) in enumerate(zip(days, curves, strict=True)):
+        history.add(day, curve, activity_id=str(i))
+
+    windows = [(None, None), (days[0], None), (None, days[1]), (days[2], days[3])]
+    windows += [(date.fromordinal(737791 + d), None) for d in range(0, 200, 7)]
+    for start, end in windows:
+        envelope = history.envelope(start, end)
+        first = start or min(days)
+        last = end or max(days)
+        expected = MeanMaxEnvelope()
+        for i, (day, curve) in enumerate(zip(days, curves, strict=True)):
+            if first <= day <= last:
+                expected.update(MeanMaxEnvelope.from_curve(curve, day, str(i)))
+
+        assert envelope.power.tolist() == expected.power.tolist()
+        assert envelope.days.tolist() == expected.days.tolist()
+        # Equal powers from the same day may be from either activity:
+        for i, day in zip(envelope.activities, envelope.days.tolist(), strict=True):
+            assert days[int(i)] == day
+
+
+def test_mean_max_history_rolling() -> None:
+    """Should return the envelope of the last days."""
+    history = MeanMaxHistory()
+
+    assert len(history.rolling(90).power) == 0
+    assert len(history.envelope().power) == 0
+
+    history.add("2021-01-01", [500, 400])
+    history.add("2021-03-01", [300, 200, 100])
+
+    assert history.rolling(90).power.tolist() == [500, 400, 100]
+    assert history.rolling(30).power.tolist() == [300, 200, 100]
+    assert history.rolling(1, end="2021-01-01").power.tolist() == [500, 400]
+    assert len(history.rolling(30, end="2021-02-01").power) == 0
+
+
+def test_add_power_curve_to_athlete() -> None:
+    """Should add the power duration curve of an activity to the mean-max power."""
+    activity = Activity(timestamps=list(range(1, 11)), power=[100, 300] * 5)
+    athlete = Athlete(name="Alice")
+
+    athlete.add_power_curve(activity, "2021-02-01", activity_id="ride")
+
+    envelope = athlete.mean_max.envelope()
+    assert envelope.power.tolist() == activity.power_duration_curve
+    assert set(envelope.activities) == {"ride"}
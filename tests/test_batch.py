@@ -0,0 +1,107 @@
+"""Integration tests for the batch module."""
+
+from pathlib import Path
+
+import numpy as np
+
+from power_metrics_lib import Activity, batch
+from power_metrics_lib.cache import ActivityCache
+
+PATHS = [
+    "tests/files/activity.fit",
+    "file_not_found.fit",
+    "tests/files/zwift_workout.fit",
+    "tests/files/activity.fit",
+]
+
+
+def test_process() -> None:
+    """Should summarize every file and report the errors."""
+    ftp = 236
+    activity = Activity(file_path="tests/files/activity.fit", ftp=ftp)
+
+    result = batch.process(PATHS, ftp=ftp, workers=2)
+
+    assert result.summary["path"].tolist() == [PATHS[0], PATHS[3]]
+    for metric in batch.SUMMARY_METRICS:
+        assert result.summary[metric].tolist() == [getattr(activity, metric)] * 2
+    for d, column in batch.POWER_PROFILE_COLUMNS.items():
+        assert result.summary[column].tolist() == [activity.power_profile[d]] * 2
+    assert result.summary["duration"].dtype == np.int64
+    assert result.errors == {
+        "file_not_found.fit": "FileNotFoundError: File not found: file_not_found.fit",
+        "tests/files/zwift_workout.fit": (
+            "ValueError: No record messages found in the .fit file."
+        ),
+    }
+
+
+def test_iter_process_in_process() -> None:
+    """Should yield a result per file when running in this process."""
+    results = list(batch.iter_process(PATHS[:2], workers=1, fast_decode=False))
+
+    assert [r.index for r in results] == [0, 1]
+    assert results[0].metrics is not None
+    assert results[1].error is not None
+
+
+def test_process_empty_batch() -> None:
+    """Should return an empty summary table."""
+    result = batch.process([], workers=1)
+
+    assert result.summary["path"].tolist() == []
+    assert result.summary["power_profile_5"].tolist() == []
+    assert result.errors == {}
+
+
+def test_summarize_short_activity() -> None:
+    """Should set power profile durations longer than the activity to NaN."""
+    activity = Activity(timestamps=list(range(1, 11)), power=[100] * 10)
+
+    metrics = batch.summarize(activity)
+
+    assert metrics["power_profile_5"] == 100  # noqa: PLR2004
+    assert np.isnan(metrics["power_profile_60"])
+
+
+def test_iter_process_more_files_than_in_flight() -> None:
+    """Should keep submitting files as results complete."""
+    paths = [f"file_not_found_{i}.fit" for i in range(20)]
+
+    results = list(batch.iter_process(paths, workers=2))
+
+    assert sorted(r.index for r in results) == list(range(20))
+    assert all(r.error is not None for r in results)
+
+
+def test_process_with_cache(tmp_path: Path) -> None:
+    """Should produce the same summary when reading through the cache."""
+    ftp = 236
+    cache = ActivityCache(tmp_path / "cache")
+    expected = batch.process(PATHS[:2], ftp=ftp, workers=1)
+
+    batch.process(PATHS[:2], ftp=ftp, workers=2, cache=cache)
+    result = batch.process(PATHS[:2], ftp=ftp, workers=1, cache=cache)
+
+    assert len(list(cache.directory.iterdir())) == 2  # noqa: PLR2004
+    assert result.errors == expected.errors
+    for column, values in expected.summary.items():
+        assert result.summary[column].tolist() == values.tolist()
+
+    # The samples of the other decoder are cached apart:
+    batch.process(PATHS[:2], ftp=ftp, workers=1, fast_decode=False, cache=cache)
+    assert len(list(cache.directory.glob("samples-*.npz"))) == 2  # noqa: PLR2004
+
+
+def test_process_with_profile() -> None:
+    """Should collect the stage records of every file in batch order."""
+    result = batch.process(PATHS[:2], ftp=236, workers=2, profile=True)
+
+    # The stages of the file that failed are recorded too:
+    stages = [record.stage for record in result.profiler.records]
+    assert stages[-2:] == ["read_records", "parse_activity_file"]
+    reads = result.profiler.get("read_records")
+    assert [r.samples for r in reads] == [len(Activity(PATHS[0]).power), 0]
+
+    result = batch.process(PATHS[:2], ftp=236, workers=1)
+    assert result.profiler.records == []
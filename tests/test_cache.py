@@ -0,0 +1,184 @@
+"""Integration tests for the cache module."""
+
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from power_metrics_lib import Activity
+from power_metrics_lib import cache as cache_module
+from power_metrics_lib.cache import ActivityCache
+
+FTP = 236
+
+
+@pytest.fixture
+def activity_file(tmp_path: Path) -> str:
+    """Copy the test activity to a temporary file."""
+    file_path = tmp_path / "activity.fit"
+    shutil.copy("tests/files/activity.fit", file_path)
+    return str(file_path)
+
+
+def fail_to_parse(*_: object, **__: object) -> None:
+    """Fail when a file is parsed."""
+    msg = "The file should not be parsed."
+    raise AssertionError(msg)
+
+
+def test_load_from_cache(
+    tmp_path: Path, activity_file: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Should read the samples and metrics from the cache on a hit."""
+    cache = ActivityCache(tmp_path / "cache")
+    activity = cache.load(activity_file, ftp=FTP)
+    assert "power_duration_curve" in vars(activity)
+
+    monkeypatch.setattr(Activity, "parse_activity_file", fail_to_parse)
+    monkeypatch.setattr(Activity, "calculate_power_duration_curve", fail_to_parse)
+    cached = cache.load(activity_file, ftp=FTP)
+
+    for metric in Activity.METRICS:
+        assert getattr(cached, metric) == getattr(activity, metric), metric
+    np.testing.assert_array_equal(cached.power, activity.power)
+
+
+def test_load_with_other_parameters(
+    tmp_path: Path, activity_file: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Should reuse the samples but calculate the metrics for new parameters."""
+    cache = ActivityCache(tmp_path / "cache")
+    cache.load(activity_file, ftp=FTP, which=["normalized_power"])
+
+    monkeypatch.setattr(Activity, "parse_activity_file", fail_to_parse)
+    activity = cache.load(activity_file, ftp=FTP + 10, which=["intensity_factor"])
+
+    assert activity.intensity_factor == activity.normalized_power / (FTP + 10)
+    assert len(list(cache.directory.glob("metrics-*.json"))) == 2  # noqa: PLR2004
+
+    monkeypatch.setattr(Activity, "calculate_normalized_power", fail_to_parse)
+    cached = cache.load(activity_file, ftp=FTP, which=["normalized_power"])
+    assert cached.normalized_power == activity.normalized_power
+
+
+def test_load_with_other_decoder(
+    tmp_path: Path, activity_file: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Should keep the samples of each decoder and library version apart."""
+    cache = ActivityCache(tmp_path / "cache")
+    cache.load(activity_file, which=[])
+    cache.load(activity_file, which=[], fast_decode=False)
+    assert len(list(cache.directory.glob("samples-*.npz"))) == 2  # noqa: PLR2004
+
+    monkeypatch.setattr(cache_module, "_VERSION", "0.0.0")
+    activity = cache.load(activity_file, which=[])
+
+    assert len(list(cache.directory.glob("samples-*.npz"))) == 3  # noqa: PLR2004
+    assert activity.duration == Activity(activity_file).duration
+
+
+def test_load_changed_file(tmp_path: Path, activity_file: str) -> None:
+    """Should miss when the file content changes."""
+    cache = ActivityCache(tmp_path / "cache")
+    cache.load(activity_file, which=[])
+
+    shutil.copy("tests/files/zwift_workout.fit", activity_file)
+
+    with pytest.raises(ValueError, match="No record messages found"):
+        cache.load(activity_file)
+
+
+def test_load_corrupt_entries(tmp_path: Path, activity_file: str) -> None:
+    """Should treat corrupt entries as misses."""
+    cache = ActivityCache(tmp_path / "cache")
+    activity = cache.load(activity_file, ftp=FTP, which=["max_power"])
+    for path in cache.directory.iterdir():
+        path.write_bytes(b"corrupt")
+
+    cached = cache.load(activity_file, ftp=FTP, which=["max_power"])
+
+    assert cached.max_power == activity.max_power
+
+
+def test_load_file_not_found(tmp_path: Path) -> None:
+    """Should raise a FileNotFoundError."""
+    cache = ActivityCache(tmp_path / "cache")
+
+    with pytest.raises(FileNotFoundError, match="File not found: file_not_found"):
+        cache.load("file_not_found.fit")
+
+
+def test_evict_least_recently_used(tmp_path: Path, activity_file: str) -> None:
+    """Should evict the least recently used entries when the cache is full."""
+    cache = ActivityCache(tmp_path / "cache")
+    cache.load(activity_file, which=[])
+    samples_size = cache.size()
+
+    cache.max_size = samples_size + 1
+    cache.load(activity_file, ftp=FTP, which=["max_power"])
+
+    # The metrics entry was written after the samples entry was last used:
+    assert cache.size() <= cache.max_size
+    assert [p.suffix for p in cache.directory.iterdir()] == [".json"]
+
+    # Other files in the cache directory are not entries:
+    (cache.directory / "stray.tmp").write_bytes(b"stray")
+    cache.clear()
+    assert [p.name for p in cache.directory.iterdir()] == ["stray.tmp"]
+
+    # Nothing is kept in a cache without space:
+    cache.max_size = 0
+    cache.load(activity_file, which=[])
+    assert cache.size() == 0
+
+
+def test_evict_lists_entries_when_full(
+    tmp_path: Path, activity_file: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Should keep a running total size, and only list the entries when full."""
+    cache = ActivityCache(tmp_path / "cache")
+    cache.load(activity_file, which=[])
+    samples_size = cache.size()
+    listings: list[int] = []
+    entries = ActivityCache._entries  # noqa: SLF001
+
+    def count_entries(self: ActivityCache) -> list[tuple[Path, int, float]]:
+        listings.append(1)
+        return entries(self)
+
+    monkeypatch.setattr(ActivityCache, "_entries", count_entries)
+    cache.max_size = 2 * samples_size
+    for ftp in range(FTP, FTP + 5):
+        cache.load(activity_file, ftp=ftp, which=["max_power"])
+    assert listings == []
+
+    cache.max_size = samples_size
+    cache.load(activity_file, ftp=FTP + 5, which=["max_power"])
+    assert listings == [1]
+    assert cache.size() <= cache.max_size
+
+    # A rewritten entry replaces the size of the old one:
+    cache.max_size = 2 * samples_size
+    cache.load(activity_file, ftp=FTP + 5, which=["max_power", "total_work"])
+    assert cache._size == cache.size()  # noqa: SLF001
+
+    # Entries removed by another process are uncounted from the next listing:
+    for path in cache.directory.iterdir():
+        path.unlink()
+    cache.load(activity_file, which=[])
+    assert cache.size() == samples_size
+
+
+def test_write_failure(tmp_path: Path) -> None:
+    """Should remove the temporary file when a write fails."""
+    cache = ActivityCache(tmp_path / "cache")
+
+    def fail(_: object) -> None:
+        msg = "Disk full"
+        raise OSError(msg)
+
+    with pytest.raises(OSError, match="Disk full"):
+        cache._write(cache.directory / "entry.json", fail)  # noqa: SLF001
+
+    assert list(cache.directory.iterdir()) == []
@@ -0,0 +1,386 @@
+"""Unit tests for the calculations module."""
+
+import numpy as np
+import pytest
+
+from power_metrics_lib.calculations import (
+    centered_average,
+    compact_runs,
+    cumulative_power,
+    detect_intervals,
+    exponential_moving_average,
+    max_mean_power_curve,
+    max_mean_power_curve_from_runs,
+    max_mean_powers,
+    max_mean_powers_from_runs,
+    max_table,
+    normalized_power,
+    normalized_power_from_runs,
+    power_histogram,
+    range_max,
+    resample,
+    rolling_average,
+    time_in_zones,
+    time_in_zones_batch,
+)
+
+
+def naive_max_mean_power(power: np.ndarray, duration: int) -> float:
+    """Calculate the max mean power for a duration the slow way."""
+    return max(power[i : i + duration].mean() for i in range(len(power) - duration + 1))
+
+
+def naive_normalized_power(power: np.ndarray, window_size: int) -> float:
+    """Calculate the unrounded normalized power the slow way."""
+    rolling = [
+        power[i : i + window_size].mean() for i in range(len(power) - window_size + 1)
+    ]
+    return float(np.mean(np.array(rolling) ** 4) ** 0.25)
+
+
+def naive_exponential_moving_average(
+    values: np.ndarray, alpha: float, initial: float
+) -> list[float]:
+    """Calculate the exponential moving average with the recurrence."""
+    average = []
+    for value in values:
+        initial += alpha * (value - initial)
+        average.append(initial)
+    return average
+
+
+def random_runs(seed: int, runs: int, max_length: int) -> tuple[np.ndarray, np.ndarray]:
+    """Generate random run-length encoded power data."""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 1000, runs), rng.integers(0, max_length, runs)
+
+
+def test_cumulative_power() -> None:
+    """Should return the cumulative sums starting with 0."""
+    cumulative = cumulative_power(np.array([100, 200, 300], dtype=np.uint16))
+
+    assert cumulative.tolist() == [0, 100, 300, 600]
+    assert cumulative.dtype == np.int64
+
+
+def test_rolling_average() -> None:
+    """Should return the average power of each full window."""
+    power = np.array([100, 200, 300, 200], dtype=np.uint16)
+
+    assert rolling_average(power, 2).tolist() == [150, 250, 250]
+    assert rolling_average(power, 4).tolist() == [200]
+    assert rolling_average(power, 5).size == 0
+
+
+def test_rolling_average_with_invalid_window_size() -> None:
+    """Should raise an error for a window size that is not positive."""
+    with pytest.raises(ValueError, match="Window size must be positive"):
+        rolling_average(np.array([100, 200]), 0)
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 7, 64, 100])
+def test_range_max(n: int) -> None:
+    """Should return the max power of every range, 0 for empty ones."""
+    rng = np.random.default_rng(n)
+    power = rng.integers(0, 1000, n).astype(np.uint16)
+    bounds = np.sort(rng.integers(0, n + 1, (2, 200)), axis=0)
+
+    maxima = range_max(max_table(power), bounds[0], bounds[1])
+
+    assert maxima.tolist() == [
+        int(power[start:end].max()) if end > start else 0 for start, end in bounds.T
+    ]
+
+
+@pytest.mark.parametrize("window_size", [1, 7, 30])
+def test_normalized_power(window_size: int) -> None:
+    """Should return the same normalized power as the naive calculation."""
+    power = np.random.default_rng(0).integers(0, 1000, 500)
+
+    assert normalized_power(power, window_size) == pytest.approx(
+        naive_normalized_power(power, window_size)
+    )
+    assert normalized_power(power[: window_size - 1], window_size) == 0
+
+
+def test_max_mean_powers() -> None:
+    """Should return the max mean power for the given durations."""
+    power = np.random.default_rng(0).integers(0, 1000, 100)
+    durations = [1, 5, 30, 100]
+
+    max_power = max_mean_powers(power, durations)
+
+    assert max_power.tolist() == pytest.approx(
+        [naive_max_mean_power(power, d) for d in durations]
+    )
+
+
+def test_max_mean_powers_with_invalid_duration() -> None:
+    """Should raise a ValueError when a duration is out of range."""
+    with pytest.raises(ValueError, match="Durations must be between 1 and 3"):
+        max_mean_powers(np.array([100, 200, 300]), [4])
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 64, 2**16])
+def test_max_mean_power_curve(block_size: int) -> None:
+    """Should return the same curve regardless of the block size."""
+    power = np.random.default_rng(1).integers(0, 1000, 64)
+
+    curve = max_mean_power_curve(power, block_size=block_size)
+
+    assert len(curve) == len(power)
+    assert curve.tolist() == pytest.approx(
+        [naive_max_mean_power(power, d) for d in range(1, len(power) + 1)]
+    )
+
+
+def test_max_mean_power_curve_with_max_duration() -> None:
+    """Should only calculate the curve up to the max duration."""
+    power = np.array([100, 200, 300, 200, 100])
+
+    assert max_mean_power_curve(power, max_duration=2).tolist() == [300, 250]
+    assert max_mean_power_curve(power, max_duration=0).tolist() == []
+
+
+def test_compact_runs() -> None:
+    """Should drop empty runs and merge consecutive runs with the same power."""
+    values, lengths = compact_runs(
+        np.array([100, 100, 200, 300, 200, 200]), np.array([1, 2, 3, 0, 4, 5])
+    )
+
+    assert values.tolist() == [100, 200]
+    assert lengths.tolist() == [3, 12]
+    assert compact_runs(np.array([100]), np.array([0]))[0].tolist() == []
+
+
+# Short runs are dense, and expanded:
+@pytest.mark.parametrize("max_length", [30, 1000])
+def test_max_mean_powers_from_runs(max_length: int) -> None:
+    """Should return the same max mean powers as the expanded power data."""
+    values, lengths = random_runs(2, 20, max_length)
+    power = np.repeat(values, lengths)
+    durations = [1, 5, 30, 100, len(power)]
+
+    max_power = max_mean_powers_from_runs(values, lengths, durations)
+
+    assert max_power.tolist() == pytest.approx(max_mean_powers(power, durations))
+
+
+def test_max_mean_powers_from_runs_with_invalid_duration() -> None:
+    """Should raise a ValueError when a duration is out of range."""
+    with pytest.raises(ValueError, match="Durations must be between 1 and 3"):
+        max_mean_powers_from_runs(np.array([100, 200]), np.array([1, 2]), [0])
+
+
+@pytest.mark.parametrize(
+    ("runs", "max_length", "block_size"),
+    [(5, 200, 1), (5, 200, 2**16), (10, 100, 64), (50, 3, 2**16)],
+)
+def test_max_mean_power_curve_from_runs(
+    runs: int, max_length: int, block_size: int
+) -> None:
+    """Should return the same curve as the expanded power data."""
+    values, lengths = random_runs(runs, runs, max_length)
+    power = np.repeat(values, lengths)
+
+    curve = max_mean_power_curve_from_runs(values, lengths, block_size=block_size)
+
+    assert curve.tolist() == pytest.approx(max_mean_power_curve(power).tolist())
+
+
+def test_max_mean_power_curve_from_runs_with_max_duration() -> None:
+    """Should only calculate the curve up to the max duration."""
+    values, lengths = np.array([100, 300]), np.array([100, 1])
+
+    curve = max_mean_power_curve_from_runs(values, lengths, max_duration=2)
+
+    assert curve.tolist() == [300, 200]
+    assert max_mean_power_curve_from_runs(values, lengths, max_duration=0).size == 0
+
+
+@pytest.mark.parametrize("max_length", [25, 1000])
+@pytest.mark.parametrize("window_size", [1, 7, 30, 250])
+def test_normalized_power_from_runs(window_size: int, max_length: int) -> None:
+    """Should return the same normalized power as the expanded power data."""
+    values, lengths = random_runs(3, 20, max_length)
+    power = np.repeat(values, lengths)
+
+    normalized_power = normalized_power_from_runs(values, lengths, window_size)
+
+    assert normalized_power == pytest.approx(naive_normalized_power(power, window_size))
+
+
+@pytest.mark.parametrize("alpha", [1 / 42, 1 / 7, 0.999, 1.0])
+@pytest.mark.parametrize("block_size", [1, 10, 128])
+def test_exponential_moving_average(alpha: float, block_size: int) -> None:
+    """Should return the same average as the recurrence."""
+    values = np.random.default_rng(4).integers(0, 300, 1000).astype(np.float64)
+
+    average = exponential_moving_average(values, alpha, 50.0, block_size)
+
+    assert average.tolist() == pytest.approx(
+        naive_exponential_moving_average(values, alpha, 50.0)
+    )
+
+
+def test_exponential_moving_average_per_row() -> None:
+    """Should calculate the average along the last axis of each row."""
+    values = np.random.default_rng(5).integers(0, 300, (3, 200))
+
+    initials = np.array([0.0, 10.0, 20.0])
+
+    average = exponential_moving_average(values, 0.1, initials)
+
+    for row, initial, expected in zip(values, initials, average, strict=True):
+        assert expected.tolist() == pytest.approx(
+            naive_exponential_moving_average(row, 0.1, initial)
+        )
+
+
+def test_exponential_moving_average_with_invalid_alpha() -> None:
+    """Should raise a ValueError when alpha is out of range."""
+    with pytest.raises(ValueError, match="Alpha must be between"):
+        exponential_moving_average(np.zeros(3), 0)
+
+
+def test_resample() -> None:
+    """Should fill the gaps and keep the last sample of each second."""
+    timestamps = np.array([1, 2, 2, 5, 6], dtype=np.uint32)
+    power = np.array([10, 20, 30, 40, 50], dtype=np.uint16)
+
+    resampled_timestamps, resampled_power = resample(timestamps, power)
+
+    assert resampled_timestamps.tolist() == [1, 2, 3, 4, 5, 6]
+    assert resampled_power.tolist() == [10, 30, 0, 0, 40, 50]
+    assert resampled_timestamps.dtype == timestamps.dtype
+    assert resampled_power.dtype == power.dtype
+
+
+def test_resample_hold_and_drop_pauses() -> None:
+    """Should hold the power over short gaps and drop the long ones."""
+    timestamps, power = resample([1, 3, 100, 103], [10, 20, 30, 40], "hold", 5)
+
+    assert timestamps.tolist() == [1, 2, 3, 100, 101, 102, 103]
+    assert power.tolist() == [10, 10, 20, 30, 30, 30, 40]
+
+
+def test_resample_without_samples() -> None:
+    """Should return empty arrays when there are no samples."""
+    timestamps, power = resample(np.zeros(0), np.zeros(0))
+
+    assert len(timestamps) == len(power) == 0
+
+
+@pytest.mark.parametrize(
+    ("timestamps", "power", "fill", "message"),
+    [
+        ([1, 2], [10, 20], "linear", "Unknown fill: linear"),
+        ([1, 2], [10], "zero", "must have the same length"),
+        ([2, 1], [10, 20], "zero", "must be non-decreasing"),
+    ],
+)
+def test_resample_with_invalid_data(
+    timestamps: list[int], power: list[int], fill: str, message: str
+) -> None:
+    """Should raise a ValueError for invalid data or fill."""
+    with pytest.raises(ValueError, match=message):
+        resample(np.array(timestamps), np.array(power), fill)
+
+
+def test_time_in_zones() -> None:
+    """Should count the samples from each edge up to the next."""
+    power = np.array([0, 109, 110, 150, 151, 400])
+
+    assert time_in_zones(power, [110, 150.5]).tolist() == [2, 2, 2]
+    assert time_in_zones(np.zeros(0), [110]).tolist() == [0, 0]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 100, 2**20])
+@pytest.mark.parametrize("length", [3, 3000])
+def test_time_in_zones_batch(chunk_size: int, length: int) -> None:
+    """Should bin many activities like binning each activity on its own."""
+    rng = np.random.default_rng(0)
+    powers = [
+        rng.integers(0, 600, int(rng.integers(0, length))).astype(np.uint16)
+        for _ in range(50)
+    ]
+    edges = rng.integers(150, 350, 50)[:, None] * np.array([55, 75, 90, 105.5]) / 100
+    expected = [
+        time_in_zones(p, e).tolist() for p, e in zip(powers, edges, strict=True)
+    ]
+
+    assert time_in_zones_batch(powers, edges, chunk_size).tolist() == expected
+    floats = [p.astype(np.float64) for p in powers]
+    assert time_in_zones_batch(floats, edges, chunk_size).tolist() == expected
+
+    shared = time_in_zones_batch(powers, edges[0], chunk_size)
+    assert shared.tolist() == [time_in_zones(p, edges[0]).tolist() for p in powers]
+
+
+def test_time_in_zones_batch_edge_cases() -> None:
+    """Should return no rows without activities, and check the rows of edges."""
+    assert time_in_zones_batch([], [100, 200]).shape == (0, 3)
+
+    with pytest.raises(ValueError, match="There must be a row of edges"):
+        time_in_zones_batch([[100], [200]], [[150]])
+
+
+def test_power_histogram() -> None:
+    """Should count the samples in each bin up to the max power."""
+    assert power_histogram(np.array([0, 9, 10, 35])).tolist() == [2, 1, 0, 1]
+    assert power_histogram(np.array([0.5, 24.9, 25.0]), 25).tolist() == [2, 1]
+
+    with pytest.raises(ValueError, match="Bin width must be positive"):
+        power_histogram(np.array([100]), 0)
+
+
+def test_centered_average() -> None:
+    """Should average the window centered on each second, clipped at the ends."""
+    power = np.array([100, 200, 300, 400, 500])
+
+    assert centered_average(power, 1).tolist() == power.tolist()
+    assert centered_average(power, 3).tolist() == [200, 200, 300, 400, 400]
+    assert centered_average(power, 4).tolist() == [250, 250, 250, 350, 350]
+    assert centered_average(power[:2], 5).tolist() == [150, 150]
+
+
+def test_centered_average_with_invalid_window_size() -> None:
+    """Should raise an error for a window size that is not positive."""
+    with pytest.raises(ValueError, match="Window size must be positive"):
+        centered_average(np.array([100, 200]), 0)
+
+
+def test_detect_intervals() -> None:
+    """Should detect the intervals with hysteresis, merging and a min duration."""
+    power = np.array([100, 300, 300, 200, 300, 100, 100, 100, 300, 300, 100])
+
+    # The power between the thresholds at second 3 does not end the interval:
+    starts, ends = detect_intervals(power, on=250, off=150)
+    assert starts.tolist() == [1, 8]
+    assert ends.tolist() == [5, 10]
+
+    starts, ends = detect_intervals(power, on=250, off=150, max_gap=3)
+    assert starts.tolist() == [1]
+    assert ends.tolist() == [10]
+
+    starts, ends = detect_intervals(power, on=250, off=150, min_duration=3)
+    assert starts.tolist() == [1]
+    assert ends.tolist() == [5]
+
+    # Smoothing averages out the short efforts, leaving the longest one:
+    starts, ends = detect_intervals(power, on=250, off=250, smoothing=3)
+    assert starts.tolist() == [2]
+    assert ends.tolist() == [4]
+
+
+def test_detect_intervals_without_intervals() -> None:
+    """Should return no intervals when the power never reaches the threshold."""
+    for power in (np.array([100, 200, 100]), np.array([], dtype=int)):
+        starts, ends = detect_intervals(power, on=250, off=150)
+        assert starts.size == ends.size == 0
+
+
+def test_detect_intervals_with_invalid_thresholds() -> None:
+    """Should raise an error if the off threshold is above the on threshold."""
+    with pytest.raises(ValueError, match="off threshold must not be above"):
+        detect_intervals(np.array([100, 200]), on=150, off=200)
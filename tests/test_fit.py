@@ -0,0 +1,143 @@
+"""Unit tests for the fit module."""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from power_metrics_lib.fit import read_records
+from power_metrics_lib.models import Activity
+
+
+def fit_file(*messages: bytes) -> bytes:
+    """Wrap the messages in a .fit file header and (dummy) crc."""
+    data = b"".join(messages)
+    header = bytes([12, 0x20]) + (2222).to_bytes(2, "little")
+    header += len(data).to_bytes(4, "little") + b".FIT"
+    return header + data + b"\x00\x00"
+
+
+def test_read_records() -> None:
+    """Should read the same records as the Garmin FIT SDK."""
+    activity = Activity(file_path="tests/files/activity.fit")
+
+    records = read_records("tests/files/activity.fit", ["timestamp", "power"])
+
+    assert records["timestamp"].dtype == np.uint32
+    assert records["power"].dtype == np.uint16
+    assert records["timestamp"].tolist() == activity.timestamps
+    assert records["power"].tolist() == activity.power
+
+
+def test_create_activity_with_fast_decode() -> None:
+    """Should create an array backed activity with the same metrics."""
+    ftp = 236
+    activity = Activity(file_path="tests/files/activity.fit", ftp=ftp)
+
+    fast = Activity(file_path="tests/files/activity.fit", ftp=ftp, fast_decode=True)
+
+    assert isinstance(fast.power, np.ndarray)
+    assert fast.normalized_power == activity.normalized_power
+    assert fast.power_profile == activity.power_profile
+
+
+def test_read_records_with_compressed_timestamps(tmp_path: Path) -> None:
+    """Should handle big endian, developer data and compressed timestamps."""
+    file_path = tmp_path / "compressed.fit"
+    file_path.write_bytes(
+        fit_file(
+            # Big endian definition of a record with timestamp, power,
+            # an unknown field and one developer field:
+            bytes([0x60, 0, 1, 0, 20, 3, 253, 4, 0x86, 7, 2, 0x84, 99, 1, 0x02]),
+            bytes([1, 0, 1, 0]),
+            # Definition of a record with only power:
+            bytes([0x41, 0, 0, 20, 0, 1, 7, 2, 0x84]),
+            # Definition of a non-record message with a timestamp:
+            bytes([0x42, 0, 0, 21, 0, 1, 253, 4, 0x86]),
+            # Record message with timestamp 1000 (0x03E8) and power 200:
+            bytes([0x00, 0, 0, 0x03, 0xE8, 0, 200, 7, 9]),
+            # Compressed timestamp records with offsets 9 and 2 (rollover):
+            bytes([0x80 | (1 << 5) | 9, 210, 0]),
+            bytes([0x80 | (1 << 5) | 2, 0xFF, 0xFF]),
+            # Non-record message with timestamp 2000, then a record without:
+            bytes([0x02]) + (2000).to_bytes(4, "little"),
+            bytes([0x01, 220, 0]),
+        )
+    )
+
+    records = read_records(str(file_path), ["timestamp", "power", "heart_rate"])
+
+    assert records["timestamp"].tolist() == [1000, 1001, 1026, 0]
+    # Invalid and missing values are patched with 0:
+    assert records["power"].tolist() == [200, 210, 0, 220]
+    assert records["heart_rate"].tolist() == [0, 0, 0, 0]
+
+
+def test_read_records_with_unknown_field() -> None:
+    """Should raise a ValueError for unknown fields."""
+    with pytest.raises(ValueError, match="Unknown record fields: foo"):
+        read_records("tests/files/activity.fit", ["foo"])
+
+
+def test_read_records_file_not_found() -> None:
+    """Should raise a FileNotFoundError."""
+    with pytest.raises(FileNotFoundError, match="File not found: file_not_found"):
+        read_records("file_not_found.fit")
+
+
+def test_read_records_no_record_messages() -> None:
+    """Should raise a ValueError when there are no record messages."""
+    with pytest.raises(ValueError, match="No record messages found"):
+        read_records("tests/files/zwift_workout.fit")
+
+
+def test_read_records_not_a_fit_file() -> None:
+    """Should raise a ValueError when the file is not a .fit file."""
+    with pytest.raises(ValueError, match=r"Not a \.fit file"):
+        read_records("tests/files/zwift_workout.zwo")
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        fit_file(bytes([0x00, 1, 2, 3]))[:-4],
+        # A definition cut off in its header, and in its fields:
+        fit_file(bytes([0x40, 0])),
+        fit_file(bytes([0x40, 0, 0, 20, 0, 3, 7, 2, 0x84])),
+        # A record message cut off in its content:
+        fit_file(bytes([0x40, 0, 0, 20, 0, 1, 7, 2, 0x84]), bytes([0x00, 200])),
+    ],
+)
+def test_read_records_truncated_file(tmp_path: Path, data: bytes) -> None:
+    """Should raise a ValueError when the file is truncated."""
+    file_path = tmp_path / "truncated.fit"
+    file_path.write_bytes(data)
+
+    with pytest.raises(ValueError, match=r"Truncated \.fit file"):
+        read_records(str(file_path))
+
+
+def test_read_records_invalid_local_message(tmp_path: Path) -> None:
+    """Should raise a ValueError for messages without a definition."""
+    file_path = tmp_path / "invalid.fit"
+    file_path.write_bytes(fit_file(bytes([0x03, 1, 2, 3])))
+
+    with pytest.raises(ValueError, match="Invalid local message number"):
+        read_records(str(file_path))
+
+
+def test_read_records_with_unsupported_field_types(tmp_path: Path) -> None:
+    """Should patch fields with unsupported base types or sizes with 0."""
+    file_path = tmp_path / "unsupported.fit"
+    file_path.write_bytes(
+        fit_file(
+            # Record with a float32 power and a two byte uint8 heart rate:
+            bytes([0x40, 0, 0, 20, 0, 2, 7, 4, 0x88, 3, 2, 0x02]),
+            bytes([0x00, 0, 0, 0x48, 0x43, 100, 101]),
+        )
+    )
+
+    records = read_records(str(file_path), ["power", "heart_rate"])
+
+    assert records["power"].tolist() == [0]
+    assert records["heart_rate"].tolist() == [0]
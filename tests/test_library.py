@@ -0,0 +1,178 @@
+"""Integration tests for the library module."""
+
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from power_metrics_lib.library import METRICS, WorkoutLibrary
+from power_metrics_lib.models.workout import Workout
+
+FTP = 200
+
+
+@pytest.fixture
+def directory(tmp_path: Path) -> Path:
+    """Copy the test workouts to a temporary directory."""
+    shutil.copy("tests/files/zwift_workout.zwo", tmp_path)
+    (tmp_path / "mosaic").mkdir()
+    shutil.copy("tests/files/mosaic.zwo", tmp_path / "mosaic")
+    return tmp_path
+
+
+def fail_to_parse(*_: object, **__: object) -> None:
+    """Fail when a file is parsed."""
+    msg = "The file should not be parsed."
+    raise AssertionError(msg)
+
+
+def test_refresh(directory: Path) -> None:
+    """Should index the metrics of each workout at the reference FTP."""
+    library = WorkoutLibrary(directory, reference_ftp=FTP)
+
+    assert library.refresh() == ["mosaic/mosaic.zwo", "zwift_workout.zwo"]
+
+    assert len(library) == 2  # noqa: PLR2004
+    rows = library.query()
+    workout = Workout("tests/files/zwift_workout.zwo", ftp=FTP)
+    for name in METRICS:
+        assert rows[name][1] == getattr(workout, name)
+    assert rows["duration"].dtype == np.int64
+    assert (directory / WorkoutLibrary.INDEX_FILE).exists()
+
+
+def test_refresh_only_changed_files(
+    directory: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Should only reparse the files whose content changed."""
+    WorkoutLibrary(directory).refresh()
+
+    # Touching a file does not change its content:
+    workout_file = directory / "zwift_workout.zwo"
+    os.utime(workout_file, ns=(0, 0))
+    with monkeypatch.context() as m:
+        m.setattr(WorkoutLibrary, "_parse", fail_to_parse)
+        library = WorkoutLibrary(directory)
+        assert library.refresh() == []
+    assert library.query()["mtime_ns"].tolist()[1] == 0
+
+    # A changed file is reparsed, and a removed one dropped:
+    workout_file.write_text(
+        workout_file.read_text().replace('Duration="600"', 'Duration="900"', 1)
+    )
+    (directory / "mosaic" / "mosaic.zwo").unlink()
+    library = WorkoutLibrary(directory)
+    assert library.refresh() == ["zwift_workout.zwo"]
+    assert library.query()["path"].tolist() == ["zwift_workout.zwo"]
+    assert library.query()["duration"].tolist() == [3360 + 300]
+
+
+def test_refresh_with_errors(directory: Path) -> None:
+    """Should report the files that failed to parse and leave them out."""
+    shutil.copy("tests/files/zwift_workout_unknown_block_type.zwo", directory)
+    library = WorkoutLibrary(directory)
+
+    library.refresh()
+
+    assert len(library) == 2  # noqa: PLR2004
+    assert library.errors == {
+        "zwift_workout_unknown_block_type.zwo": (
+            "ValueError: Unknown block type: UnknownBlockType"
+        )
+    }
+
+
+def test_persisted_index(directory: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Should answer queries and create workouts from the persisted index."""
+    index_path = directory / "index.npz"
+    WorkoutLibrary(directory, index_path=index_path).refresh()
+    blocks = Workout("tests/files/zwift_workout.zwo").blocks
+    expected = Workout(blocks=blocks, ftp=FTP)
+    monkeypatch.setattr(WorkoutLibrary, "_parse", fail_to_parse)
+    monkeypatch.setattr(Workout, "parse_workout_file", fail_to_parse)
+
+    library = WorkoutLibrary(directory, index_path=index_path)
+
+    assert library.query()["path"].tolist() == [
+        "mosaic/mosaic.zwo",
+        "zwift_workout.zwo",
+    ]
+    workout = library.workout("zwift_workout.zwo", ftp=FTP)
+    assert workout.blocks == blocks
+    assert workout.normalized_power == expected.normalized_power
+
+
+def test_incompatible_index(directory: Path) -> None:
+    """Should discard an index with another reference FTP, or a corrupt one."""
+    WorkoutLibrary(directory).refresh()
+
+    assert len(WorkoutLibrary(directory, reference_ftp=FTP)) == 0
+
+    (directory / WorkoutLibrary.INDEX_FILE).write_bytes(b"corrupt")
+    assert len(WorkoutLibrary(directory)) == 0
+
+
+def test_query(directory: Path) -> None:
+    """Should filter the rows by ranges and sort them."""
+    library = WorkoutLibrary(directory)
+    library.refresh()
+    all_rows = library.query(sort_by="training_stress_score", descending=True)
+
+    tss = all_rows["training_stress_score"]
+    assert tss.tolist() == sorted(tss.tolist(), reverse=True)
+    assert library.query(sort_by="duration", limit=1)["duration"].tolist() == [
+        min(all_rows["duration"])
+    ]
+
+    rows = library.query(duration=(45 * 60, 60 * 60), intensity_factor=(None, 0.8))
+    assert rows["path"].tolist() == ["zwift_workout.zwo"]
+    assert rows["intensity_factor"][0] == pytest.approx(0.75, abs=0.01)
+    assert library.query(intensity_factor=(0.8, None))["path"].tolist() == [
+        "mosaic/mosaic.zwo"
+    ]
+
+
+def test_query_unknown_column(directory: Path) -> None:
+    """Should raise an error for a column that is not in the index."""
+    library = WorkoutLibrary(directory)
+
+    with pytest.raises(ValueError, match="Unknown columns: foo, bar"):
+        library.query(sort_by="bar", foo=(0, 1))
+
+
+def test_workout_not_in_library(directory: Path) -> None:
+    """Should raise an error for a path that is not in the index."""
+    library = WorkoutLibrary(directory)
+
+    with pytest.raises(KeyError, match="Workout not in the library"):
+        library.workout("zwift_workout.zwo")
+
+
+def test_empty_library(tmp_path: Path) -> None:
+    """Should persist and load an index without workouts."""
+    WorkoutLibrary(tmp_path).refresh()
+
+    library = WorkoutLibrary(tmp_path)
+
+    assert len(library) == 0
+    assert library._blocks == []  # noqa: SLF001
+
+
+def test_save_index_failure(directory: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Should remove the temporary file when the index fails to save."""
+
+    def fail(*_: object, **__: object) -> None:
+        msg = "Disk full"
+        raise OSError(msg)
+
+    monkeypatch.setattr(np, "savez", fail)
+
+    with pytest.raises(OSError, match="Disk full"):
+        WorkoutLibrary(directory).refresh()
+
+    assert sorted(p.name for p in directory.iterdir()) == [
+        "mosaic",
+        "zwift_workout.zwo",
+    ]
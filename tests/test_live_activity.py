@@ -0,0 +1,98 @@
+"""Integration tests for the LiveActivity class."""
+
+import pytest
+
+from power_metrics_lib import Activity, LiveActivity
+from power_metrics_lib.models import ActivityValidationError
+
+
+def test_live_activity_matches_activity() -> None:
+    """Should produce the same metrics as an activity with the same samples."""
+    ftp = 236
+    activity = Activity(file_path="tests/files/activity.fit", ftp=ftp)
+
+    live = LiveActivity(ftp=ftp)
+    live.extend(activity.power[:100], activity.timestamps[:100])
+    # Read the metrics half way, as a live display would:
+    assert live.duration == 100  # noqa: PLR2004
+    assert (
+        live.power_profile
+        == Activity(
+            timestamps=activity.timestamps[:100], power=activity.power[:100], ftp=ftp
+        ).power_profile
+    )
+    live.extend(activity.power[100:], activity.timestamps[100:])
+
+    assert live.timestamps == activity.timestamps
+    for metric in Activity.METRICS:
+        assert getattr(live, metric) == getattr(activity, metric), metric
+
+
+def test_live_activity_append() -> None:
+    """Should update the metrics on every sample."""
+    expected_total_work = 450
+
+    live = LiveActivity(ftp=200, window_size=2)
+    assert live.duration == 0
+    assert live.average_power == 0
+    assert live.normalized_power == 0
+
+    live.append(100)
+    live.append(150)
+    live.append(200, timestamp=10)
+
+    assert live.timestamps == [1, 2, 10]
+    assert live.total_work == expected_total_work
+    assert live.max_power == 200  # noqa: PLR2004
+    assert live.average_power == 150  # noqa: PLR2004
+    assert (
+        live.normalized_power
+        == Activity(power=[100, 150, 200], window_size=2).normalized_power
+    )
+    assert live.intensity_factor == live.normalized_power / 200
+
+
+def test_live_activity_with_changed_window_size() -> None:
+    """Should fall back to calculating the normalized power from the samples."""
+    live = LiveActivity(window_size=2)
+    live.extend([100, 150, 200, 250])
+
+    live.window_size = 3
+
+    assert (
+        live.normalized_power
+        == Activity(power=[100, 150, 200, 250], window_size=3).normalized_power
+    )
+
+
+def test_live_activity_with_invalid_samples() -> None:
+    """Should raise a ValueError for negative power or non-positive timestamps."""
+    live = LiveActivity(power_limit=LiveActivity.MAX_POWER)
+
+    with pytest.raises(ValueError, match="Timestamps must be positive"):
+        live.append(100, timestamp=0)
+    with pytest.raises(ValueError, match="Power data greater than or equal to zero"):
+        live.append(-1)
+    with pytest.raises(ValueError, match="Power data must be at most 3000 W"):
+        live.append(5000)
+    assert live.power == []
+
+    live.append(100, timestamp=10)
+    with pytest.raises(ValueError, match="Timestamps must be non-decreasing"):
+        live.append(100, timestamp=9)
+    # Nothing is appended from a batch with an invalid sample:
+    with pytest.raises(ActivityValidationError) as info:
+        live.extend([100, 200, 4000], [11, 12, 13])
+    assert info.value.errors == [
+        "Power data must be at most 3000 W. 1 invalid samples, the first at 2."
+    ]
+    assert live.timestamps == [10]
+
+
+def test_live_activity_without_power_limit() -> None:
+    """Should accept power spikes without a power limit."""
+    live = LiveActivity()
+
+    live.extend([100, 5000])
+
+    assert live.max_power == 5000  # noqa: PLR2004
@@ -0,0 +1,200 @@
+"""Integration tests for the profiling module."""
+
+import math
+import pickle
+import threading
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from power_metrics_lib import Activity, LiveActivity, Workout
+from power_metrics_lib.profiling import Profiler
+
+FTP = 236
+ACTIVITY_FILE = "tests/files/activity.fit"
+WORKOUT_FILE = "tests/files/zwift_workout.zwo"
+ACTIVITY_SAMPLES = 7023
+WORKOUT_SAMPLES = 3360
+
+
+def test_profile_activity() -> None:
+    """Should record the parsing and metric stages of an installed profiler."""
+    with Profiler() as profiler:
+        activity = Activity(ACTIVITY_FILE, ftp=FTP)
+        activity.compute(["training_stress_score", "power_profile"])
+
+    [parse] = profiler.get("parse_activity_file")
+    assert parse.samples == ACTIVITY_SAMPLES
+    assert parse.parent is None
+    assert parse.memory is None
+    [decode] = profiler.get("decode_fit")
+    [build] = profiler.get("build_lists")
+    assert decode.parent == build.parent == "parse_activity_file"
+    assert build.samples == ACTIVITY_SAMPLES
+    assert parse.wall_time >= decode.wall_time + build.wall_time
+
+    # Metrics calculated on first access are nested in the stage accessing them:
+    [normalized_power] = profiler.get("calculate_normalized_power")
+    assert normalized_power.parent == "calculate_training_stress_score"
+    assert profiler.get("calculate_power_profile")
+
+    # The profiler is uninstalled on exit:
+    Activity(ACTIVITY_FILE, ftp=FTP, fast_decode=True)
+    assert not profiler.get("read_records")
+
+
+def test_profile_single_activity() -> None:
+    """Should only record the stages of the activity the profiler is passed to."""
+    profiler = Profiler()
+    activity = Activity(ACTIVITY_FILE, ftp=FTP, fast_decode=True, profiler=profiler)
+    Activity(ACTIVITY_FILE, ftp=FTP, fast_decode=True).compute()
+    assert [record.stage for record in profiler.records] == [
+        "read_records",
+        "parse_activity_file",
+    ]
+
+    activity.calculate_max_power_for_duration(60)
+    [record] = profiler.get("calculate_max_power_for_duration")
+    assert record.samples == ACTIVITY_SAMPLES
+
+
+def test_profile_failed_stage() -> None:
+    """Should record a stage that raises an error."""
+    profiler = Profiler()
+    with pytest.raises(FileNotFoundError):
+        Activity("file_not_found.fit", profiler=profiler)
+
+    [record] = profiler.get("parse_activity_file")
+    assert record.samples == 0
+
+
+def test_profile_workout() -> None:
+    """Should count the samples of a workout without expanding the blocks."""
+    with Profiler() as profiler:
+        workout = Workout(WORKOUT_FILE, ftp=200)
+        workout.compute()
+
+    assert "power" not in vars(workout)
+    assert profiler.get("parse_workout_file")
+    [duration] = profiler.get("calculate_duration")
+    assert duration.samples == WORKOUT_SAMPLES
+
+
+def test_profile_overridden_stage() -> None:
+    """Should record a stage calling the same stage of its base class once."""
+    profiler = Profiler()
+    workout = Workout(WORKOUT_FILE, profiler=profiler)
+    workout.create_activity_from_workout(200)
+    assert workout.normalized_power
+
+    [record] = profiler.get("calculate_normalized_power")
+    assert record.parent is None
+    assert record.samples == WORKOUT_SAMPLES
+
+
+def test_profile_live_activity() -> None:
+    """Should record the stages of a live activity."""
+    with Profiler() as profiler:
+        activity = LiveActivity(ftp=200)
+        activity.extend([100, 200, 300])
+        activity.compute(["average_power"])
+
+    [record] = profiler.get("calculate_average_power")
+    assert record.samples == len(activity.power)
+
+
+def test_profile_threads() -> None:
+    """Should keep the stages in progress of each thread apart."""
+    profiler = Profiler()
+    barrier = threading.Barrier(2)
+
+    def run(name: str) -> None:
+        activity = Activity(power=[100, 200])
+        # Both threads are in their outer stage when they start the inner one:
+        with profiler.stage(activity, f"{name}_outer"):
+            barrier.wait()
+            with profiler.stage(activity, f"{name}_inner"):
+                barrier.wait()
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in "ab"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert {record.stage: record.parent for record in profiler.records} == {
+        "a_inner": "a_outer",
+        "a_outer": None,
+        "b_inner": "b_outer",
+        "b_outer": None,
+    }
+    # The stages in progress are not pickled:
+    assert pickle.loads(pickle.dumps(profiler)) == profiler  # noqa: S301
+
+
+def test_trace_memory() -> None:
+    """Should record the peak memory of the stages, including nested stages."""
+    with Profiler(trace_memory=True) as profiler:
+        assert tracemalloc.is_tracing()
+        activity = Activity(ACTIVITY_FILE, ftp=FTP, fast_decode=True)
+        activity.compute(["training_stress_score", "power_duration_curve"])
+    assert not tracemalloc.is_tracing()
+
+    [parse] = profiler.get("parse_activity_file")
+    [read] = profiler.get("read_records")
+    assert parse.memory is not None
+    assert read.memory is not None
+    assert parse.memory >= read.memory > ACTIVITY_SAMPLES * 2
+
+    [score] = profiler.get("calculate_training_stress_score")
+    [normalized_power] = profiler.get("calculate_normalized_power")
+    assert score.memory is not None
+    assert normalized_power.memory is not None
+    assert score.memory >= normalized_power.memory > 0
+
+
+def test_trace_memory_already_tracing() -> None:
+    """Should leave tracing on if it was started before the profiler."""
+    tracemalloc.start()
+    try:
+        with Profiler(trace_memory=True) as profiler:
+            Activity(ACTIVITY_FILE, ftp=FTP, fast_decode=True)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+    assert all(record.memory is not None for record in profiler.records)
+
+
+def test_summary() -> None:
+    """Should aggregate the records per stage."""
+    profiler = Profiler()
+    for _ in range(2):
+        Activity(ACTIVITY_FILE, ftp=FTP, fast_decode=True, profiler=profiler)
+    with Profiler(trace_memory=True) as traced:
+        Activity(ACTIVITY_FILE, ftp=FTP, fast_decode=True)
+    profiler.merge([traced])
+
+    summary = profiler.summary()
+    assert summary["stage"].tolist() == ["read_records", "parse_activity_file"]
+    assert summary["calls"].tolist() == [3, 3]
+    assert summary["samples"].tolist() == [3 * ACTIVITY_SAMPLES, 3 * ACTIVITY_SAMPLES]
+    records = profiler.get("parse_activity_file")
+    assert math.isclose(
+        summary["total_time"][1], sum(record.wall_time for record in records)
+    )
+    assert summary["mean_time"][1] == summary["total_time"][1] / 3
+    assert summary["max_time"][1] == max(record.wall_time for record in records)
+    assert summary["memory"][1] == records[-1].memory
+
+    profiler.clear()
+    summary = profiler.summary()
+    assert all(len(column) == 0 for column in summary.values())
+
+
+def test_summary_without_memory() -> None:
+    """Should report NaN memory for stages that were not traced."""
+    profiler = Profiler()
+    Activity(ACTIVITY_FILE, ftp=FTP, fast_decode=True, profiler=profiler)
+    assert np.isnan(profiler.summary()["memory"]).all()
@@ -1,8 +1,14 @@
 """Integration test module for the Workout class."""
 
+from pathlib import Path
+
+import numpy as np
 import pytest
+from defusedxml import EntitiesForbidden
+from defusedxml.ElementTree import parse
 
 from power_metrics_lib.models.workout import (
+    BLOCK_DTYPE,
     Block,
     Cooldown,
     FreeRide,
@@ -12,6 +18,9 @@ from power_metrics_lib.models.workout import (
     UnsupportedFileTypeError,
     Warmup,
     Workout,
+    blocks_from_array,
+    blocks_to_array,
+    iter_workout_blocks,
 )
 
 EXPECTED_NO_OF_BLOCKS = 10
@@ -123,6 +132,94 @@ def test_create_workout() -> None:
     assert is_decremental(workout.power[1200:-1])
 
 
+def test_create_workout_with_edge_case_blocks() -> None:
+    """Should clip negative ramp power to 0 and skip empty blocks."""
+    ramp = Ramp(duration=4, start_power=-0.5, end_power=1.5)
+    empty_interval = Interval(
+        repeat=0, on_duration=30, on_power=1.0, off_duration=30, off_power=0.5
+    )
+    steady_state = SteadyState(duration=2, power=0.25)
+
+    workout = Workout(blocks=[ramp, empty_interval, steady_state], ftp=100)
+
+    assert workout.timestamps == [1, 2, 3, 4, 5, 6]
+    assert workout.power == [0, 0, 50, 100, 25, 25]
+    assert workout.total_work == sum(workout.power)
+
+
+@pytest.mark.parametrize(
+    "test_file", ["tests/files/zwift_workout.zwo", "tests/files/mosaic.zwo"]
+)
+def test_workout_metrics_without_expanding(test_file: str) -> None:
+    """Should calculate the same metrics from the blocks as from the samples."""
+    workout = Workout(file_path=test_file, ftp=FTP)
+    expanded = Workout(file_path=test_file)
+    expanded.ftp = FTP
+    expanded.create_activity_from_workout(FTP)
+
+    for metric in Workout.METRICS:
+        assert getattr(workout, metric) == getattr(expanded, metric), metric
+    # The samples are not expanded until accessed:
+    assert "power" not in vars(workout)
+    assert workout.power == expanded.power
+    assert workout.timestamps == expanded.timestamps
+
+
+def test_workout_samples_are_expanded_when_set() -> None:
+    """Should expand the samples before one of them is replaced."""
+    workout = Workout(blocks=[SteadyState(duration=3, power=1.0)], ftp=FTP)
+
+    workout.power = [100, 100, 100]
+
+    assert workout.timestamps == [1, 2, 3]
+    assert workout.average_power == 100  # noqa: PLR2004
+    with pytest.raises(AttributeError, match="has no attribute 'foo'"):
+        _ = workout.foo
+
+
+def test_workout_metrics_without_samples() -> None:
+    """Should calculate empty metrics for a workout without samples."""
+    short = Workout(blocks=[SteadyState(duration=10, power=1.0)], ftp=FTP)
+    free_ride = Workout(blocks=[FreeRide(duration=300)], ftp=FTP)
+
+    assert short.normalized_power == 0
+    assert short.power_profile == {5: FTP}
+    for metric in ("duration", "average_power", "max_power", "normalized_power"):
+        assert getattr(free_ride, metric) == 0
+    assert free_ride.power_profile == {}
+    assert free_ride.power_duration_curve == []
+
+
+@pytest.mark.parametrize(
+    "test_file", ["tests/files/zwift_workout.zwo", "tests/files/mosaic.zwo"]
+)
+def test_metrics_for_ftps(test_file: str) -> None:
+    """Should calculate the same metrics as a workout per FTP value."""
+    ftps = [0, 150, 199, 200, 333]
+
+    metrics = Workout(file_path=test_file).metrics_for_ftps(ftps)
+
+    assert metrics["ftp"].tolist() == ftps
+    for i, ftp in enumerate(ftps):
+        workout = Workout(file_path=test_file, ftp=ftp)
+        for metric in Workout.METRICS:
+            if metric == "power_profile":
+                for d, p in workout.power_profile.items():
+                    assert metrics[f"power_profile_{d}"][i] == p
+            elif metric != "power_duration_curve":
+                assert metrics[metric][i] == getattr(workout, metric), metric
+
+
+def test_metrics_for_ftps_without_samples() -> None:
+    """Should calculate empty metrics for a workout without samples."""
+    metrics = Workout(blocks=[FreeRide(duration=300)]).metrics_for_ftps([200])
+
+    assert metrics["duration"].tolist() == [0]
+    assert metrics["normalized_power"].tolist() == [0]
+    assert metrics["max_power"].tolist() == [0]
+    assert "power_profile_5" not in metrics
+
+
 def test_create_workout_with_abstract_block() -> None:
     """Should raise a TypeError for an invalid block type."""
     with pytest.raises(TypeError, match="Invalid block type"):
@@ -155,17 +252,79 @@ def test_create_workout_with_unsupported_file_format() -> None:
         Workout(file_path=test_file)
 
 
+def test_iter_workout_blocks() -> None:
+    """Should parse the same blocks as the element tree, ignoring text events."""
+    test_file = "tests/files/mosaic.zwo"
+    elements = parse(test_file).findall("./workout/*")
+
+    blocks = list(iter_workout_blocks(test_file))
+
+    assert len(blocks) == len(elements)
+    assert isinstance(blocks[0], Warmup)
+    assert blocks == Workout(file_path=test_file).blocks
+
+
+def test_iter_workout_blocks_rejects_entities(tmp_path: Path) -> None:
+    """Should refuse to expand the entities of a DTD."""
+    test_file = tmp_path / "bomb.zwo"
+    test_file.write_text(
+        '<?xml version="1.0"?>'
+        '<!DOCTYPE workout_file [<!ENTITY a "aaaaaaaaaa"><!ENTITY b "&a;&a;&a;">]>'
+        '<workout_file><workout><FreeRide Duration="&b;"/></workout></workout_file>'
+    )
+
+    with pytest.raises(EntitiesForbidden):
+        list(iter_workout_blocks(str(test_file)))
+
+
+def test_blocks_are_slotted() -> None:
+    """Should store the fields of the blocks in slots."""
+    for block in (SteadyState(duration=60, power=0.5), Interval(2, 1.0, 30, 0.5, 30)):
+        assert not hasattr(block, "__dict__")
+
+
+def test_blocks_to_array() -> None:
+    """Should pack the blocks into a structured array and unpack them back."""
+    blocks = [
+        Warmup(duration=600, start_power=0.4, end_power=0.8),
+        SteadyState(duration=300, power=0.75),
+        Interval(
+            repeat=3, on_power=1.1, on_duration=60, off_power=0.5, off_duration=30
+        ),
+        Ramp(duration=120, start_power=0.5, end_power=1.0),
+        FreeRide(duration=600),
+        Cooldown(duration=300, start_power=0.6, end_power=0.3),
+    ]
+
+    array = blocks_to_array(blocks)
+
+    assert array.dtype == BLOCK_DTYPE
+    assert array["duration"].tolist() == [600, 300, 270, 120, 600, 300]
+    assert blocks_from_array(array) == blocks
+    assert blocks_to_array([]).shape == (0,)
+    np.testing.assert_array_equal(
+        Workout(blocks=blocks_from_array(array), ftp=FTP).power_runs(FTP),
+        Workout(blocks=blocks, ftp=FTP).power_runs(FTP),
+    )
+
+
+def test_blocks_to_array_with_invalid_block() -> None:
+    """Should raise a TypeError for an invalid block type."""
+    with pytest.raises(TypeError, match="Invalid block type"):
+        blocks_to_array([Block(duration=300)])
+
+
 # Helper functions:
-def is_strictly_incremental(lst: list[int]) -> bool:
+def is_strictly_incremental(lst: list[int] | np.ndarray) -> bool:
     """Check if a list is incremental."""
-    return lst == list(range(lst[0], lst[0] + len(lst)))
+    return np.array_equal(lst, range(lst[0], lst[0] + len(lst)))
 
 
-def is_incremental(lst: list[int]) -> bool:
+def is_incremental(lst: list[int] | np.ndarray) -> bool:
     """Check if a list is incremental."""
     return all(lst[x] <= lst[x + 1] for x in range(len(lst) - 1))
 
 
-def is_decremental(lst: list[int]) -> bool:
+def is_decremental(lst: list[int] | np.ndarray) -> bool:
     """Check if a list is decremental."""
     return all(lst[x] >= lst[x + 1] for x in range(len(lst) - 1))
@@ -0,0 +1,89 @@
+"""Unit tests for the zones module."""
+
+import numpy as np
+import pytest
+
+from power_metrics_lib import Activity, Workout
+from power_metrics_lib.zones import COGGAN_ZONES, ZoneModel, zone_distribution
+
+
+def test_zone_model() -> None:
+    """Should convert the edges of a zone model to watts."""
+    model = ZoneModel.from_ftp_percentages([55, 75])
+
+    assert model.names == ("Z1", "Z2", "Z3")
+    assert model.watts(200).tolist() == [110, 150]
+    with pytest.raises(ValueError, match="An FTP is required"):
+        model.watts()
+
+    model = ZoneModel.from_watts([100, 200], names=["Easy", "Steady", "Hard"])
+    assert model.watts().tolist() == [100, 200]
+    assert model.watts(300).tolist() == [100, 200]
+
+
+@pytest.mark.parametrize(
+    ("edges", "names", "match"),
+    [
+        ([75, 55], None, "increasing"),
+        ([-10, 55], None, "non-negative"),
+        ([55, 75], ["Easy", "Hard"], "a name for each zone"),
+    ],
+)
+def test_invalid_zone_model(
+    edges: list[int], names: list[str] | None, match: str
+) -> None:
+    """Should reject invalid edges and names."""
+    with pytest.raises(ValueError, match=match):
+        ZoneModel.from_ftp_percentages(edges, names)
+
+
+def test_activity_time_in_zones() -> None:
+    """Should count the seconds in each zone of an activity."""
+    activity = Activity(
+        timestamps=list(range(1, 7)), power=[0, 109, 110, 150, 300, 301], ftp=200
+    )
+
+    assert list(activity.time_in_zones().values()) == [2, 1, 1, 0, 0, 0, 2]
+    assert list(activity.time_in_zones()) == list(COGGAN_ZONES.names)
+    model = ZoneModel.from_watts([150])
+    assert activity.time_in_zones(model) == {"Z1": 3, "Z2": 3}
+    assert activity.power_histogram(100).tolist() == [1, 3, 0, 2]
+
+    with pytest.raises(ValueError, match="An FTP is required"):
+        Activity(timestamps=[1], power=[100]).time_in_zones()
+
+
+def test_workout_time_in_zones() -> None:
+    """Should count the seconds in each zone from the runs of a workout."""
+    workout = Workout(file_path="tests/files/zwift_workout.zwo", ftp=200)
+
+    time_in_zones = workout.time_in_zones()
+    assert "power" not in vars(workout)
+    assert len(workout.power) == sum(time_in_zones.values())
+    assert workout.time_in_zones() == time_in_zones
+
+
+def test_zone_distribution() -> None:
+    """Should calculate the time in zones of many activities in one matrix."""
+    rng = np.random.default_rng(0)
+    activities = [
+        Activity.from_arrays(np.arange(1, n + 1), rng.integers(0, 500, n), ftp=int(ftp))
+        for n, ftp in zip(
+            rng.integers(0, 1000, 20), rng.integers(150, 350, 20), strict=True
+        )
+    ]
+    powers = [a.power for a in activities]
+
+    matrix = zone_distribution(powers, COGGAN_ZONES, [a.ftp for a in activities])
+    assert matrix.tolist() == [list(a.time_in_zones().values()) for a in activities]
+
+    model = ZoneModel.from_watts([100, 200])
+    matrix = zone_distribution(powers, model)
+    assert matrix.tolist() == [
+        list(a.time_in_zones(model).values()) for a in activities
+    ]
+
+    with pytest.raises(ValueError, match="An FTP is required"):
+        zone_distribution(powers)
+    with pytest.raises(ValueError, match="An FTP is required"):
+        zone_distribution(powers, COGGAN_ZONES, [200, None])